@@ -0,0 +1,384 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+os.environ.setdefault("PORTA", "0")  # O benchmark escolhe uma porta livre para cada servidor
+ARQUIVO_RESULTADOS = os.getenv("ARQUIVO_BENCHMARK", "resultados_benchmark.jsonl")  # Histórico das execuções
+TEMPO_RESPOSTA = float(os.getenv("TEMPO_RESPOSTA_BENCHMARK", "10"))  # Segundos que um bot aguarda pelo mapa antes de desistir
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models.protocolo import (
+    CODIGOS_COMANDOS, COMANDO_DELTA, MAGICA_BINARIO, MENSAGEM_DELTA, MENSAGEM_MAPA, QUADRO_TEXTO,
+    DecodificadorBinario, DecodificadorTexto, codificar_comandos, codificar_quadro,
+)
+
+MOVIMENTOS = ["w", "a", "s", "d"]
+
+
+class Bot:
+    """
+    Jogador simulado que envia comandos ao servidor e mede o tempo até a resposta.
+    
+    Cada comando do jogo é respondido pelo servidor com exatamente um mapa (completo ou delta), que o
+    bot usa como confirmação. O bot mantém um único comando em trânsito por vez.
+    
+    Atributos:
+        host (str): Endereço do servidor.
+        port (int): Porta do servidor.
+        protocolo_binario (bool): Indica se o bot negocia o protocolo binário de quadros.
+        roteiro (list): Comandos repetidos em ordem. Se vazio, os comandos são sorteados.
+        aleatorio (random.Random): Gerador usado para sortear os comandos.
+        latencias (list): Tempo de ida e volta, em segundos, de cada comando confirmado.
+        bytes_enviados (int): Bytes enviados ao servidor depois da conexão.
+        bytes_recebidos (int): Bytes recebidos do servidor depois da conexão.
+        na_sala_tesouro (bool): Indica se o bot está em uma sala do tesouro.
+    """
+    def __init__(self, host, port, protocolo_binario=True, roteiro=None, semente=None):
+        """
+        Inicializa o bot.
+        
+        Args:
+            host (str): Endereço do servidor.
+            port (int): Porta do servidor.
+            protocolo_binario (bool): Negocia o protocolo binário de quadros.
+            roteiro (list): Comandos repetidos em ordem. Se None, os comandos são sorteados.
+            semente (int): Semente do sorteio de comandos.
+        """
+        self.host = host
+        self.port = port
+        self.protocolo_binario = protocolo_binario
+        self.roteiro = roteiro or []
+        self.aleatorio = random.Random(semente)
+        self.latencias = []
+        self.bytes_enviados = 0
+        self.bytes_recebidos = 0
+        self.na_sala_tesouro = False
+
+    def codificar(self, comando):
+        """
+        Codifica um comando no protocolo do bot.
+        
+        Args:
+            comando (str): Comando do jogo.
+        
+        Returns:
+            bytes: Dados a serem enviados ao servidor.
+        """
+        if not self.protocolo_binario:
+            return comando.encode()
+        if comando in CODIGOS_COMANDOS:
+            return codificar_comandos([comando])
+        return codificar_quadro(QUADRO_TEXTO, comando.encode())
+
+    def proximo_comando(self, indice):
+        """
+        Escolhe o próximo comando do bot.
+        
+        Args:
+            indice (int): Quantidade de comandos já enviados.
+        
+        Returns:
+            str: Comando a ser enviado.
+        """
+        if self.roteiro:
+            return self.roteiro[indice % len(self.roteiro)]
+        if self.na_sala_tesouro:
+            return "sair" if self.aleatorio.random() < 0.1 else self.aleatorio.choice(MOVIMENTOS)
+        return "entrar" if self.aleatorio.random() < 0.1 else self.aleatorio.choice(MOVIMENTOS)
+
+    async def aguardar_mapa(self, reader, decodificador):
+        """
+        Lê do servidor até receber um mapa, atualizando o estado do bot com os textos recebidos.
+        
+        Args:
+            reader (asyncio.StreamReader): Canal de leitura da conexão.
+            decodificador (DecodificadorTexto): Decodificador do protocolo do bot.
+        
+        Returns:
+            str: Tipo da mensagem de mapa recebida.
+        
+        Raises:
+            asyncio.TimeoutError: Se nada for recebido em TEMPO_RESPOSTA segundos.
+            ConnectionResetError: Se o servidor encerrou a conexão.
+        """
+        while True:
+            dados = await asyncio.wait_for(reader.read(65536), TEMPO_RESPOSTA)
+            if not dados:
+                raise ConnectionResetError("O servidor encerrou a conexão")
+            self.bytes_recebidos += len(dados)
+            tipo_mapa = None
+            for tipo, conteudo in decodificador.alimentar(dados):
+                if tipo is None:
+                    if "Você saiu da sala do tesouro" in conteudo or "Tempo esgotado" in conteudo:
+                        self.na_sala_tesouro = False
+                elif tipo in (MENSAGEM_MAPA, MENSAGEM_DELTA):
+                    tipo_mapa = tipo
+            if tipo_mapa is not None:
+                return tipo_mapa
+
+    async def jogar(self, fim):
+        """
+        Conecta ao servidor e envia comandos até o instante indicado.
+        
+        Args:
+            fim (float): Instante, em `time.perf_counter()`, em que o bot para de enviar comandos.
+        """
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        decodificador = DecodificadorBinario() if self.protocolo_binario else DecodificadorTexto()
+        try:
+            if self.protocolo_binario:
+                writer.write(MAGICA_BINARIO)
+            writer.write(self.codificar(COMANDO_DELTA))
+            await self.aguardar_mapa(reader, decodificador)
+            indice = 0
+            while time.perf_counter() < fim:
+                comando = self.proximo_comando(indice)
+                dados = self.codificar(comando)
+                inicio = time.perf_counter()
+                writer.write(dados)
+                await writer.drain()
+                tipo = await self.aguardar_mapa(reader, decodificador)
+                self.latencias.append(time.perf_counter() - inicio)
+                self.bytes_enviados += len(dados)
+                if comando == "entrar" and tipo == MENSAGEM_MAPA:
+                    self.na_sala_tesouro = True
+                indice += 1
+        finally:
+            writer.close()
+
+
+def executar_servidor(porta_servidor, modo, parametros):
+    """
+    Processo do servidor medido: inicia o servidor e informa a porta escolhida.
+    
+    Args:
+        porta_servidor (multiprocessing.connection.Connection): Canal para enviar a porta ao benchmark.
+        modo (str): "threads" ou "async".
+        parametros (dict): Parâmetros repassados ao servidor.
+    """
+    sys.stdout = open(os.devnull, "w")  # Os registros de cada ação distorceriam a medição
+    if modo == "async":
+        from server.servidor_async import ServidorAsync as Servidor
+    else:
+        from server.servidor import Servidor
+    servidor = Servidor(host="127.0.0.1", port=0, **parametros)
+    porta_servidor.send(servidor.server_socket.getsockname()[1])
+    servidor.iniciar()
+
+
+def uso_processo(pid):
+    """
+    Lê o tempo de CPU e a memória residente de um processo no /proc.
+    
+    Args:
+        pid (int): ID do processo.
+    
+    Returns:
+        tuple: Segundos de CPU e memória residente em KiB, ou (None, None) se o /proc não estiver disponível.
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as arquivo:
+            campos = arquivo.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/status") as arquivo:
+            memoria = next(int(linha.split()[1]) for linha in arquivo if linha.startswith("VmRSS:"))
+    except (OSError, StopIteration):
+        return None, None
+    return (int(campos[11]) + int(campos[12])) / os.sysconf("SC_CLK_TCK"), memoria
+
+
+def percentil(valores, p):
+    """
+    Calcula um percentil pelo método do posto mais próximo.
+    
+    Args:
+        valores (list): Valores ordenados.
+        p (float): Percentil desejado, entre 0 e 100.
+    
+    Returns:
+        float: Valor do percentil, ou None se não houver valores.
+    """
+    if not valores:
+        return None
+    return valores[min(len(valores) - 1, max(0, round(p / 100 * len(valores)) - 1))]
+
+
+async def executar_bots(bots, duracao):
+    """
+    Executa os bots simultaneamente durante o tempo indicado.
+    
+    Args:
+        bots (list): Bots a serem executados.
+        duracao (float): Segundos de envio de comandos.
+    
+    Returns:
+        list: Exceções dos bots que falharam.
+    """
+    fim = time.perf_counter() + duracao
+    resultados = await asyncio.gather(*(bot.jogar(fim) for bot in bots), return_exceptions=True)
+    return [resultado for resultado in resultados if isinstance(resultado, Exception)]
+
+
+def medir(jogadores, tamanho_mapa, duracao, modo="threads", protocolo_binario=True, roteiro=None, intervalo_tick=0, semente=None):
+    """
+    Mede um cenário: inicia um servidor, executa os bots e coleta as métricas.
+    
+    Args:
+        jogadores (int): Quantidade de bots.
+        tamanho_mapa (tuple): Dimensões do mapa principal.
+        duracao (float): Segundos de envio de comandos.
+        modo (str): "threads" ou "async".
+        protocolo_binario (bool): Bots usam o protocolo binário de quadros.
+        roteiro (list): Comandos repetidos por cada bot. Se None, os comandos são sorteados.
+        intervalo_tick (float): Segundos entre ticks do servidor; 0 desativa o modo tick.
+        semente (int): Semente do sorteio de comandos.
+    
+    Returns:
+        dict: Métricas do cenário.
+    """
+    parametros = {
+        "tamanho_mapa": tamanho_mapa,
+        "max_tesouros_mapa": max(10, tamanho_mapa[0] * tamanho_mapa[1] // 8),
+        "intervalo_tick": intervalo_tick,
+        "limite_comandos": 0,  # Os bots enviam o mais rápido possível; um comando descartado não teria resposta
+    }
+    porta_servidor, porta_benchmark = multiprocessing.Pipe(duplex=False)
+    processo = multiprocessing.Process(target=executar_servidor, args=(porta_benchmark, modo, parametros), daemon=True)
+    processo.start()
+    try:
+        port = porta_servidor.recv()
+        bots = [
+            Bot("127.0.0.1", port, protocolo_binario, roteiro, None if semente is None else semente + i)
+            for i in range(jogadores)
+        ]
+        cpu_inicial, _ = uso_processo(processo.pid)
+        inicio = time.perf_counter()
+        erros = asyncio.run(executar_bots(bots, duracao))
+        decorrido = time.perf_counter() - inicio
+        cpu_final, memoria = uso_processo(processo.pid)
+    finally:
+        processo.terminate()
+        processo.join()
+    latencias = sorted(latencia for bot in bots for latencia in bot.latencias)
+    comandos = len(latencias)
+    return {
+        "jogadores": jogadores,
+        "tamanho_mapa": list(tamanho_mapa),
+        "modo": modo,
+        "protocolo": "binario" if protocolo_binario else "texto",
+        "intervalo_tick_ms": intervalo_tick * 1000,
+        "duracao_s": round(decorrido, 3),
+        "comandos": comandos,
+        "comandos_por_s": round(comandos / decorrido, 1),
+        "latencia_media_ms": round(statistics.fmean(latencias) * 1000, 3) if latencias else None,
+        "latencia_p50_ms": round(percentil(latencias, 50) * 1000, 3) if latencias else None,
+        "latencia_p95_ms": round(percentil(latencias, 95) * 1000, 3) if latencias else None,
+        "latencia_p99_ms": round(percentil(latencias, 99) * 1000, 3) if latencias else None,
+        "bytes_enviados_por_comando": round(sum(bot.bytes_enviados for bot in bots) / comandos, 1) if comandos else None,
+        "bytes_recebidos_por_comando": round(sum(bot.bytes_recebidos for bot in bots) / comandos, 1) if comandos else None,
+        "cpu_servidor_s": None if cpu_final is None else round(cpu_final - cpu_inicial, 3),
+        "cpu_servidor_percentual": None if cpu_final is None else round((cpu_final - cpu_inicial) / decorrido * 100, 1),
+        "memoria_servidor_kib": memoria,
+        "bots_com_erro": len(erros),
+    }
+
+
+def chave_cenario(resultado):
+    """
+    Identifica um cenário para comparar execuções diferentes.
+    
+    Args:
+        resultado (dict): Métricas do cenário.
+    
+    Returns:
+        tuple: Parâmetros que definem o cenário.
+    """
+    return (resultado["jogadores"], tuple(resultado["tamanho_mapa"]), resultado["modo"], resultado["protocolo"], resultado["intervalo_tick_ms"])
+
+
+def carregar_ultima_execucao(arquivo):
+    """
+    Carrega os cenários da execução anterior registrada no arquivo de resultados.
+    
+    Args:
+        arquivo (str): Caminho do arquivo de resultados.
+    
+    Returns:
+        dict: Métricas da última execução por cenário.
+    """
+    try:
+        with open(arquivo) as historico:
+            linhas = historico.read().splitlines()
+    except FileNotFoundError:
+        return {}
+    if not linhas:
+        return {}
+    return {chave_cenario(resultado): resultado for resultado in json.loads(linhas[-1])["resultados"]}
+
+
+def exibir_resultado(resultado, anterior=None):
+    """
+    Exibe as métricas de um cenário e a variação em relação à execução anterior.
+    
+    Args:
+        resultado (dict): Métricas do cenário.
+        anterior (dict): Métricas do mesmo cenário na execução anterior, se houver.
+    """
+    def comparar(campo):
+        valor = resultado[campo]
+        if anterior is None or not anterior.get(campo) or valor is None:
+            return f"{valor}"
+        return f"{valor} ({(valor - anterior[campo]) / anterior[campo] * 100:+.1f}%)"
+
+    print(f"{resultado['jogadores']} jogadores, mapa {resultado['tamanho_mapa'][0]}x{resultado['tamanho_mapa'][1]}, "
+          f"{resultado['modo']}, {resultado['protocolo']}, tick {resultado['intervalo_tick_ms']:g} ms")
+    print(f"  comandos/s: {comparar('comandos_por_s')}")
+    print(f"  latência ms: p50 {comparar('latencia_p50_ms')}, p95 {comparar('latencia_p95_ms')}, p99 {comparar('latencia_p99_ms')}")
+    print(f"  bytes por comando: enviados {comparar('bytes_enviados_por_comando')}, recebidos {comparar('bytes_recebidos_por_comando')}")
+    print(f"  servidor: CPU {comparar('cpu_servidor_percentual')}%, memória {comparar('memoria_servidor_kib')} KiB")
+    if resultado["bots_com_erro"]:
+        print(f"  {resultado['bots_com_erro']} bots falharam")
+
+
+def main():
+    """
+    Executa os cenários pedidos na linha de comando e registra os resultados.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark do servidor do Corrida Pelo Tesouro com jogadores simulados.")
+    parser.add_argument("--jogadores", default="1,8,32", help="Quantidades de bots, separadas por vírgula.")
+    parser.add_argument("--mapas", default="8x8,32x32", help="Dimensões do mapa principal, separadas por vírgula.")
+    parser.add_argument("--duracao", type=float, default=5, help="Segundos de envio de comandos em cada cenário.")
+    parser.add_argument("--modo", choices=["threads", "async"], default="threads", help="Modo de execução do servidor.")
+    parser.add_argument("--texto", action="store_true", help="Usa o protocolo de texto em vez do binário.")
+    parser.add_argument("--tick", type=int, default=0, help="Intervalo entre ticks do servidor em milissegundos.")
+    parser.add_argument("--roteiro", help="Comandos repetidos por cada bot, separados por vírgula (por exemplo, w,d,s,a).")
+    parser.add_argument("--semente", type=int, help="Semente do sorteio de comandos.")
+    parser.add_argument("--arquivo", default=ARQUIVO_RESULTADOS, help="Arquivo em que os resultados são acumulados.")
+    args = parser.parse_args()
+
+    anteriores = carregar_ultima_execucao(args.arquivo)
+    roteiro = args.roteiro.split(",") if args.roteiro else None
+    resultados = []
+    for tamanho in args.mapas.split(","):
+        tamanho_mapa = tuple(int(dimensao) for dimensao in tamanho.split("x"))
+        for jogadores in (int(quantidade) for quantidade in args.jogadores.split(",")):
+            resultado = medir(jogadores, tamanho_mapa, args.duracao, args.modo, not args.texto, roteiro, args.tick / 1000, args.semente)
+            exibir_resultado(resultado, anteriores.get(chave_cenario(resultado)))
+            resultados.append(resultado)
+
+    execucao = {"data": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(), "resultados": resultados}
+    with open(args.arquivo, "a") as historico:
+        historico.write(json.dumps(execucao) + "\n")
+    print(f"Resultados registrados em {args.arquivo}")
+
+
+if __name__ == "__main__":
+    main()
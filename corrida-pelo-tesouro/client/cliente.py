@@ -2,11 +2,22 @@ import socket
 import threading
 import time
 import os
+import sys
 from dotenv import load_dotenv
 
 load_dotenv()
 IP_PUBLICO = os.getenv("IP_PUBLICO")
 PORTA = int(os.getenv("PORTA"))
+MODO_DELTA = os.getenv("MODO_DELTA", "0") == "1"  # Recebe apenas as células alteradas do mapa
+PROTOCOLO_BINARIO = os.getenv("PROTOCOLO_BINARIO", "0") == "1"  # Usa o protocolo binário de quadros
+MODO_INTERATIVO = os.getenv("MODO_INTERATIVO", "0") == "1"  # Teclas sem Enter, mapa redesenhado no lugar e movimentos previstos localmente
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models.mapa import formatar_mapa
+from models.protocolo import (
+    CODIGOS_COMANDOS, COMANDO_DELTA, MAGICA_BINARIO, MENSAGEM_DELTA, MENSAGEM_MAPA, QUADRO_TEXTO,
+    DecodificadorBinario, DecodificadorTexto, codificar_comandos, codificar_quadro,
+)
 
 class Cliente:
     """
@@ -17,19 +28,29 @@ class Cliente:
         port (int): Porta do servidor.
         socket (socket.socket): Socket para comunicação com o servidor.
         in_treasure_room (bool): Indica se o jogador está na sala do tesouro.
+        modo_delta (bool): Indica se o mapa é mantido localmente e atualizado com deltas do servidor.
+        celulas (list): Cópia local das células do mapa exibido, usada no modo delta.
+        origem (list): Posição no mapa da primeira célula de `celulas`, quando o servidor envia apenas uma janela do mapa.
+        protocolo_binario (bool): Indica se a comunicação usa o protocolo binário de quadros.
     """
-    def __init__(self, host=IP_PUBLICO, port=PORTA):
+    def __init__(self, host=IP_PUBLICO, port=PORTA, modo_delta=MODO_DELTA, protocolo_binario=PROTOCOLO_BINARIO):
         """
         Inicializa a classe Cliente com o endereço e porta do servidor.
         
         Args:
             host (str): Endereço do servidor. Padrão é "localhost".
             port (int): Porta do servidor. Padrão é 8080.
+            modo_delta (bool): Ativa o recebimento de deltas do mapa.
+            protocolo_binario (bool): Negocia o protocolo binário de quadros com o servidor.
         """
         self.host = host
         self.port = port
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.in_treasure_room = False
+        self.modo_delta = modo_delta
+        self.celulas = []
+        self.origem = [0, 0]
+        self.protocolo_binario = protocolo_binario
 
     def conectar(self):
         """
@@ -37,6 +58,10 @@ class Cliente:
         """
         try:
             self.socket.connect((self.host, self.port))
+            if self.protocolo_binario:
+                self.socket.sendall(MAGICA_BINARIO)
+            if self.modo_delta:
+                self.enviar_comando(COMANDO_DELTA)
             time.sleep(0.1)
             threading.Thread(target=self.receber_mensagens).start()
             self.enviar_comandos()
@@ -47,9 +72,14 @@ class Cliente:
         """
         Recebe mensagens do servidor e as exibe no console.
         """
+        decodificador = DecodificadorBinario() if self.protocolo_binario else DecodificadorTexto()
         while True:
             try:
-                mensagem = self.socket.recv(1024).decode()
+                dados = self.socket.recv(1024)
+                if self.modo_delta or self.protocolo_binario:
+                    mensagem = self.aplicar_mensagens(decodificador.alimentar(dados))
+                else:
+                    mensagem = dados.decode()
                 print(mensagem)
                 if "Saindo do jogo..." in mensagem:
                     self.socket.close()  # Fecha o socket do cliente
@@ -60,6 +90,50 @@ class Cliente:
                 print("Conexão com o servidor foi perdida.")
                 break
 
+    def aplicar_mensagens(self, mensagens):
+        """
+        Aplica as mensagens de controle ao mapa local e monta o texto a ser exibido.
+        
+        Args:
+            mensagens (list): Pares (tipo, conteúdo) produzidos pelo DecodificadorTexto.
+        
+        Returns:
+            str: Texto recebido, seguido do mapa local sempre que ele for atualizado.
+        """
+        texto = ""
+        for tipo, conteudo in mensagens:
+            if tipo is None:
+                texto += conteudo
+                continue
+            if tipo == MENSAGEM_MAPA:
+                self.celulas = conteudo["celulas"]
+                self.origem = conteudo.get("origem", [0, 0])
+            elif tipo == MENSAGEM_DELTA:
+                for x, y, celula in conteudo["alteracoes"]:
+                    self.celulas[x][y] = celula
+            texto += formatar_mapa(self.celulas, self.origem)
+        return texto
+
+    def enviar_comando(self, comando):
+        """
+        Envia um comando ao servidor no protocolo negociado.
+        
+        No protocolo binário, uma sequência de movimentos como "wwd" é enviada em um único quadro.
+        
+        Args:
+            comando (str): Comando digitado pelo jogador.
+        """
+        if not self.protocolo_binario:
+            self.socket.send(comando.encode())
+            return
+        comando = comando.strip().lower()
+        if comando and all(movimento in "wasd" for movimento in comando):
+            self.socket.sendall(codificar_comandos(list(comando)))
+        elif comando in CODIGOS_COMANDOS:
+            self.socket.sendall(codificar_comandos([comando]))
+        else:
+            self.socket.sendall(codificar_quadro(QUADRO_TEXTO, comando.encode()))
+
     def enviar_comandos(self):
         """
         Envia comandos do jogador para o servidor.
@@ -70,12 +144,14 @@ class Cliente:
                 comando = input("Digite um comando (w, a, s, d, sair): ")
             else:
                 comando = input("Digite um comando (w, a, s, d, entrar, sair): ")
-            self.socket.send(comando.encode())
+            self.enviar_comando(comando)
             if comando == "sair" and not self.in_treasure_room:
                 break
             elif comando == "entrar":
                 self.in_treasure_room = True
 
 if __name__ == "__main__":
+    if MODO_INTERATIVO:
+        from client.cliente_interativo import ClienteInterativo as Cliente
     cliente = Cliente()
     cliente.conectar()
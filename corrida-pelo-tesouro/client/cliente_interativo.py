@@ -0,0 +1,274 @@
+import os
+import selectors
+import sys
+from collections import deque
+
+try:
+    import termios
+    import tty
+except ImportError:  # Sem termios (Windows) o cliente interativo não está disponível
+    termios = None
+
+from client.cliente import Cliente
+from models.colors import colors
+from models.mapa import CELULA_COLETADA, CELULA_TESOURO, SIMBOLOS
+from models.protocolo import COMANDO_DELTA, COMANDO_ESTADO, MAGICA_BINARIO, MENSAGEM_DELTA, MENSAGEM_ESTADO, MENSAGEM_MAPA, DecodificadorBinario
+
+MOVIMENTOS = {"w": (-1, 0), "a": (0, -1), "s": (1, 0), "d": (0, 1)}
+TECLAS = {"w": "w", "a": "a", "s": "s", "d": "d", "e": "entrar", "q": "sair"}  # Tecla -> comando enviado ao servidor
+MENSAGENS_EXIBIDAS = 6  # Linhas de mensagens do servidor mantidas abaixo do mapa
+
+
+class ClienteInterativo(Cliente):
+    """
+    Cliente que mantém o mapa localmente, redesenha apenas as células alteradas e prevê os próprios movimentos.
+    
+    Cada tecla é enviada assim que pressionada, sem Enter e sem esperas fixas, e um único laço
+    atende o teclado e o socket. Os movimentos são aplicados ao mapa exibido antes da resposta do
+    servidor; cada MENSAGEM_ESTADO informa quantos comandos o servidor já aplicou, e a tela passa a
+    ser o mapa do servidor com apenas os movimentos ainda não confirmados reaplicados sobre ele.
+    Usa sempre o protocolo binário e o modo delta.
+    
+    Atributos:
+        jogador_id (int): ID do jogador, informado pelo servidor.
+        pos (list): Posição do jogador confirmada pelo servidor, no mapa principal ou na sala do tesouro.
+        enviados (int): Comandos enviados ao servidor.
+        pendentes (deque): Comandos (número do comando, comando) ainda não confirmados pelo servidor.
+        estado_recebido (dict): MENSAGEM_ESTADO aguardando o mapa que a acompanha, ou None.
+        terreno (list): Último conteúdo conhecido de cada célula sem jogadores, usado ao prever a saída do jogador de uma célula.
+        exibidas (list): Células atualmente desenhadas na tela.
+        origem_exibida (list): Origem da janela desenhada na tela.
+        mensagens (deque): Últimas linhas de texto recebidas do servidor.
+        rodape_exibido (tuple): Linha de status e mensagens desenhadas na tela.
+        ativo (bool): Indica se o laço principal deve continuar.
+    """
+    def __init__(self, **parametros):
+        """
+        Inicializa o cliente interativo.
+        
+        Args:
+            **parametros: Parâmetros repassados ao Cliente, como host e port.
+        
+        Raises:
+            ImportError: Se o terminal não oferecer o módulo termios.
+        """
+        if termios is None:
+            raise ImportError("O cliente interativo requer um terminal com suporte ao módulo termios")
+        super().__init__(**{**parametros, "modo_delta": True, "protocolo_binario": True})
+        self.jogador_id = None
+        self.pos = None
+        self.enviados = 0
+        self.pendentes = deque()
+        self.estado_recebido = None
+        self.terreno = []
+        self.exibidas = []
+        self.origem_exibida = None
+        self.mensagens = deque(maxlen=MENSAGENS_EXIBIDAS)
+        self.rodape_exibido = None
+        self.ativo = True
+
+    def conectar(self):
+        """
+        Conecta ao servidor, ativa o modo delta e o envio do estado e atende o teclado e o socket até o fim do jogo.
+        """
+        try:
+            self.socket.connect((self.host, self.port))
+        except OSError as e:
+            print(f"Erro ao conectar ao servidor: {e}")
+            return
+        self.socket.sendall(MAGICA_BINARIO)
+        self.enviar(COMANDO_DELTA)
+        self.enviar(COMANDO_ESTADO)
+        entrada = sys.stdin.fileno()
+        configuracao = termios.tcgetattr(entrada) if os.isatty(entrada) else None
+        try:
+            if configuracao is not None:
+                tty.setcbreak(entrada)  # Cada tecla chega sem esperar pelo Enter e sem eco
+            sys.stdout.write("\x1b[2J\x1b[?25l")  # Limpa a tela e esconde o cursor
+            self.executar(entrada)
+        finally:
+            if configuracao is not None:
+                termios.tcsetattr(entrada, termios.TCSADRAIN, configuracao)
+            sys.stdout.write(f"\x1b[?25h\x1b[{self.linha_final()};1H\n")
+            sys.stdout.flush()
+            self.socket.close()
+
+    def executar(self, entrada):
+        """
+        Laço principal: aguarda teclas ou dados do servidor, sem esperas fixas, e redesenha a tela após cada evento.
+        
+        Args:
+            entrada (int): Descritor do teclado.
+        """
+        decodificador = DecodificadorBinario()
+        seletor = selectors.DefaultSelector()
+        seletor.register(self.socket, selectors.EVENT_READ, "socket")
+        seletor.register(entrada, selectors.EVENT_READ, "teclado")
+        while self.ativo:
+            for chave, _ in seletor.select():
+                if chave.data == "socket":
+                    dados = self.socket.recv(65536)
+                    if not dados:
+                        self.ativo = False
+                        self.mensagens.append("Conexão com o servidor encerrada.")
+                        break
+                    self.aplicar_mensagens(decodificador.alimentar(dados))
+                else:
+                    teclas = os.read(entrada, 64).decode(errors="ignore")
+                    if not teclas:
+                        seletor.unregister(entrada)  # Entrada encerrada: continua apenas exibindo o jogo
+                        continue
+                    for tecla in teclas.lower():
+                        if tecla in TECLAS:
+                            self.enviar(TECLAS[tecla])
+            self.desenhar()
+
+    def enviar(self, comando):
+        """
+        Envia um comando e o registra como pendente até que o servidor confirme a sua aplicação.
+        
+        Args:
+            comando (str): Comando a ser enviado.
+        """
+        self.enviados += 1
+        self.pendentes.append((self.enviados, comando))
+        self.enviar_comando(comando)
+
+    def aplicar_mensagens(self, mensagens):
+        """
+        Aplica as mensagens recebidas ao estado local.
+        
+        Args:
+            mensagens (list): Pares (tipo, conteúdo) produzidos pelo DecodificadorBinario.
+        
+        Returns:
+            str: Texto comum recebido.
+        """
+        texto = ""
+        for tipo, conteudo in mensagens:
+            if tipo is None:
+                texto += conteudo
+                if self.jogador_id is None:
+                    continue  # Boas-vindas, instruções e mapa em texto, enviados antes de o modo delta ser ativado
+                self.mensagens.extend(linha for linha in conteudo.splitlines() if linha.strip())
+            elif tipo == MENSAGEM_ESTADO:
+                self.estado_recebido = conteudo  # Aplicado junto com o mapa que o segue, para a tela não voltar atrás
+            elif tipo == MENSAGEM_MAPA:
+                self.celulas = conteudo["celulas"]
+                self.origem = conteudo.get("origem", [0, 0])
+                self.terreno = [[celula if celula in SIMBOLOS else SIMBOLOS[0] for celula in linha] for linha in self.celulas]
+            elif tipo == MENSAGEM_DELTA:
+                for x, y, celula in conteudo["alteracoes"]:
+                    self.celulas[x][y] = celula
+                    if celula in SIMBOLOS:
+                        self.terreno[x][y] = celula
+            if tipo in (MENSAGEM_MAPA, MENSAGEM_DELTA) and self.estado_recebido:
+                self.confirmar(self.estado_recebido)
+                self.estado_recebido = None
+        return texto
+
+    def confirmar(self, estado):
+        """
+        Adota o estado informado pelo servidor e descarta as previsões dos comandos que ele já aplicou.
+        
+        Args:
+            estado (dict): Conteúdo da MENSAGEM_ESTADO.
+        """
+        self.jogador_id = estado["jogador"]
+        self.pos = estado["pos"]
+        self.in_treasure_room = estado["sala"]
+        while self.pendentes and self.pendentes[0][0] <= estado["processados"]:
+            self.pendentes.popleft()
+
+    def marcador(self):
+        """
+        Returns:
+            str: Célula que representa o jogador, como o servidor a renderiza.
+        """
+        return f"{colors.OKBLUE}{self.jogador_id}{colors.ENDC}"
+
+    def prever(self):
+        """
+        Monta o mapa exibido: o último mapa do servidor com os movimentos ainda não confirmados reaplicados.
+        
+        A previsão para no primeiro comando que não é um movimento, como entrar em uma sala do tesouro,
+        e nas bordas do mapa ou da janela recebida. Um tesouro pisado na previsão é exibido como coletado.
+        
+        Returns:
+            list: Matriz das células a exibir.
+        """
+        if self.pos is None or not self.celulas:
+            return self.celulas
+        celulas = [list(linha) for linha in self.celulas]
+        x, y = self.pos[0] - self.origem[0], self.pos[1] - self.origem[1]
+        if not (0 <= x < len(celulas) and 0 <= y < len(celulas[0])):
+            return celulas
+        marcador = self.marcador()
+        for _, comando in self.pendentes:
+            if comando not in MOVIMENTOS:
+                break
+            nx, ny = x + MOVIMENTOS[comando][0], y + MOVIMENTOS[comando][1]
+            if not (0 <= nx < len(celulas) and 0 <= ny < len(celulas[0])):
+                continue  # O servidor também ignora movimentos para fora do mapa
+            anterior = self.celulas[x][y]
+            if anterior == marcador:
+                anterior = self.terreno[x][y]
+            celulas[x][y] = SIMBOLOS[CELULA_COLETADA] if anterior == SIMBOLOS[CELULA_TESOURO] else anterior
+            celulas[nx][ny] = marcador
+            x, y = nx, ny
+        return celulas
+
+    def largura_rotulo(self):
+        """
+        Returns:
+            int: Largura da numeração das linhas do mapa exibido.
+        """
+        return len(str(self.origem[0] + max(len(self.exibidas), 1) - 1))
+
+    def linha_final(self):
+        """
+        Returns:
+            int: Primeira linha da tela abaixo do mapa, do status e das mensagens.
+        """
+        return len(self.exibidas) + 5 + MENSAGENS_EXIBIDAS
+
+    def desenhar(self):
+        """
+        Atualiza a tela em uma única escrita: o mapa inteiro se a janela mudou, senão apenas as células
+        alteradas, seguidos do status e das mensagens.
+        """
+        celulas = self.prever()
+        if not celulas:
+            return
+        saida = []
+        redimensionado = len(celulas) != len(self.exibidas) or len(celulas[0]) != len(self.exibidas[0]) or self.origem != self.origem_exibida
+        if redimensionado:
+            self.exibidas = [list(linha) for linha in celulas]
+            self.origem_exibida = list(self.origem)
+            largura = self.largura_rotulo()
+            borda = " " * largura + " " + "-" * (len(celulas[0]) * 2 + 3)
+            saida.append("\x1b[H\x1b[J" + " " * (largura + 3) + " ".join(str((self.origem[1] + j) % 10) for j in range(len(celulas[0]))) + "\n")
+            saida.append(borda + "\n")
+            for i, linha in enumerate(celulas):
+                saida.append(f"{self.origem[0] + i:>{largura}} | " + " ".join(linha) + " |\n")
+            saida.append(borda + "\n")
+            self.rodape_exibido = None
+        else:
+            largura = self.largura_rotulo()
+            for i, linha in enumerate(celulas):
+                for j, celula in enumerate(linha):
+                    if self.exibidas[i][j] != celula:
+                        self.exibidas[i][j] = celula
+                        saida.append(f"\x1b[{i + 3};{largura + 4 + 2 * j}H{celula}")
+        local = "sala do tesouro" if self.in_treasure_room else "mapa principal"
+        status = f"Jogador {self.jogador_id} | {local} | aguardando {len(self.pendentes)} | w/a/s/d mover, e entrar, q sair"
+        rodape = (status, tuple(self.mensagens))
+        if rodape != self.rodape_exibido:
+            self.rodape_exibido = rodape
+            mensagens = list(self.mensagens) + [""] * (MENSAGENS_EXIBIDAS - len(self.mensagens))
+            saida.append(f"\x1b[{len(celulas) + 4};1H\x1b[2K{status}")
+            for i, mensagem in enumerate(mensagens):
+                saida.append(f"\x1b[{len(celulas) + 5 + i};1H\x1b[2K{mensagem}")
+        if saida:
+            sys.stdout.write("".join(saida))
+            sys.stdout.flush()
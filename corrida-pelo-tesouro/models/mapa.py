@@ -1,6 +1,34 @@
 import random
+import threading
+from collections import deque
 from models.colors import colors
 
+LIMITE_ALTERACOES = 4096  # Quantidade de alterações de células mantidas para o envio de deltas
+CELULA_SALA = 0  # Célula vazia, que dá acesso a uma sala do tesouro
+CELULA_TESOURO = 1  # Célula com um tesouro ainda não coletado
+CELULA_COLETADA = 2  # Tesouro coletado ou sala do tesouro esvaziada
+SIMBOLOS = [".", f"{colors.GOLD}T{colors.ENDC}", f"{colors.RED}x{colors.ENDC}"]  # Representação de cada estado de célula
+
+def formatar_mapa(celulas, origem=(0, 0)):
+    """
+    Formata uma matriz de células já renderizadas no texto exibido aos jogadores.
+    
+    Args:
+        celulas (list): Matriz com a representação de cada célula do mapa.
+        origem (tuple): Posição no mapa (linha, coluna) da primeira célula, usada na numeração quando
+            apenas uma janela do mapa é exibida.
+    
+    Returns:
+        str: Representação do mapa com a numeração de linhas e colunas.
+    """
+    colunas = len(celulas[0]) if celulas else 0
+    mapa_str = "    " + " ".join(str(origem[1] + i) for i in range(colunas)) + "\n"
+    mapa_str += "  " + "-" * (colunas * 2 + 3) + "\n"
+    for i, linha in enumerate(celulas):
+        mapa_str += str(origem[0] + i) + " | " + " ".join(linha) + " |\n"
+    mapa_str += "  " + "-" * (colunas * 2 + 3) + "\n"
+    return mapa_str
+
 class Mapa:
     """
     Classe Mapa para representar o mapa do jogo Corrida Pelo Tesouro.
@@ -9,22 +37,84 @@ class Mapa:
         linhas (int): Número de linhas do mapa.
         colunas (int): Número de colunas do mapa.
         celulas (list): Matriz que representa as células do mapa.
-        tesouros (list): Lista de posições dos tesouros no mapa.
+        tesouros (set): Conjunto de posições dos tesouros ainda não coletados no mapa.
+        livres (list): Posições das células vazias ("."), em ordem arbitrária, para sorteio em tempo constante.
+        indices_livres (dict): Índice de cada posição vazia em `livres`.
+        lock_livres (threading.Lock): Protege o índice de células vazias entre threads.
+        ocupacao (dict): Índice de ocupação que associa cada posição aos IDs dos jogadores nela.
+        posicoes_jogadores (dict): Posição atual de cada jogador presente no mapa.
+        versao (int): Versão do mapa, incrementada a cada célula alterada.
+        alteracoes (deque): Histórico recente de (versão, posição) das células alteradas.
+        versao_minima (int): Versão mais antiga a partir da qual o histórico de alterações está completo.
+        rng (random.Random): Gerador dos sorteios de tesouros e posições, ou o módulo `random` se nenhum for informado.
     """
-    def __init__(self, linhas, colunas):
+    def __init__(self, linhas, colunas, rng=None):
         """
         Inicializa a classe Mapa com o número de linhas e colunas.
         
         Args:
             linhas (int): Número de linhas do mapa.
             colunas (int): Número de colunas do mapa.
+            rng (random.Random): Gerador dos sorteios do mapa. Um gerador com semente torna o mapa reproduzível.
         """
         self.linhas = linhas
         self.colunas = colunas
-        self.celulas = [["." for _ in range(colunas)] for _ in range(linhas)]
-        self.tesouros = []
+        self.rng = rng if rng is not None else random
+        self.lock_livres = threading.Lock()
+        self.inicializar_celulas()
+        self.ocupacao = {}  # (linha, coluna) -> IDs dos jogadores na posição, em ordem de chegada
+        self.posicoes_jogadores = {}  # ID do jogador -> (linha, coluna)
+        self.versao = 0
+        self.alteracoes = deque(maxlen=LIMITE_ALTERACOES)
+        self.versao_minima = 0
+        self.lock_alteracoes = threading.Lock()  # Protege o histórico de alterações entre threads
         self.inicializar_tesouros()
 
+    def inicializar_celulas(self):
+        """
+        Cria as células do mapa, todas vazias.
+        """
+        self.celulas = [["." for _ in range(self.colunas)] for _ in range(self.linhas)]
+        self.tesouros = set()
+        self.indexar_livres()
+
+    def indexar_livres(self):
+        """
+        Reconstrói o índice de células vazias a partir das células do mapa.
+        """
+        with self.lock_livres:
+            self.livres = [(i, j) for i in range(self.linhas) for j in range(self.colunas) if self.celulas[i][j] == "."]
+            self.indices_livres = {pos: indice for indice, pos in enumerate(self.livres)}
+
+    def ocupar_livre(self, pos):
+        """
+        Retira uma posição do índice de células vazias, trocando-a pela última posição da lista.
+        
+        Args:
+            pos (tuple): Posição que deixou de ser vazia (linha, coluna).
+        """
+        with self.lock_livres:
+            indice = self.indices_livres.pop(pos, None)
+            if indice is None:
+                return
+            ultima = self.livres.pop()
+            if ultima != pos:
+                self.livres[indice] = ultima
+                self.indices_livres[ultima] = indice
+
+    def sortear_livres(self, quantidade):
+        """
+        Sorteia posições vazias distintas, sem percorrer o mapa.
+        
+        Args:
+            quantidade (int): Quantidade de posições desejada.
+        
+        Returns:
+            list: Até `quantidade` posições vazias distintas; menos se o mapa não tiver tantas.
+        """
+        with self.lock_livres:
+            return self.rng.sample(self.livres, min(quantidade, len(self.livres)))
+
     def inicializar_tesouros(self, quantidade=None, sala_tesouro=False):
         """
         Inicializa os tesouros no mapa.
@@ -34,18 +124,24 @@ class Mapa:
             sala_tesouro (bool): Indica se os tesouros estão sendo inicializados em uma sala do tesouro.
         """
         if sala_tesouro:
-            self.tesouros = []  # Limpa qualquer tesouro existente antes de preencher com os tesouros da sala do tesouro
-            for i in range(self.linhas):
-                for j in range(self.colunas):
-                    self.celulas[i][j] = f"{colors.GOLD}T{colors.ENDC}"
-                    self.tesouros.append((i, j))
+            # Substitui qualquer tesouro existente pelos tesouros da sala do tesouro
+            self.celulas = [[f"{colors.GOLD}T{colors.ENDC}" for _ in range(self.colunas)] for _ in range(self.linhas)]
+            self.tesouros = {(i, j) for i in range(self.linhas) for j in range(self.colunas)}
+            self.indexar_livres()
+            self.invalidar_alteracoes()
         else:
             if quantidade is None:
-                quantidade = random.randint(5, 10)
-            for _ in range(quantidade):
-                x, y = self.posicao_aleatoria()
+                quantidade = self.rng.randint(5, 10)
+            escolhidas = self.sortear_livres(quantidade)  # Todas as posições de uma vez; no máximo as células vazias restantes
+            for x, y in escolhidas:
                 self.celulas[x][y] = f"{colors.GOLD}T{colors.ENDC}"
-                self.tesouros.append((x, y))
+                self.tesouros.add((x, y))
+                self.ocupar_livre((x, y))
+            if len(escolhidas) > LIMITE_ALTERACOES // 2:
+                self.invalidar_alteracoes()  # Um delta tão grande não seria menor que o mapa completo
+                return
+            for pos in escolhidas:
+                self.registrar_alteracao(pos)
 
     def valida_posicao(self, pos):
         """
@@ -71,12 +167,25 @@ class Mapa:
             bool: True se o tesouro foi coletado, False caso contrário.
         """
         if pos in self.tesouros:
-            self.tesouros.remove(pos)
+            self.tesouros.discard(pos)
             x, y = pos
             self.celulas[x][y] = f"{colors.RED}x{colors.ENDC}"
+            self.registrar_alteracao(pos)
             return True
         return False
 
+    def marcar_coletado(self, pos):
+        """
+        Marca uma posição do mapa como já coletada, como uma sala do tesouro esvaziada.
+        
+        Args:
+            pos (tuple): Posição a ser marcada (linha, coluna).
+        """
+        x, y = pos
+        self.celulas[x][y] = f"{colors.RED}x{colors.ENDC}"
+        self.ocupar_livre(pos)
+        self.registrar_alteracao(pos)
+
     def todos_tesouros_coletados(self):
         """
         Verifica se todos os tesouros foram coletados.
@@ -84,7 +193,16 @@ class Mapa:
         Returns:
             bool: True se todos os tesouros foram coletados, False caso contrário.
         """
-        return len(self.tesouros) == 0
+        return not self.tesouros
+
+    def tesouros_restantes(self):
+        """
+        Retorna a quantidade de tesouros que ainda não foram coletados.
+        
+        Returns:
+            int: Número de tesouros restantes no mapa.
+        """
+        return len(self.tesouros)
 
     def eh_sala_tesouro(self, pos):
         """
@@ -99,43 +217,190 @@ class Mapa:
         x, y = pos
         return self.celulas[x][y] == "."
 
+    def contar_salas_tesouro(self):
+        """
+        Conta as posições do mapa que dão acesso a uma sala do tesouro.
+        
+        Returns:
+            int: Número de salas do tesouro no mapa.
+        """
+        return len(self.livres)
+
     def posicao_aleatoria(self):
         """
-        Retorna uma posição aleatória válida no mapa.
+        Retorna uma posição vazia sorteada uniformemente, em tempo constante.
         
         Returns:
             tuple: Posição aleatória (linha, coluna).
+        
+        Raises:
+            ValueError: Se não houver nenhuma posição vazia no mapa.
+        """
+        with self.lock_livres:
+            if not self.livres:
+                raise ValueError("Não há posições vazias no mapa")
+            return self.livres[self.rng.randrange(len(self.livres))]
+
+    def posicionar_jogador(self, jogador_id, pos):
+        """
+        Coloca ou move um jogador para a posição especificada no índice de ocupação.
+        
+        Args:
+            jogador_id (int): ID do jogador.
+            pos (tuple): Nova posição do jogador (linha, coluna).
         """
-        while True:
-            x, y = random.randint(0, self.linhas - 1), random.randint(0, self.colunas - 1)
-            if self.celulas[x][y] == ".":
-                return (x, y)
+        self.remover_jogador(jogador_id)
+        self.posicoes_jogadores[jogador_id] = pos
+        self.ocupacao.setdefault(pos, []).append(jogador_id)
+        self.registrar_alteracao(pos)
 
-    def exibir_mapa(self, jogadores=None, posicao_do_jogador="pos"):
+    def remover_jogador(self, jogador_id):
+        """
+        Remove um jogador do índice de ocupação, caso esteja no mapa.
+        
+        Args:
+            jogador_id (int): ID do jogador.
+        """
+        pos = self.posicoes_jogadores.pop(jogador_id, None)
+        if pos is None:
+            return
+        ocupantes = self.ocupacao[pos]
+        ocupantes.remove(jogador_id)
+        if not ocupantes:
+            del self.ocupacao[pos]
+        self.registrar_alteracao(pos)
+
+    def jogador_em(self, pos):
+        """
+        Retorna o jogador exibido em uma posição do mapa.
+        
+        Args:
+            pos (tuple): Posição a ser consultada (linha, coluna).
+        
+        Returns:
+            int: ID do primeiro jogador que chegou à posição, ou None se ela estiver livre.
+        """
+        ocupantes = self.ocupacao.get(pos)
+        return ocupantes[0] if ocupantes else None
+
+    def registrar_alteracao(self, pos):
+        """
+        Registra que uma célula do mapa mudou, para que ela seja incluída no próximo delta.
+        
+        Args:
+            pos (tuple): Posição alterada (linha, coluna).
+        """
+        with self.lock_alteracoes:
+            self.versao += 1
+            self.alteracoes.append((self.versao, pos))
+
+    def invalidar_alteracoes(self):
+        """
+        Descarta o histórico de alterações, forçando o envio do mapa completo a todos os jogadores.
+        """
+        with self.lock_alteracoes:
+            self.versao += 1
+            self.alteracoes.clear()
+            self.versao_minima = self.versao
+
+    def alteracoes_desde(self, versao):
+        """
+        Retorna as células alteradas desde uma versão do mapa.
+        
+        Args:
+            versao (int): Última versão do mapa conhecida pelo jogador.
+        
+        Returns:
+            tuple: Versão atual do mapa e a lista de alterações [linha, coluna, célula renderizada],
+                ou None no lugar da lista se o histórico não cobrir a versão pedida.
+        """
+        with self.lock_alteracoes:
+            atual = self.versao
+            if self.alteracoes.maxlen == len(self.alteracoes):
+                self.versao_minima = max(self.versao_minima, self.alteracoes[0][0] - 1)
+            if versao < self.versao_minima:
+                return atual, None
+            posicoes = set()
+            for versao_alteracao, pos in reversed(self.alteracoes):
+                if versao_alteracao <= versao:
+                    break
+                posicoes.add(pos)
+        return atual, [[x, y, self.renderizar_celula((x, y))] for x, y in posicoes]
+
+    def exportar_estados(self):
+        """
+        Exporta o estado de cada célula do mapa, linha a linha, um byte por célula.
+        
+        Returns:
+            bytes: Estados das células (CELULA_SALA, CELULA_TESOURO ou CELULA_COLETADA).
+        """
+        estados = {simbolo: estado for estado, simbolo in enumerate(SIMBOLOS)}
+        return bytes(estados[celula] for linha in self.celulas for celula in linha)
+
+    def importar_estados(self, dados):
+        """
+        Substitui as células do mapa pelos estados exportados por `exportar_estados`.
+        
+        Args:
+            dados (bytes): Estados das células, linha a linha.
+        """
+        self.celulas = [[SIMBOLOS[estado] for estado in dados[i * self.colunas:(i + 1) * self.colunas]] for i in range(self.linhas)]
+        self.tesouros = {(i, j) for i in range(self.linhas) for j in range(self.colunas) if dados[i * self.colunas + j] == CELULA_TESOURO}
+        self.indexar_livres()
+        self.invalidar_alteracoes()
+
+    def renderizar_celula(self, pos, ocupacao=None):
+        """
+        Renderiza uma célula do mapa, exibindo o jogador que estiver nela.
+        
+        Args:
+            pos (tuple): Posição da célula (linha, coluna).
+            ocupacao (dict): Índice de ocupação a ser usado. Se None, usa o índice do mapa.
+        
+        Returns:
+            str: Representação da célula.
+        """
+        ocupantes = (self.ocupacao if ocupacao is None else ocupacao).get(pos)
+        if ocupantes:
+            return f"{colors.OKBLUE}{ocupantes[0]}{colors.ENDC}"
+        x, y = pos
+        return self.celulas[x][y]
+
+    def quadro(self, ocupacao=None, area=None):
+        """
+        Renderiza as células do mapa com a posição dos jogadores.
+        
+        Args:
+            ocupacao (dict): Índice de ocupação a ser usado. Se None, usa o índice do mapa.
+            area (tuple): Janela (linha, coluna, linhas, colunas) a ser renderizada. Se None, renderiza o mapa inteiro.
+        
+        Returns:
+            list: Matriz com a representação de cada célula da área renderizada.
+        """
+        x0, y0, linhas, colunas = area or (0, 0, self.linhas, self.colunas)
+        return [[self.renderizar_celula((i, j), ocupacao) for j in range(y0, y0 + colunas)] for i in range(x0, x0 + linhas)]
+
+    def exibir_mapa(self, jogadores=None, posicao_do_jogador="pos", area=None, origem=None):
         """
         Exibe o mapa com a posição dos jogadores.
         
+        Sem o argumento `jogadores`, as posições vêm do índice de ocupação do mapa. Um jogador que
+        está em uma sala do tesouro continua ocupando, no mapa principal, a posição por onde entrou.
+        
         Args:
-            jogadores (dict): Dicionário de jogadores com suas posições.
+            jogadores (dict): Dicionário de jogadores com suas posições. Se None, usa o índice de ocupação.
             posicao_do_jogador (str): Chave para acessar a posição do jogador no dicionário de jogadores.
+            area (tuple): Janela (linha, coluna, linhas, colunas) a ser exibida. Se None, exibe o mapa inteiro.
+            origem (tuple): Posição exibida da primeira célula. Se None, usa a posição da janela no mapa.
         
         Returns:
             str: Representação do mapa com a posição dos jogadores.
         """
-        mapa_str = "    " + " ".join(str(i) for i in range(self.colunas)) + "\n"
-        mapa_str += "  " + "-" * (self.colunas * 2 + 3) + "\n"
-        for i in range(self.linhas):
-            linha = []
-            for j in range(self.colunas):
-                jogador_na_posicao = False
-                if jogadores:
-                    for jogador_id, jogador_info in jogadores.items():
-                        if (i, j) == jogador_info.get(posicao_do_jogador, jogador_info["pos"]) and (i, j):
-                            linha.append(f"{colors.OKBLUE}{jogador_id}{colors.ENDC}")
-                            jogador_na_posicao = True
-                            break
-                if not jogador_na_posicao:
-                    linha.append(self.celulas[i][j])
-            mapa_str += str(i) + " | " + " ".join(linha) + " |\n"
-        mapa_str += "  " + "-" * (self.colunas * 2 + 3) + "\n"
-        return mapa_str
+        ocupacao = None
+        if jogadores is not None:
+            ocupacao = {}
+            for jogador_id, jogador_info in jogadores.items():
+                ocupacao.setdefault(jogador_info.get(posicao_do_jogador, jogador_info["pos"]), [jogador_id])
+        if origem is None:
+            origem = area[:2] if area else (0, 0)
+        return formatar_mapa(self.quadro(ocupacao, area), origem)
@@ -0,0 +1,220 @@
+from models.colors import colors
+from models.mapa import CELULA_COLETADA, CELULA_SALA, CELULA_TESOURO, LIMITE_ALTERACOES, SIMBOLOS, Mapa
+
+try:
+    import numpy as np
+except ImportError:  # O NumPy só é necessário para usar o MapaCompacto
+    np = None
+
+TENTATIVAS_SORTEIO = 32  # Sorteios diretos antes de procurar as posições livres em todo o mapa
+
+class MapaCompacto(Mapa):
+    """
+    Mapa que guarda o estado de cada célula em uma matriz NumPy de inteiros pequenos, para mundos muito grandes.
+    
+    As células ocupam um byte cada e as cores ANSI são aplicadas apenas na renderização. A criação,
+    a distribuição de tesouros e a renderização do mapa inteiro são vetorizadas. Os jogadores, o
+    histórico de alterações e os deltas funcionam como no Mapa.
+    
+    Atributos:
+        estados (numpy.ndarray): Matriz (linhas, colunas) com o estado de cada célula (CELULA_SALA, CELULA_TESOURO ou CELULA_COLETADA).
+        quantidade_tesouros (int): Quantidade de tesouros ainda não coletados.
+        simbolos (numpy.ndarray): Representação de cada estado, indexada pelo estado.
+    """
+    def __init__(self, linhas, colunas, rng=None):
+        """
+        Inicializa o mapa compacto com o número de linhas e colunas.
+        
+        Args:
+            linhas (int): Número de linhas do mapa.
+            colunas (int): Número de colunas do mapa.
+            rng (random.Random): Gerador dos sorteios do mapa. Um gerador com semente torna o mapa reproduzível.
+        
+        Raises:
+            ImportError: Se o NumPy não estiver instalado.
+        """
+        if np is None:
+            raise ImportError("O MapaCompacto requer o NumPy (pip install numpy)")
+        self.simbolos = np.array(SIMBOLOS, dtype=object)
+        super().__init__(linhas, colunas, rng)
+
+    def inicializar_celulas(self):
+        """
+        Cria a matriz de estados do mapa, com todas as células vazias.
+        """
+        self.estados = np.full((self.linhas, self.colunas), CELULA_SALA, dtype=np.uint8)
+        self.quantidade_tesouros = 0
+
+    def inicializar_tesouros(self, quantidade=None, sala_tesouro=False):
+        """
+        Inicializa os tesouros no mapa, sorteando de uma vez posições vazias distintas.
+        
+        Args:
+            quantidade (int): Número de tesouros a serem inicializados. Se None, um valor aleatório é escolhido.
+            sala_tesouro (bool): Indica se os tesouros estão sendo inicializados em uma sala do tesouro.
+        """
+        if sala_tesouro:
+            self.estados.fill(CELULA_TESOURO)
+            self.quantidade_tesouros = self.estados.size
+            self.invalidar_alteracoes()
+            return
+        if quantidade is None:
+            quantidade = self.rng.randint(5, 10)
+        livres = np.flatnonzero(self.estados == CELULA_SALA)
+        gerador = np.random.default_rng(self.rng.getrandbits(64))  # Segue o gerador do mapa
+        escolhidas = gerador.choice(livres, size=min(quantidade, livres.size), replace=False)
+        self.estados.flat[escolhidas] = CELULA_TESOURO
+        self.quantidade_tesouros += escolhidas.size
+        if escolhidas.size > LIMITE_ALTERACOES // 2:
+            self.invalidar_alteracoes()  # Um delta tão grande não seria menor que o mapa completo
+            return
+        for x, y in zip(*np.unravel_index(escolhidas, self.estados.shape)):
+            self.registrar_alteracao((int(x), int(y)))
+
+    def coletar_tesouro(self, pos):
+        """
+        Coleta um tesouro na posição especificada.
+        
+        Args:
+            pos (tuple): Posição do tesouro a ser coletado (linha, coluna).
+        
+        Returns:
+            bool: True se o tesouro foi coletado, False caso contrário.
+        """
+        if self.estados[pos] != CELULA_TESOURO:
+            return False
+        self.estados[pos] = CELULA_COLETADA
+        self.quantidade_tesouros -= 1
+        self.registrar_alteracao(pos)
+        return True
+
+    def marcar_coletado(self, pos):
+        """
+        Marca uma posição do mapa como já coletada, como uma sala do tesouro esvaziada.
+        
+        Args:
+            pos (tuple): Posição a ser marcada (linha, coluna).
+        """
+        if self.estados[pos] == CELULA_TESOURO:
+            self.quantidade_tesouros -= 1
+        self.estados[pos] = CELULA_COLETADA
+        self.registrar_alteracao(pos)
+
+    def todos_tesouros_coletados(self):
+        """
+        Verifica se todos os tesouros foram coletados.
+        
+        Returns:
+            bool: True se todos os tesouros foram coletados, False caso contrário.
+        """
+        return self.quantidade_tesouros == 0
+
+    def tesouros_restantes(self):
+        """
+        Retorna a quantidade de tesouros que ainda não foram coletados.
+        
+        Returns:
+            int: Número de tesouros restantes no mapa.
+        """
+        return self.quantidade_tesouros
+
+    def eh_sala_tesouro(self, pos):
+        """
+        Verifica se uma posição é uma sala do tesouro.
+        
+        Args:
+            pos (tuple): Posição a ser verificada (linha, coluna).
+        
+        Returns:
+            bool: True se a posição é uma sala do tesouro, False caso contrário.
+        """
+        return bool(self.estados[pos] == CELULA_SALA)
+
+    def contar_salas_tesouro(self):
+        """
+        Conta as posições do mapa que dão acesso a uma sala do tesouro.
+        
+        Returns:
+            int: Número de salas do tesouro no mapa.
+        """
+        return int(np.count_nonzero(self.estados == CELULA_SALA))
+
+    def posicao_aleatoria(self):
+        """
+        Retorna uma posição aleatória vazia no mapa.
+        
+        Sorteia posições diretamente, o que é rápido enquanto o mapa tem muitas células vazias, e só
+        percorre o mapa inteiro se os sorteios falharem.
+        
+        Returns:
+            tuple: Posição aleatória (linha, coluna).
+        
+        Raises:
+            ValueError: Se não houver nenhuma posição vazia no mapa.
+        """
+        for _ in range(TENTATIVAS_SORTEIO):
+            x, y = self.rng.randrange(self.linhas), self.rng.randrange(self.colunas)
+            if self.estados[x, y] == CELULA_SALA:
+                return (x, y)
+        livres = np.flatnonzero(self.estados == CELULA_SALA)
+        if not livres.size:
+            raise ValueError("Não há posições vazias no mapa")
+        x, y = np.unravel_index(livres[self.rng.randrange(livres.size)], self.estados.shape)
+        return (int(x), int(y))
+
+    def exportar_estados(self):
+        """
+        Exporta o estado de cada célula do mapa, linha a linha, um byte por célula.
+        
+        Returns:
+            bytes: Estados das células (CELULA_SALA, CELULA_TESOURO ou CELULA_COLETADA).
+        """
+        return self.estados.tobytes()
+
+    def importar_estados(self, dados):
+        """
+        Substitui as células do mapa pelos estados exportados por `exportar_estados`.
+        
+        Args:
+            dados (bytes): Estados das células, linha a linha.
+        """
+        self.estados = np.frombuffer(dados, dtype=np.uint8).reshape(self.linhas, self.colunas).copy()
+        self.quantidade_tesouros = int(np.count_nonzero(self.estados == CELULA_TESOURO))
+        self.invalidar_alteracoes()
+
+    def renderizar_celula(self, pos, ocupacao=None):
+        """
+        Renderiza uma célula do mapa, exibindo o jogador que estiver nela.
+        
+        Args:
+            pos (tuple): Posição da célula (linha, coluna).
+            ocupacao (dict): Índice de ocupação a ser usado. Se None, usa o índice do mapa.
+        
+        Returns:
+            str: Representação da célula.
+        """
+        ocupantes = (self.ocupacao if ocupacao is None else ocupacao).get(pos)
+        if ocupantes:
+            return f"{colors.OKBLUE}{ocupantes[0]}{colors.ENDC}"
+        return SIMBOLOS[self.estados[pos]]
+
+    def quadro(self, ocupacao=None, area=None):
+        """
+        Renderiza as células do mapa com a posição dos jogadores.
+        
+        Os estados são convertidos em símbolos de uma só vez; apenas as células ocupadas por jogadores
+        são renderizadas individualmente.
+        
+        Args:
+            ocupacao (dict): Índice de ocupação a ser usado. Se None, usa o índice do mapa.
+            area (tuple): Janela (linha, coluna, linhas, colunas) a ser renderizada. Se None, renderiza o mapa inteiro.
+        
+        Returns:
+            list: Matriz com a representação de cada célula da área renderizada.
+        """
+        x0, y0, linhas, colunas = area or (0, 0, self.linhas, self.colunas)
+        celulas = self.simbolos[self.estados[x0:x0 + linhas, y0:y0 + colunas]].tolist()
+        for (x, y), ocupantes in list((self.ocupacao if ocupacao is None else ocupacao).items()):
+            if ocupantes and x0 <= x < x0 + linhas and y0 <= y < y0 + colunas:
+                celulas[x - x0][y - y0] = f"{colors.OKBLUE}{ocupantes[0]}{colors.ENDC}"
+        return celulas
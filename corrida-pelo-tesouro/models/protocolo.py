@@ -0,0 +1,313 @@
+import codecs
+import json
+import struct
+
+SEPARADOR_CONTROLE = "\x1e"  # Marca o início de uma mensagem de controle no fluxo de texto
+MENSAGEM_MAPA = "MAPA"  # Mapa completo: {"celulas": [[...], ...]}, com "origem": [linha, coluna] se for apenas uma janela do mapa
+MENSAGEM_DELTA = "DELTA"  # Células alteradas: {"alteracoes": [[linha, coluna, célula], ...]}
+MENSAGEM_ESTADO = "ESTADO"  # Estado do jogador: {"jogador": id, "processados": comandos aplicados, "pos": [linha, coluna], "sala": bool}
+COMANDO_DELTA = "delta"  # Ativa o envio de deltas do mapa para o jogador
+COMANDO_SINCRONIZAR = "sincronizar"  # Pede o reenvio do mapa completo
+COMANDO_ESTADO = "estado"  # Ativa o envio do estado do jogador antes de cada resposta do mapa
+
+# Protocolo binário: o cliente o negocia enviando MAGICA_BINARIO logo após conectar. Cada quadro é
+# formado por um cabeçalho (tamanho do conteúdo, tipo do quadro) seguido do conteúdo.
+MAGICA_BINARIO = b"\x00CPT1"
+TEMPO_NEGOCIACAO = 0.2  # Segundos que o servidor aguarda pela MAGICA_BINARIO antes de assumir o protocolo de texto
+CABECALHO_QUADRO = struct.Struct("!IB")
+QUADRO_TEXTO = 1  # Texto em UTF-8: mensagens do servidor ou um comando livre do cliente
+QUADRO_COMANDOS = 2  # Lote de comandos do cliente, um código de um byte por comando
+QUADRO_MAPA = 3  # Mapa completo: linhas e colunas seguidas das células separadas por SEPARADOR_CELULAS
+QUADRO_DELTA = 4  # Sequência de alterações: linha, coluna, tamanho e célula renderizada
+QUADRO_JANELA = 5  # Janela do mapa: posição da primeira célula no mapa seguida de um QUADRO_MAPA
+QUADRO_ESTADO = 6  # Estado do jogador: ID, comandos aplicados, posição e se está em uma sala do tesouro
+TAMANHO_MAXIMO_QUADRO_CLIENTE = 4096  # Maior conteúdo, em bytes, aceito em um quadro enviado pelo cliente
+SEPARADOR_CELULAS = "\x1f"
+DIMENSOES_MAPA = struct.Struct("!HH")
+ORIGEM_JANELA = struct.Struct("!II")
+ALTERACAO = struct.Struct("!HHB")
+ESTADO_JOGADOR = struct.Struct("!IIII?")
+CODIGOS_COMANDOS = {"w": 1, "a": 2, "s": 3, "d": 4, "entrar": 5, "sair": 6, COMANDO_SINCRONIZAR: 7, COMANDO_DELTA: 8, COMANDO_ESTADO: 9}
+COMANDOS_POR_CODIGO = {codigo: comando for comando, codigo in CODIGOS_COMANDOS.items()}
+
+def codificar_controle(tipo, dados):
+    """
+    Codifica uma mensagem de controle para o protocolo de texto.
+    
+    Args:
+        tipo (str): Tipo da mensagem, como MENSAGEM_MAPA ou MENSAGEM_DELTA.
+        dados (dict): Conteúdo da mensagem.
+    
+    Returns:
+        bytes: Mensagem codificada, terminada por quebra de linha.
+    """
+    return f"{SEPARADOR_CONTROLE}{tipo} {json.dumps(dados, ensure_ascii=False, separators=(',', ':'))}\n".encode()
+
+class DecodificadorTexto:
+    """
+    Separa o fluxo de texto recebido do servidor em texto comum e mensagens de controle.
+    
+    Atributos:
+        decodificador (codecs.IncrementalDecoder): Decodificador UTF-8 tolerante a caracteres divididos entre leituras.
+        pendente (str): Mensagem de controle recebida parcialmente.
+    """
+    def __init__(self):
+        """
+        Inicializa o decodificador sem dados pendentes.
+        """
+        self.decodificador = codecs.getincrementaldecoder("utf-8")()
+        self.pendente = ""
+
+    def alimentar(self, dados):
+        """
+        Processa os bytes recebidos do servidor.
+        
+        Args:
+            dados (bytes): Bytes recebidos do socket.
+        
+        Returns:
+            list: Pares (tipo, conteúdo). O tipo é None para texto comum, cujo conteúdo é a string recebida,
+                e o tipo da mensagem para mensagens de controle, cujo conteúdo é o dicionário decodificado.
+        """
+        texto = self.pendente + self.decodificador.decode(dados)
+        self.pendente = ""
+        mensagens = []
+        while texto:
+            inicio = texto.find(SEPARADOR_CONTROLE)
+            if inicio == -1:
+                mensagens.append((None, texto))
+                break
+            if inicio > 0:
+                mensagens.append((None, texto[:inicio]))
+            fim = texto.find("\n", inicio)
+            if fim == -1:
+                self.pendente = texto[inicio:]  # Aguarda o restante da mensagem de controle
+                break
+            tipo, _, conteudo = texto[inicio + 1:fim].partition(" ")
+            mensagens.append((tipo, json.loads(conteudo)))
+            texto = texto[fim + 1:]
+        return mensagens
+
+def codificar_quadro(tipo, conteudo):
+    """
+    Codifica um quadro do protocolo binário.
+    
+    Args:
+        tipo (int): Tipo do quadro, como QUADRO_TEXTO ou QUADRO_COMANDOS.
+        conteudo (bytes): Conteúdo do quadro.
+    
+    Returns:
+        bytes: Quadro com o cabeçalho de tamanho e tipo.
+    """
+    return CABECALHO_QUADRO.pack(len(conteudo), tipo) + conteudo
+
+def codificar_comandos(comandos):
+    """
+    Codifica um lote de comandos em um único quadro binário.
+    
+    Args:
+        comandos (list): Comandos a serem enviados, todos presentes em CODIGOS_COMANDOS.
+    
+    Returns:
+        bytes: Quadro QUADRO_COMANDOS com um byte por comando.
+    """
+    return codificar_quadro(QUADRO_COMANDOS, bytes(CODIGOS_COMANDOS[comando] for comando in comandos))
+
+def decodificar_comandos(conteudo):
+    """
+    Decodifica o conteúdo de um quadro QUADRO_COMANDOS.
+    
+    Args:
+        conteudo (bytes): Códigos dos comandos.
+    
+    Returns:
+        list: Comandos em texto. Códigos desconhecidos viram comandos vazios, tratados como inválidos.
+    """
+    return [COMANDOS_POR_CODIGO.get(codigo, "") for codigo in conteudo]
+
+def codificar_mapa(celulas):
+    """
+    Codifica o conteúdo de um quadro QUADRO_MAPA.
+    
+    Args:
+        celulas (list): Matriz com a representação de cada célula do mapa.
+    
+    Returns:
+        bytes: Dimensões do mapa seguidas das células.
+    """
+    colunas = len(celulas[0]) if celulas else 0
+    return DIMENSOES_MAPA.pack(len(celulas), colunas) + SEPARADOR_CELULAS.join(celula for linha in celulas for celula in linha).encode()
+
+def decodificar_mapa(conteudo):
+    """
+    Decodifica o conteúdo de um quadro QUADRO_MAPA.
+    
+    Args:
+        conteudo (bytes): Conteúdo do quadro.
+    
+    Returns:
+        list: Matriz com a representação de cada célula do mapa.
+    """
+    linhas, colunas = DIMENSOES_MAPA.unpack_from(conteudo)
+    celulas = conteudo[DIMENSOES_MAPA.size:].decode().split(SEPARADOR_CELULAS)
+    return [celulas[i * colunas:(i + 1) * colunas] for i in range(linhas)]
+
+def codificar_janela(celulas, origem):
+    """
+    Codifica o conteúdo de um quadro QUADRO_JANELA.
+    
+    Args:
+        celulas (list): Matriz com a representação de cada célula da janela.
+        origem (tuple): Posição no mapa (linha, coluna) da primeira célula da janela.
+    
+    Returns:
+        bytes: Origem da janela seguida do conteúdo de um QUADRO_MAPA.
+    """
+    return ORIGEM_JANELA.pack(*origem) + codificar_mapa(celulas)
+
+def decodificar_janela(conteudo):
+    """
+    Decodifica o conteúdo de um quadro QUADRO_JANELA.
+    
+    Args:
+        conteudo (bytes): Conteúdo do quadro.
+    
+    Returns:
+        tuple: Matriz com a representação de cada célula da janela e a origem [linha, coluna] da janela.
+    """
+    return decodificar_mapa(conteudo[ORIGEM_JANELA.size:]), list(ORIGEM_JANELA.unpack_from(conteudo))
+
+def codificar_delta(alteracoes):
+    """
+    Codifica o conteúdo de um quadro QUADRO_DELTA.
+    
+    Args:
+        alteracoes (list): Alterações [linha, coluna, célula renderizada].
+    
+    Returns:
+        bytes: Alterações codificadas em sequência.
+    """
+    partes = []
+    for x, y, celula in alteracoes:
+        celula = celula.encode()
+        partes.append(ALTERACAO.pack(x, y, len(celula)) + celula)
+    return b"".join(partes)
+
+def decodificar_delta(conteudo):
+    """
+    Decodifica o conteúdo de um quadro QUADRO_DELTA.
+    
+    Args:
+        conteudo (bytes): Conteúdo do quadro.
+    
+    Returns:
+        list: Alterações [linha, coluna, célula renderizada].
+    """
+    alteracoes = []
+    inicio = 0
+    while inicio < len(conteudo):
+        x, y, tamanho = ALTERACAO.unpack_from(conteudo, inicio)
+        inicio += ALTERACAO.size
+        alteracoes.append([x, y, conteudo[inicio:inicio + tamanho].decode()])
+        inicio += tamanho
+    return alteracoes
+
+def codificar_estado(estado):
+    """
+    Codifica o conteúdo de um quadro QUADRO_ESTADO.
+    
+    Args:
+        estado (dict): Estado do jogador, no formato da MENSAGEM_ESTADO.
+    
+    Returns:
+        bytes: Estado codificado.
+    """
+    return ESTADO_JOGADOR.pack(estado["jogador"], estado["processados"], *estado["pos"], estado["sala"])
+
+def decodificar_estado(conteudo):
+    """
+    Decodifica o conteúdo de um quadro QUADRO_ESTADO.
+    
+    Args:
+        conteudo (bytes): Conteúdo do quadro.
+    
+    Returns:
+        dict: Estado do jogador, no formato da MENSAGEM_ESTADO.
+    """
+    jogador, processados, x, y, sala = ESTADO_JOGADOR.unpack(conteudo)
+    return {"jogador": jogador, "processados": processados, "pos": [x, y], "sala": sala}
+
+class DecodificadorQuadros:
+    """
+    Separa o fluxo de bytes do protocolo binário em quadros completos.
+    
+    Atributos:
+        buffer (bytearray): Bytes recebidos que ainda não formam um quadro completo.
+        tamanho_maximo (int): Maior conteúdo aceito em um quadro, ou None para não limitar.
+    """
+    def __init__(self, tamanho_maximo=None):
+        """
+        Inicializa o decodificador com o buffer vazio.
+        
+        Args:
+            tamanho_maximo (int): Maior conteúdo aceito em um quadro, ou None para não limitar.
+        """
+        self.buffer = bytearray()
+        self.tamanho_maximo = tamanho_maximo
+
+    def alimentar(self, dados):
+        """
+        Processa os bytes recebidos do socket.
+        
+        Args:
+            dados (bytes): Bytes recebidos do socket.
+        
+        Returns:
+            list: Pares (tipo, conteúdo) dos quadros completos recebidos.
+        
+        Raises:
+            ConnectionResetError: Se um quadro declara um conteúdo maior que o tamanho máximo.
+        """
+        self.buffer += dados
+        quadros = []
+        inicio = 0
+        while len(self.buffer) - inicio >= CABECALHO_QUADRO.size:
+            tamanho, tipo = CABECALHO_QUADRO.unpack_from(self.buffer, inicio)
+            if self.tamanho_maximo is not None and tamanho > self.tamanho_maximo:
+                raise ConnectionResetError(f"Quadro de {tamanho} bytes excede o máximo de {self.tamanho_maximo} bytes")
+            fim = inicio + CABECALHO_QUADRO.size + tamanho
+            if len(self.buffer) < fim:
+                break  # Aguarda o restante do quadro
+            quadros.append((tipo, bytes(self.buffer[inicio + CABECALHO_QUADRO.size:fim])))
+            inicio = fim
+        del self.buffer[:inicio]
+        return quadros
+
+class DecodificadorBinario(DecodificadorQuadros):
+    """
+    Decodifica os quadros enviados pelo servidor no mesmo formato produzido pelo DecodificadorTexto.
+    """
+    def alimentar(self, dados):
+        """
+        Processa os bytes recebidos do servidor.
+        
+        Args:
+            dados (bytes): Bytes recebidos do socket.
+        
+        Returns:
+            list: Pares (tipo, conteúdo), como em DecodificadorTexto.alimentar.
+        """
+        mensagens = []
+        for tipo, conteudo in super().alimentar(dados):
+            if tipo == QUADRO_TEXTO:
+                mensagens.append((None, conteudo.decode()))
+            elif tipo == QUADRO_MAPA:
+                mensagens.append((MENSAGEM_MAPA, {"celulas": decodificar_mapa(conteudo)}))
+            elif tipo == QUADRO_JANELA:
+                celulas, origem = decodificar_janela(conteudo)
+                mensagens.append((MENSAGEM_MAPA, {"celulas": celulas, "origem": origem}))
+            elif tipo == QUADRO_DELTA:
+                mensagens.append((MENSAGEM_DELTA, {"alteracoes": decodificar_delta(conteudo)}))
+            elif tipo == QUADRO_ESTADO:
+                mensagens.append((MENSAGEM_ESTADO, decodificar_estado(conteudo)))
+        return mensagens
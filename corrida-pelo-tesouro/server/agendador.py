@@ -0,0 +1,158 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class Tarefa:
+    """
+    Chamada agendada para um instante futuro, que pode ser cancelada antes de executar.
+    
+    Atributos:
+        funcao (callable): Função a ser chamada.
+        args (tuple): Argumentos da função.
+        cancelada (bool): Indica se a tarefa foi cancelada.
+    """
+    def __init__(self, funcao, args):
+        """
+        Inicializa a tarefa.
+        
+        Args:
+            funcao (callable): Função a ser chamada.
+            args (tuple): Argumentos da função.
+        """
+        self.funcao = funcao
+        self.args = args
+        self.cancelada = False
+
+    def cancelar(self):
+        """
+        Cancela a tarefa. Se ela já estiver executando, o cancelamento não tem efeito.
+        """
+        self.cancelada = True
+
+    def executar(self):
+        """
+        Executa a tarefa, caso ela não tenha sido cancelada.
+        """
+        if self.cancelada:
+            return
+        try:
+            self.funcao(*self.args)
+        except Exception as erro:
+            print(f"Erro ao executar tarefa agendada: {erro}")
+
+
+class Agendador:
+    """
+    Executa tarefas em prazos definidos usando uma única thread para todos os prazos.
+    
+    As tarefas ficam em um heap ordenado pelo prazo; a thread dorme até o prazo mais próximo
+    ou até uma nova tarefa ser agendada.
+    
+    Atributos:
+        tarefas (list): Heap de (prazo, sequência, tarefa).
+        condicao (threading.Condition): Sinaliza a thread quando uma nova tarefa é agendada.
+        sequencia (itertools.count): Desempata tarefas com o mesmo prazo pela ordem de agendamento.
+        thread (threading.Thread): Thread que executa as tarefas, iniciada no primeiro agendamento.
+        encerrado (bool): Indica se o agendador foi encerrado e não executa mais tarefas.
+    """
+    def __init__(self):
+        """
+        Inicializa o agendador sem tarefas.
+        """
+        self.tarefas = []
+        self.condicao = threading.Condition()
+        self.sequencia = itertools.count()
+        self.thread = None
+        self.encerrado = False
+
+    def agendar(self, atraso, funcao, *args):
+        """
+        Agenda uma chamada para daqui a `atraso` segundos.
+        
+        Args:
+            atraso (float): Segundos até a execução.
+            funcao (callable): Função a ser chamada.
+            *args: Argumentos da função.
+        
+        Returns:
+            Tarefa: Tarefa agendada, que pode ser cancelada.
+        """
+        tarefa = Tarefa(funcao, args)
+        with self.condicao:
+            if self.encerrado:
+                tarefa.cancelar()
+                return tarefa
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.executar, daemon=True)
+                self.thread.start()
+            heapq.heappush(self.tarefas, (time.monotonic() + atraso, next(self.sequencia), tarefa))
+            self.condicao.notify()
+        return tarefa
+
+    def executar(self):
+        """
+        Executa as tarefas à medida que seus prazos vencem.
+        """
+        while True:
+            with self.condicao:
+                while True:
+                    if self.encerrado:
+                        return
+                    if not self.tarefas:
+                        self.condicao.wait()
+                        continue
+                    restante = self.tarefas[0][0] - time.monotonic()
+                    if restante <= 0:
+                        tarefa = heapq.heappop(self.tarefas)[2]
+                        break
+                    self.condicao.wait(restante)
+            tarefa.executar()
+
+    def encerrar(self):
+        """
+        Descarta as tarefas pendentes e termina a thread do agendador. Tarefas agendadas depois disso não são executadas.
+        """
+        with self.condicao:
+            self.encerrado = True
+            self.tarefas.clear()
+            self.condicao.notify()
+
+
+class AgendadorAsync:
+    """
+    Agendador com a mesma interface do Agendador que executa as tarefas dentro de um laço de eventos do asyncio.
+    
+    Atributos:
+        laco (asyncio.AbstractEventLoop): Laço de eventos que executa as tarefas.
+    """
+    def __init__(self, laco):
+        """
+        Inicializa o agendador sobre um laço de eventos.
+        
+        Args:
+            laco (asyncio.AbstractEventLoop): Laço de eventos que executa as tarefas.
+        """
+        self.laco = laco
+
+    def agendar(self, atraso, funcao, *args):
+        """
+        Agenda uma chamada para daqui a `atraso` segundos.
+        
+        Args:
+            atraso (float): Segundos até a execução.
+            funcao (callable): Função a ser chamada.
+            *args: Argumentos da função.
+        
+        Returns:
+            Tarefa: Tarefa agendada, que pode ser cancelada.
+        """
+        tarefa = Tarefa(funcao, args)
+        self.laco.call_later(atraso, tarefa.executar)
+        return tarefa
+
+    def encerrar(self):
+        """
+        Não faz nada: as tarefas pendentes terminam junto com o laço de eventos.
+        """
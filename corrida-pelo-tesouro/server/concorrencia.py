@@ -0,0 +1,63 @@
+import threading
+from contextlib import contextmanager
+
+from server.metricas import metricas
+
+
+class LocksRegionais:
+    """
+    Divide o mapa em regiões retangulares, cada uma protegida por seu próprio lock.
+    
+    Movimentos em partes distantes do mapa adquirem locks diferentes e podem ocorrer em paralelo.
+    Os locks de várias regiões são sempre adquiridos em ordem crescente de índice, evitando deadlocks.
+    
+    Atributos:
+        linhas_regiao (int): Número de linhas do mapa cobertas por cada região.
+        colunas_regiao (int): Número de colunas do mapa cobertas por cada região.
+        regioes_por_linha (int): Quantidade de regiões em cada faixa horizontal do mapa.
+        locks (list): Lock de cada região.
+    """
+    def __init__(self, linhas, colunas, tamanho_regiao=(4, 4)):
+        """
+        Inicializa os locks das regiões do mapa.
+        
+        Args:
+            linhas (int): Número de linhas do mapa.
+            colunas (int): Número de colunas do mapa.
+            tamanho_regiao (tuple): Tamanho de cada região (linhas, colunas).
+        """
+        self.linhas_regiao, self.colunas_regiao = tamanho_regiao
+        self.regioes_por_linha = -(-colunas // self.colunas_regiao)
+        quantidade = -(-linhas // self.linhas_regiao) * self.regioes_por_linha
+        self.locks = [threading.Lock() for _ in range(quantidade)]
+
+    def regiao(self, pos):
+        """
+        Retorna o índice da região que contém uma posição.
+        
+        Args:
+            pos (tuple): Posição no mapa (linha, coluna).
+        
+        Returns:
+            int: Índice da região.
+        """
+        x, y = pos
+        return (x // self.linhas_regiao) * self.regioes_por_linha + y // self.colunas_regiao
+
+    @contextmanager
+    def regioes(self, *posicoes):
+        """
+        Adquire os locks das regiões que contêm as posições informadas.
+        
+        Args:
+            *posicoes (tuple): Posições no mapa (linha, coluna) que serão lidas ou alteradas.
+        """
+        indices = sorted({self.regiao(pos) for pos in posicoes})
+        with metricas.cronometrar("espera_lock_segundos", lock="mapa"):
+            for indice in indices:
+                self.locks[indice].acquire()
+        try:
+            yield
+        finally:
+            for indice in reversed(indices):
+                self.locks[indice].release()
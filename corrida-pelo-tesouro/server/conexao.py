@@ -0,0 +1,444 @@
+import os
+import socket
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from models.protocolo import (
+    MENSAGEM_DELTA, MENSAGEM_ESTADO, MENSAGEM_MAPA, QUADRO_COMANDOS, QUADRO_DELTA, QUADRO_ESTADO, QUADRO_JANELA,
+    QUADRO_MAPA, QUADRO_TEXTO, TAMANHO_MAXIMO_QUADRO_CLIENTE, DecodificadorQuadros, codificar_controle, codificar_delta, codificar_estado,
+    codificar_janela, codificar_mapa, codificar_quadro, decodificar_comandos,
+)
+
+LIMITE_FILA_SAIDA = int(os.getenv("LIMITE_FILA_SAIDA_KB", "256")) * 1024  # Bytes aguardando envio a um jogador a partir dos quais ele é desconectado
+TEMPO_MAXIMO_ATRASO = float(os.getenv("TEMPO_MAXIMO_ATRASO", "5"))  # Segundos que os envios a um jogador podem ficar parados antes de ele ser desconectado
+INTERVALO_REENVIO = 0.05  # Segundos entre tentativas de envio a um jogador cujo socket está cheio
+ENVIO_SEM_BLOQUEIO = getattr(socket, "MSG_DONTWAIT", 0)  # Sem MSG_DONTWAIT, o envio bloqueia como antes
+SAIDA_COMUM = 0  # Mensagem que sempre é entregue
+SAIDA_DELTA = 1  # Células alteradas do mapa, dispensáveis se um mapa completo for enfileirado depois delas
+SAIDA_MAPA = 2  # Mapa completo, que substitui os mapas e deltas ainda não enviados
+
+
+class ConexaoTexto:
+    """
+    Conexão com um jogador que usa o protocolo de texto original, em que cada leitura do socket é um comando.
+    
+    As mensagens enviadas ao jogador passam por uma fila de saída. Dentro de `agrupar`, as mensagens
+    de um comando são acumuladas e enviadas juntas em uma única escrita ao final; fora dele, cada
+    mensagem é enviada assim que enfileirada. As escritas nunca bloqueiam: o que o socket não aceitar
+    permanece na fila e é reenviado pelo agendador. Um mapa completo enfileirado substitui os mapas e
+    deltas que ainda não foram enviados, e o jogador é desconectado se a fila passar de
+    LIMITE_FILA_SAIDA bytes além dos mapas ou ficar parada por mais de TEMPO_MAXIMO_ATRASO segundos.
+    
+    Atributos:
+        transporte (socket.socket): Socket (ou adaptador com a mesma interface) da conexão.
+        comandos (deque): Comandos já recebidos e ainda não processados.
+        binario (bool): Indica se a conexão usa o protocolo binário.
+        bytes_enviados (int): Bytes enviados ao jogador.
+        envios (int): Chamadas de envio feitas ao transporte.
+        agendador (Agendador): Agendador dos reenvios quando o socket está cheio, ou None para completar o envio bloqueando.
+        fila_saida (deque): Mensagens (bytes, tipo) ainda não enviadas; o tipo é SAIDA_COMUM, SAIDA_DELTA ou SAIDA_MAPA.
+        bytes_pendentes (int): Bytes na fila de saída.
+        quadros_substituidos (int): Mapas e deltas descartados da fila por um mapa completo mais recente.
+        tamanho_mapa (int): Bytes do último mapa completo enfileirado.
+        agrupamentos (int): Blocos `agrupar` em andamento; enquanto houver algum, a fila só é enviada ao final deles.
+        parado_desde (float): Instante monotônico em que o socket deixou de aceitar todos os dados, ou None.
+        reenvio_agendado (bool): Indica se um reenvio já está agendado.
+        atrasada (bool): Indica se a conexão foi encerrada por não acompanhar os envios.
+        encerrada (bool): Indica se a conexão foi fechada.
+        lock_envio (threading.Lock): Protege a fila de saída e impede que envios de threads diferentes se misturem.
+    """
+    binario = False
+
+    def __init__(self, transporte, dados_iniciais=b"", agendador=None):
+        """
+        Inicializa a conexão sobre um transporte já conectado.
+        
+        Args:
+            transporte (socket.socket): Socket (ou adaptador com a mesma interface) da conexão.
+            dados_iniciais (bytes): Bytes lidos durante a negociação do protocolo que já fazem parte dos comandos.
+            agendador (Agendador): Agendador dos reenvios quando o socket está cheio.
+        """
+        self.transporte = transporte
+        self.comandos = deque()
+        self.bytes_enviados = 0
+        self.envios = 0
+        self.agendador = agendador
+        self.fila_saida = deque()
+        self.bytes_pendentes = 0
+        self.quadros_substituidos = 0
+        self.tamanho_mapa = 0
+        self.agrupamentos = 0
+        self.parado_desde = None
+        self.reenvio_agendado = False
+        self.atrasada = False
+        self.encerrada = False
+        self.lock_envio = threading.Lock()
+        if dados_iniciais:
+            self.comandos.extend(self.decodificar(dados_iniciais))
+
+    def send(self, dados):
+        """
+        Envia uma mensagem de texto ao jogador.
+        
+        Args:
+            dados (bytes): Mensagem codificada em UTF-8.
+        
+        Returns:
+            int: Quantidade de bytes da mensagem.
+        """
+        self.enviar_codificado(self.codificar_texto(dados))
+        return len(dados)
+
+    def codificar_texto(self, dados):
+        """
+        Codifica uma mensagem de texto como ela é transmitida nesta conexão, para que uma mesma mensagem
+        enviada a vários jogadores seja codificada uma única vez.
+        
+        Args:
+            dados (bytes): Mensagem codificada em UTF-8.
+        
+        Returns:
+            bytes: Bytes transmitidos; no protocolo de texto, a própria mensagem.
+        """
+        return dados
+
+    def enviar_codificado(self, dados):
+        """
+        Envia bytes já codificados para esta conexão.
+        
+        Args:
+            dados (bytes): Bytes produzidos por `codificar_texto`.
+        
+        Returns:
+            int: Quantidade de bytes enfileirados.
+        """
+        self.enfileirar(dados)
+        return len(dados)
+
+    def enviar_mapa_renderizado(self, dados):
+        """
+        Envia o mapa renderizado em texto, substituindo um mapa anterior que ainda não foi enviado.
+        
+        Args:
+            dados (bytes): Mapa renderizado, codificado em UTF-8.
+        """
+        self.enfileirar(self.codificar_texto(dados), SAIDA_MAPA)
+
+    def enfileirar(self, dados, tipo=SAIDA_COMUM):
+        """
+        Acrescenta bytes codificados à fila de saída e os envia, a menos que um bloco `agrupar` esteja em andamento.
+        
+        Args:
+            dados (bytes): Bytes codificados.
+            tipo (int): SAIDA_COMUM, SAIDA_DELTA ou SAIDA_MAPA.
+        
+        Raises:
+            ConnectionResetError: Se a conexão já foi fechada.
+        """
+        with self.lock_envio:
+            if self.encerrada:
+                raise ConnectionResetError("Conexão encerrada")
+            if tipo == SAIDA_MAPA:
+                self.tamanho_mapa = len(dados)
+                mantidas = [mensagem for mensagem in self.fila_saida if mensagem[1] == SAIDA_COMUM]
+                if len(mantidas) < len(self.fila_saida):
+                    self.quadros_substituidos += len(self.fila_saida) - len(mantidas)
+                    self.fila_saida = deque(mantidas)
+                    self.bytes_pendentes = sum(len(mensagem[0]) for mensagem in mantidas)
+            self.fila_saida.append((dados, tipo))
+            self.bytes_pendentes += len(dados)
+            if self.bytes_pendentes > LIMITE_FILA_SAIDA + 2 * self.tamanho_mapa:  # A fila comporta um mapa parcialmente enviado e o mapa que o substitui
+                self.encerrar_atrasada()
+                return
+            if self.agrupamentos:
+                return
+        self.descarregar()
+
+    @contextmanager
+    def agrupar(self):
+        """
+        Acumula as mensagens enviadas dentro do bloco e as envia juntas, em uma única escrita, ao final dele.
+        """
+        with self.lock_envio:
+            self.agrupamentos += 1
+        try:
+            yield self
+        finally:
+            with self.lock_envio:
+                self.agrupamentos -= 1
+                pendente = not self.agrupamentos and self.fila_saida
+            if pendente:
+                self.descarregar()
+
+    def descarregar(self):
+        """
+        Envia a fila de saída em uma única escrita sem bloquear.
+        
+        O que o socket não aceitar permanece na fila, com a primeira mensagem parcialmente enviada
+        marcada como SAIDA_COMUM para que não seja substituída, e um reenvio é agendado.
+        
+        Raises:
+            OSError: Se o envio falhar por outro motivo que não o socket cheio.
+        """
+        with self.lock_envio:
+            if self.encerrada or not self.fila_saida:
+                return
+            dados = self.fila_saida[0][0] if len(self.fila_saida) == 1 else b"".join(mensagem[0] for mensagem in self.fila_saida)
+            try:
+                enviados = self.transporte.send(dados, ENVIO_SEM_BLOQUEIO)
+            except BlockingIOError:
+                enviados = 0
+            self.bytes_enviados += enviados
+            self.envios += 1
+            self.bytes_pendentes -= enviados
+            while enviados and enviados >= len(self.fila_saida[0][0]):
+                enviados -= len(self.fila_saida.popleft()[0])
+            if enviados:
+                self.fila_saida[0] = (self.fila_saida[0][0][enviados:], SAIDA_COMUM)
+            if not self.fila_saida:
+                self.parado_desde = None
+                return
+            agora = time.monotonic()
+            if self.parado_desde is None:
+                self.parado_desde = agora
+            elif agora - self.parado_desde > TEMPO_MAXIMO_ATRASO:
+                self.encerrar_atrasada()
+                return
+            if self.agendador is None:
+                self.transporte.sendall(b"".join(mensagem[0] for mensagem in self.fila_saida))  # Sem agendador, completa o envio bloqueando
+                self.bytes_enviados += self.bytes_pendentes
+                self.fila_saida.clear()
+                self.bytes_pendentes = 0
+                self.parado_desde = None
+                return
+            if not self.reenvio_agendado:
+                self.reenvio_agendado = True
+                self.agendador.agendar(INTERVALO_REENVIO, self.reenviar)
+
+    def concluir_envios(self):
+        """
+        Envia toda a fila de saída, bloqueando até que o socket aceite todos os dados.
+        
+        Usado quando a conexão vai ser repassada a outro processo, que deve encontrá-la sem mensagens pendentes.
+        """
+        with self.lock_envio:
+            dados = b"".join(mensagem[0] for mensagem in self.fila_saida)
+            self.fila_saida.clear()
+            self.bytes_pendentes = 0
+            self.parado_desde = None
+            if dados:
+                self.transporte.sendall(dados)
+                self.bytes_enviados += len(dados)
+                self.envios += 1
+
+    def reenviar(self):
+        """
+        Tenta novamente enviar a fila de saída; chamada pelo agendador.
+        """
+        with self.lock_envio:
+            self.reenvio_agendado = False
+        try:
+            self.descarregar()
+        except OSError:
+            with self.lock_envio:
+                self.encerrar()
+
+    def encerrar_atrasada(self):
+        """
+        Encerra a conexão de um jogador que não acompanha os envios. O lock de envio já deve estar adquirido.
+        """
+        self.atrasada = True
+        self.encerrar()
+
+    def encerrar(self):
+        """
+        Descarta a fila de saída e interrompe a conexão, o que encerra a leitura dos comandos do jogador
+        e faz com que ele seja desconectado pelo caminho normal.
+        """
+        self.encerrada = True
+        self.fila_saida.clear()
+        self.bytes_pendentes = 0
+        try:
+            self.transporte.shutdown(socket.SHUT_RDWR)
+        except AttributeError:
+            self.transporte.close()  # Adaptadores sem shutdown, como o do asyncio, encerram a conexão ao fechar
+        except OSError:
+            pass
+
+    def close(self):
+        """
+        Envia o que ainda for possível da fila de saída e fecha a conexão com o jogador.
+        """
+        try:
+            self.descarregar()
+        except OSError:
+            pass
+        with self.lock_envio:
+            self.encerrada = True
+            self.fila_saida.clear()
+            self.bytes_pendentes = 0
+        self.transporte.close()
+
+    def decodificar(self, dados):
+        """
+        Converte os bytes recebidos do jogador em comandos.
+        
+        Args:
+            dados (bytes): Bytes recebidos do socket.
+        
+        Returns:
+            list: Comandos recebidos, em minúsculas e sem espaços nas extremidades. Bytes que não formam
+                UTF-8 válido são substituídos, e o comando é tratado como inválido.
+        
+        Raises:
+            ConnectionResetError: Se o jogador encerrou a conexão.
+        """
+        if not dados:
+            raise ConnectionResetError("Conexão encerrada pelo jogador")
+        return [dados.decode(errors="replace").strip().lower()]
+
+    def receber_comando(self, tamanho=1024):
+        """
+        Retorna o próximo comando do jogador, aguardando novos dados do socket se necessário.
+        
+        Args:
+            tamanho (int): Quantidade máxima de bytes lidos por chamada ao socket.
+        
+        Returns:
+            str: Próximo comando recebido.
+        """
+        while not self.comandos:
+            self.comandos.extend(self.decodificar(self.transporte.recv(tamanho)))
+        return self.comandos.popleft()
+
+    def enviar_mapa(self, celulas, origem=None):
+        """
+        Envia o mapa completo, ou a janela do mapa visível ao jogador, como mensagem de controle.
+        
+        Args:
+            celulas (list): Matriz com a representação de cada célula do mapa.
+            origem (tuple): Posição no mapa (linha, coluna) da primeira célula, se apenas uma janela é enviada.
+        """
+        dados = {"celulas": celulas}
+        if origem is not None:
+            dados["origem"] = list(origem)
+        self.enfileirar(codificar_controle(MENSAGEM_MAPA, dados), SAIDA_MAPA)
+
+    def enviar_delta(self, alteracoes):
+        """
+        Envia as células alteradas do mapa como mensagem de controle.
+        
+        Args:
+            alteracoes (list): Alterações [linha, coluna, célula renderizada].
+        """
+        self.enfileirar(codificar_controle(MENSAGEM_DELTA, {"alteracoes": alteracoes}), SAIDA_DELTA)
+
+    def enviar_estado(self, estado):
+        """
+        Envia o estado do jogador como mensagem de controle.
+        
+        Args:
+            estado (dict): Estado do jogador, no formato da MENSAGEM_ESTADO.
+        """
+        self.send(codificar_controle(MENSAGEM_ESTADO, estado))
+
+
+class ConexaoBinaria(ConexaoTexto):
+    """
+    Conexão com um jogador que negociou o protocolo binário de quadros com prefixo de tamanho.
+    
+    Atributos:
+        decodificador (DecodificadorQuadros): Remonta os quadros recebidos do jogador.
+    """
+    binario = True
+
+    def __init__(self, transporte, dados_iniciais=b"", agendador=None):
+        """
+        Inicializa a conexão sobre um transporte já conectado.
+        
+        Args:
+            transporte (socket.socket): Socket (ou adaptador com a mesma interface) da conexão.
+            dados_iniciais (bytes): Bytes recebidos logo após a negociação do protocolo.
+            agendador (Agendador): Agendador dos reenvios quando o socket está cheio.
+        """
+        self.decodificador = DecodificadorQuadros(TAMANHO_MAXIMO_QUADRO_CLIENTE)
+        super().__init__(transporte, dados_iniciais, agendador)
+
+    def codificar_texto(self, dados):
+        """
+        Codifica uma mensagem de texto em um quadro QUADRO_TEXTO.
+        
+        Args:
+            dados (bytes): Mensagem codificada em UTF-8.
+        
+        Returns:
+            bytes: Quadro completo.
+        """
+        return codificar_quadro(QUADRO_TEXTO, dados)
+
+    def enviar_quadro(self, tipo, conteudo, saida=SAIDA_COMUM):
+        """
+        Envia um quadro completo ao jogador.
+        
+        Args:
+            tipo (int): Tipo do quadro.
+            conteudo (bytes): Conteúdo do quadro.
+            saida (int): Tipo da mensagem na fila de saída: SAIDA_COMUM, SAIDA_DELTA ou SAIDA_MAPA.
+        """
+        self.enfileirar(codificar_quadro(tipo, conteudo), saida)
+
+    def decodificar(self, dados):
+        """
+        Converte os bytes recebidos do jogador nos comandos dos quadros completos.
+        
+        Args:
+            dados (bytes): Bytes recebidos do socket.
+        
+        Returns:
+            list: Comandos recebidos, na ordem em que foram enviados. Pode ser vazia se nenhum quadro foi completado.
+        
+        Raises:
+            ConnectionResetError: Se o jogador encerrou a conexão ou enviou um quadro maior que TAMANHO_MAXIMO_QUADRO_CLIENTE.
+        """
+        if not dados:
+            raise ConnectionResetError("Conexão encerrada pelo jogador")
+        comandos = []
+        for tipo, conteudo in self.decodificador.alimentar(dados):
+            if tipo == QUADRO_COMANDOS:
+                comandos.extend(decodificar_comandos(conteudo))
+            elif tipo == QUADRO_TEXTO:
+                comandos.append(conteudo.decode(errors="replace").strip().lower())
+        return comandos
+
+    def enviar_mapa(self, celulas, origem=None):
+        """
+        Envia o mapa completo em um quadro QUADRO_MAPA, ou a janela do mapa visível ao jogador em um quadro QUADRO_JANELA.
+        
+        Args:
+            celulas (list): Matriz com a representação de cada célula do mapa.
+            origem (tuple): Posição no mapa (linha, coluna) da primeira célula, se apenas uma janela é enviada.
+        """
+        if origem is None:
+            self.enviar_quadro(QUADRO_MAPA, codificar_mapa(celulas), SAIDA_MAPA)
+        else:
+            self.enviar_quadro(QUADRO_JANELA, codificar_janela(celulas, origem), SAIDA_MAPA)
+
+    def enviar_delta(self, alteracoes):
+        """
+        Envia as células alteradas do mapa em um quadro QUADRO_DELTA.
+        
+        Args:
+            alteracoes (list): Alterações [linha, coluna, célula renderizada].
+        """
+        self.enviar_quadro(QUADRO_DELTA, codificar_delta(alteracoes), SAIDA_DELTA)
+
+    def enviar_estado(self, estado):
+        """
+        Envia o estado do jogador em um quadro QUADRO_ESTADO.
+        
+        Args:
+            estado (dict): Estado do jogador, no formato da MENSAGEM_ESTADO.
+        """
+        self.enviar_quadro(QUADRO_ESTADO, codificar_estado(estado))
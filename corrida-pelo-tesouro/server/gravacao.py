@@ -0,0 +1,89 @@
+import json
+import os
+import threading
+import time
+
+from server.persistencia import Diario
+
+ARQUIVO_GRAVACAO = os.getenv("ARQUIVO_GRAVACAO", "")  # Arquivo em que as entradas dos jogadores são gravadas; vazio desativa a gravação
+EVENTO_CONECTOU = "conectou"  # Jogador registrado no mapa principal
+EVENTO_COMANDO = "comando"  # Comando aplicado ao jogo
+EVENTO_DESCONECTOU = "desconectou"  # Jogador removido do jogo
+EVENTO_EXPIROU = "expirou"  # Tempo do jogador na sala do tesouro esgotado
+
+
+class GravacaoPartida:
+    """
+    Gravação das entradas de uma partida, suficiente para reproduzi-la com o Replay.
+    
+    Cada linha do arquivo é um objeto JSON. A primeira descreve a partida (semente e parâmetros do
+    Servidor); as demais são os eventos de cada jogador na ordem em que foram aplicados, com o instante
+    em segundos desde o início da gravação. A expiração das salas do tesouro também é gravada, pois a
+    ordem entre ela e os comandos depende do relógio. Os comandos que disputam tesouros ou salas do
+    tesouro com outros jogadores são gravados sob o lock em que são aplicados. O arquivo é gravado em
+    disco em lotes por uma thread separada.
+    
+    Atributos:
+        diario (Diario): Diário em que as linhas são acrescentadas.
+        inicio (float): Instante monotônico do início da gravação.
+        lock (threading.Lock): Garante que a ordem das linhas no arquivo siga a ordem dos instantes.
+    """
+    def __init__(self, caminho, semente, parametros, restaurada=False):
+        """
+        Cria o arquivo da gravação, substituindo uma gravação anterior, e grava a descrição da partida.
+        
+        Args:
+            caminho (str): Caminho do arquivo da gravação.
+            semente (int): Semente do gerador de números aleatórios da partida.
+            parametros (dict): Parâmetros do Servidor necessários para recriar a partida.
+            restaurada (bool): Indica se o mundo foi restaurado da persistência e, portanto, não segue apenas a semente.
+        """
+        open(caminho, "wb").close()
+        self.diario = Diario(caminho)
+        self.inicio = time.monotonic()
+        self.lock = threading.Lock()
+        self.escrever({"semente": semente, "parametros": parametros, "restaurada": restaurada})
+
+    def escrever(self, objeto):
+        """
+        Acrescenta um objeto ao arquivo como uma linha JSON.
+        
+        Args:
+            objeto (dict): Objeto a ser gravado.
+        """
+        self.diario.acrescentar((json.dumps(objeto, ensure_ascii=False, separators=(",", ":")) + "\n").encode())
+
+    def registrar(self, jogador_id, evento, **dados):
+        """
+        Grava um evento de um jogador com o instante atual.
+        
+        Args:
+            jogador_id (int): ID do jogador.
+            evento (str): Tipo do evento (EVENTO_CONECTOU, EVENTO_COMANDO, EVENTO_EXPIROU ou EVENTO_DESCONECTOU).
+            **dados: Campos adicionais do evento, como o comando.
+        """
+        with self.lock:
+            self.escrever({"t": round(time.monotonic() - self.inicio, 6), "jogador": jogador_id, "evento": evento, **dados})
+
+    def fechar(self):
+        """
+        Grava as linhas pendentes e fecha o arquivo.
+        """
+        self.diario.fechar()
+
+
+def ler_gravacao(caminho):
+    """
+    Lê uma gravação de partida, ignorando uma última linha incompleta.
+    
+    Args:
+        caminho (str): Caminho do arquivo da gravação.
+    
+    Returns:
+        tuple: Descrição da partida (dict) e lista de eventos (dicts), em ordem.
+    """
+    with open(caminho, "rb") as arquivo:
+        linhas = arquivo.read().split(b"\n")
+    cabecalho = json.loads(linhas[0])
+    eventos = [json.loads(linha) for linha in linhas[1:-1]]  # A última linha só está completa se for vazia
+    return cabecalho, eventos
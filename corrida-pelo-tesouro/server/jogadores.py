@@ -0,0 +1,218 @@
+import heapq
+import threading
+from collections import deque
+
+
+class Jogador:
+    """
+    Estado de um jogador conectado.
+    
+    Os campos são fixos (__slots__), de modo que cada jogador ocupa sempre a mesma memória, sem o
+    dicionário de atributos de cada instância.
+    
+    Atributos:
+        id (int): ID do jogador.
+        socket (ConexaoTexto): Conexão do jogador.
+        pos (tuple): Posição do jogador no mapa principal ou na sala do tesouro em que ele está.
+        pos_anterior (tuple): Última posição do jogador no mapa principal, ou None.
+        pontos (int): Tesouros coletados.
+        fila_comandos (deque): Comandos aguardando o próximo tick.
+        lock (threading.RLock): Serializa os comandos do jogador com a expiração da sala do tesouro.
+        rng (random.Random): Sorteios próprios do jogador.
+        processados (int): Comandos do jogador já aplicados.
+        na_sala_tesouro (bool): Indica se o jogador está em uma sala do tesouro.
+        sala_tesouro (tuple): Posição, no mapa principal, da última sala do tesouro ocupada, ou None.
+        sessao_sala_tesouro (int): Sessão do jogador na sala do tesouro, ou None.
+        expiracao_sala_tesouro (Tarefa): Tarefa que encerra a sessão na sala do tesouro, ou None.
+        modo_delta (bool): Indica se o jogador recebe apenas as células alteradas do mapa.
+        enviar_estado (bool): Indica se o estado do jogador é enviado antes de cada mapa.
+        mapa_pendente (bool): Indica se o jogador aguarda o mapa principal no próximo tick.
+        quadro (tuple): Mapa, versão e origem da janela do último mapa enviado, ou None.
+        janela (tuple): Mapa e origem da janela de visão atual, ou None.
+        limite (BaldeFichas): Limite de comandos do jogador, ou None se os comandos não são limitados.
+        limitado (bool): Indica se o último comando do jogador foi descartado pelo limite.
+        comandos_rejeitados (int): Comandos descartados pelo limite.
+        comandos_agrupados (int): Movimentos aplicados junto com o anterior, sem um mapa próprio.
+        adiando_mapa (bool): Indica se os envios de mapa ao jogador estão sendo adiados.
+        mapa_adiado (Mapa): Último mapa adiado, enviado ao fim do adiamento, ou None.
+    """
+    __slots__ = ("id", "socket", "pos", "pos_anterior", "pontos", "fila_comandos", "lock", "rng", "processados", "na_sala_tesouro", "sala_tesouro", "sessao_sala_tesouro", "expiracao_sala_tesouro", "modo_delta", "enviar_estado", "mapa_pendente", "quadro", "janela", "limite", "limitado", "comandos_rejeitados", "comandos_agrupados", "adiando_mapa", "mapa_adiado")
+
+    def __init__(self, jogador_id, client_socket, pos, pontos, rng, limite=None):
+        """
+        Inicializa o jogador fora da sala do tesouro e sem nenhum mapa enviado.
+        
+        Args:
+            jogador_id (int): ID do jogador.
+            client_socket (ConexaoTexto): Conexão do jogador.
+            pos (tuple): Posição do jogador no mapa principal.
+            pontos (int): Pontos iniciais do jogador.
+            rng (random.Random): Sorteios próprios do jogador.
+            limite (BaldeFichas): Limite de comandos do jogador, ou None para não limitar.
+        """
+        self.id = jogador_id
+        self.socket = client_socket
+        self.pos = pos
+        self.pos_anterior = None
+        self.pontos = pontos
+        self.fila_comandos = deque()
+        self.lock = threading.RLock()
+        self.rng = rng
+        self.processados = 0
+        self.na_sala_tesouro = False
+        self.sala_tesouro = None
+        self.sessao_sala_tesouro = None
+        self.expiracao_sala_tesouro = None
+        self.modo_delta = False
+        self.enviar_estado = False
+        self.mapa_pendente = False
+        self.quadro = None
+        self.janela = None
+        self.limite = limite
+        self.limitado = False
+        self.comandos_rejeitados = 0
+        self.comandos_agrupados = 0
+        self.adiando_mapa = False
+        self.mapa_adiado = None
+
+
+class RegistroJogadores:
+    """
+    Jogadores conectados, indexados pelo ID e pela conexão.
+    
+    As consultas, inclusões e remoções custam O(1). A busca pela conexão identifica o jogador de uma
+    conexão mesmo depois que o seu ID foi liberado e entregue a outro jogador. O registro não é
+    sincronizado: o Servidor o altera com o lock dos jogadores adquirido.
+    
+    Atributos:
+        por_id (dict): ID do jogador -> Jogador.
+        conexoes (dict): Conexão -> Jogador.
+    """
+    def __init__(self):
+        """
+        Inicializa o registro vazio.
+        """
+        self.por_id = {}
+        self.conexoes = {}
+
+    def adicionar(self, jogador):
+        """
+        Inclui um jogador no registro.
+        
+        Args:
+            jogador (Jogador): Jogador a ser incluído.
+        """
+        self.por_id[jogador.id] = jogador
+        self.conexoes[jogador.socket] = jogador
+
+    def remover(self, jogador_id):
+        """
+        Retira um jogador do registro.
+        
+        Args:
+            jogador_id (int): ID do jogador.
+        
+        Returns:
+            Jogador: Jogador retirado, ou None se nenhum jogador tinha esse ID.
+        """
+        jogador = self.por_id.pop(jogador_id, None)
+        if jogador is not None:
+            self.conexoes.pop(jogador.socket, None)
+        return jogador
+
+    def por_conexao(self, conexao):
+        """
+        Args:
+            conexao (ConexaoTexto): Conexão de um jogador.
+        
+        Returns:
+            Jogador: Jogador registrado com essa conexão, ou None.
+        """
+        return self.conexoes.get(conexao)
+
+    def get(self, jogador_id, padrao=None):
+        """
+        Args:
+            jogador_id (int): ID do jogador.
+            padrao: Valor retornado se nenhum jogador tem esse ID.
+        
+        Returns:
+            Jogador: Jogador com esse ID, ou `padrao`.
+        """
+        return self.por_id.get(jogador_id, padrao)
+
+    def items(self):
+        """
+        Returns:
+            list: Pares (ID do jogador, Jogador).
+        """
+        return self.por_id.items()
+
+    def values(self):
+        """
+        Returns:
+            list: Jogadores registrados.
+        """
+        return self.por_id.values()
+
+    def __getitem__(self, jogador_id):
+        return self.por_id[jogador_id]
+
+    def __iter__(self):
+        return iter(self.por_id)
+
+    def __contains__(self, jogador_id):
+        return jogador_id in self.por_id
+
+    def __len__(self):
+        return len(self.por_id)
+
+
+class AlocadorIds:
+    """
+    Atribui IDs de jogadores, reaproveitando os IDs liberados.
+    
+    Um ID só volta a ser atribuído depois de liberado, e o menor ID livre é sempre o próximo; assim os
+    IDs permanecem pequenos, e a mesma sequência de entradas e saídas produz os mesmos IDs, o que
+    mantém as partidas gravadas reproduzíveis.
+    
+    Atributos:
+        proximo (int): Menor ID ainda nunca atribuído.
+        livres (list): Heap dos IDs liberados.
+    """
+    def __init__(self):
+        """
+        Inicializa o alocador sem nenhum ID atribuído.
+        """
+        self.proximo = 1
+        self.livres = []
+
+    def alocar(self):
+        """
+        Returns:
+            int: Menor ID livre.
+        """
+        if self.livres:
+            return heapq.heappop(self.livres)
+        jogador_id = self.proximo
+        self.proximo += 1
+        return jogador_id
+
+    def reservar(self, jogador_ids):
+        """
+        Impede que IDs atribuídos fora deste alocador, como os de um mundo restaurado, sejam atribuídos.
+        
+        Args:
+            jogador_ids (iterable): IDs reservados.
+        """
+        self.proximo = max(self.proximo, max(jogador_ids, default=0) + 1)
+
+    def liberar(self, jogador_id):
+        """
+        Devolve um ID para ser atribuído novamente. IDs que não foram atribuídos por este alocador são ignorados.
+        
+        Args:
+            jogador_id (int): ID liberado.
+        """
+        if jogador_id < self.proximo:
+            heapq.heappush(self.livres, jogador_id)
@@ -0,0 +1,45 @@
+import time
+
+
+class BaldeFichas:
+    """
+    Limite de taxa por balde de fichas.
+    
+    O balde recebe `taxa` fichas por segundo, até a sua capacidade, e cada ação consome uma ficha: a
+    taxa média fica limitada a `taxa` ações por segundo, com rajadas de até `capacidade` ações. As
+    fichas são repostas a cada consulta, sem threads nem temporizadores. O balde não é sincronizado:
+    cada conexão consulta o seu próprio balde a partir da thread ou da tarefa que lê os seus comandos.
+    
+    Atributos:
+        taxa (float): Fichas repostas por segundo.
+        capacidade (float): Quantidade máxima de fichas acumuladas.
+        fichas (float): Fichas disponíveis na última consulta.
+        atualizado (float): Instante monotônico da última consulta.
+    """
+    def __init__(self, taxa, capacidade):
+        """
+        Inicializa o balde cheio.
+        
+        Args:
+            taxa (float): Fichas repostas por segundo.
+            capacidade (float): Quantidade máxima de fichas acumuladas.
+        """
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self.fichas = capacidade
+        self.atualizado = time.monotonic()
+
+    def consumir(self):
+        """
+        Consome uma ficha, se houver.
+        
+        Returns:
+            bool: True se a ficha foi consumida, False se o balde está vazio.
+        """
+        agora = time.monotonic()
+        self.fichas = min(self.capacidade, self.fichas + (agora - self.atualizado) * self.taxa)
+        self.atualizado = agora
+        if self.fichas < 1:
+            return False
+        self.fichas -= 1
+        return True
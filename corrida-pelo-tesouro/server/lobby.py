@@ -0,0 +1,241 @@
+import multiprocessing
+import os
+import socket
+import struct
+import threading
+
+from server.gravacao import ARQUIVO_GRAVACAO
+from server.servidor import IP_PRIVADO, PORTA, Servidor
+
+JOGADORES_POR_PARTIDA = int(os.getenv("JOGADORES_POR_PARTIDA", "4"))  # Jogadores aceitos em cada partida
+PROCESSOS_PARTIDAS = int(os.getenv("PROCESSOS_PARTIDAS", "0")) or os.cpu_count() or 1  # Processos que hospedam as partidas
+PARTIDA = struct.Struct("!I")  # ID da partida enviado junto com o socket do jogador; sem socket, descarta a partida
+EVENTO = struct.Struct("!BI")  # Evento de uma partida enviado de volta ao lobby: tipo e ID da partida
+EVENTO_SAIDA = 1  # Um jogador saiu da partida
+EVENTO_FIM = 2  # Todos os tesouros da partida foram coletados
+
+
+class ServidorPartida(Servidor):
+    """
+    Partida hospedada em um processo de trabalho do Lobby.
+    
+    Não escuta conexões próprias: recebe os sockets dos jogadores já conectados e informa ao lobby
+    quando um jogador sai e quando a partida termina.
+    
+    Atributos:
+        partida_id (int): ID da partida no lobby.
+        canal (socket.socket): Socket Unix de comunicação com o lobby.
+        lock_canal (threading.Lock): Lock de envio do canal, compartilhado pelas partidas do mesmo processo.
+        encerrada (bool): Indica se todos os tesouros da partida foram coletados.
+    """
+    def __init__(self, partida_id, canal, lock_canal, **parametros_partida):
+        """
+        Inicializa a partida.
+        
+        Args:
+            partida_id (int): ID da partida no lobby.
+            canal (socket.socket): Socket Unix de comunicação com o lobby.
+            lock_canal (threading.Lock): Lock de envio do canal, compartilhado pelas partidas do mesmo processo.
+            **parametros_partida: Parâmetros repassados ao Servidor, como tamanho_mapa.
+        """
+        arquivo_gravacao = f"{ARQUIVO_GRAVACAO}.{partida_id}" if ARQUIVO_GRAVACAO else ""  # Uma gravação por partida
+        super().__init__(escutar=False, diretorio_persistencia="", arquivo_gravacao=arquivo_gravacao, **parametros_partida)  # Partidas do lobby são descartadas ao terminar e não são persistidas
+        self.partida_id = partida_id
+        self.canal = canal
+        self.lock_canal = lock_canal
+        self.encerrada = False
+        if self.intervalo_tick:
+            threading.Thread(target=self.executar_ticks, daemon=True).start()
+
+    def notificar_lobby(self, evento):
+        """
+        Envia um evento da partida ao lobby.
+        
+        Args:
+            evento (int): Tipo do evento, EVENTO_SAIDA ou EVENTO_FIM.
+        """
+        with self.lock_canal:
+            self.canal.sendall(EVENTO.pack(evento, self.partida_id))
+
+    def desconectar_jogador(self, jogador_id):
+        """
+        Remove um jogador da partida e avisa o lobby para liberar a vaga.
+        
+        Args:
+            jogador_id (int): ID do jogador.
+        """
+        if jogador_id in self.jogadores:
+            self.notificar_lobby(EVENTO_SAIDA)
+        super().desconectar_jogador(jogador_id)
+
+    def exibir_ranking(self):
+        """
+        Exibe o ranking da partida e avisa o lobby de que ela terminou.
+        """
+        super().exibir_ranking()
+        if not self.encerrada:
+            self.encerrada = True
+            self.notificar_lobby(EVENTO_FIM)
+
+
+def executar_trabalhador(canal, parametros_partida):
+    """
+    Laço principal de um processo de trabalho: recebe sockets de jogadores do lobby e os atende na partida indicada.
+    
+    Uma partida descartada pelo lobby é encerrada, liberando as suas threads e arquivos.
+    
+    Args:
+        canal (socket.socket): Socket Unix de comunicação com o lobby.
+        parametros_partida (dict): Parâmetros usados para criar cada partida.
+    """
+    partidas = {}
+    lock_canal = threading.Lock()
+    while True:
+        mensagem, descritores, _, _ = socket.recv_fds(canal, PARTIDA.size, 1)
+        if not mensagem:
+            break  # O lobby foi encerrado
+        partida_id, = PARTIDA.unpack(mensagem)
+        if not descritores:
+            if partida_id in partidas:
+                partidas[partida_id].encerrar()
+                del partidas[partida_id]
+            continue
+        if partida_id not in partidas:
+            partidas[partida_id] = ServidorPartida(partida_id, canal, lock_canal, **parametros_partida)
+        client_socket = socket.socket(fileno=descritores[0])
+        threading.Thread(target=partidas[partida_id].gerenciar_jogador, args=(client_socket,), daemon=True).start()
+
+
+class Lobby:
+    """
+    Recebe todas as conexões em uma única porta e distribui os jogadores entre partidas independentes.
+    
+    As partidas são criadas sob demanda e hospedadas em um conjunto de processos de trabalho, de modo
+    que partidas diferentes usam núcleos diferentes em vez de disputar o mesmo GIL. O socket de cada
+    jogador é repassado ao processo da partida por um socket Unix.
+    
+    Atributos:
+        host (str): Endereço do lobby.
+        port (int): Porta do lobby.
+        jogadores_por_partida (int): Quantidade máxima de jogadores em cada partida.
+        parametros_partida (dict): Parâmetros usados para criar cada partida.
+        canais (list): Socket Unix de comunicação com cada processo de trabalho.
+        locks_canais (list): Lock de envio de cada canal.
+        processos (list): Processos de trabalho.
+        partidas (dict): ID da partida -> [índice do processo, jogadores conectados, encerrada].
+        partida_aberta (int): Partida que está recebendo novos jogadores, ou None.
+        proxima_partida (int): ID da próxima partida criada.
+        lock_partidas (threading.Lock): Lock para o estado das partidas.
+        server_socket (socket.socket): Socket do lobby.
+    """
+    def __init__(self, host=IP_PRIVADO, port=PORTA, parametros_partida=None, jogadores_por_partida=JOGADORES_POR_PARTIDA, processos=PROCESSOS_PARTIDAS):
+        """
+        Inicializa o lobby e os processos de trabalho.
+        
+        Args:
+            host (str): Endereço do lobby.
+            port (int): Porta do lobby.
+            parametros_partida (dict): Parâmetros repassados ao Servidor de cada partida.
+            jogadores_por_partida (int): Quantidade máxima de jogadores em cada partida.
+            processos (int): Quantidade de processos de trabalho.
+        """
+        self.host = host
+        self.port = port
+        self.jogadores_por_partida = jogadores_por_partida
+        self.parametros_partida = parametros_partida or {}
+        self.canais = []
+        self.processos = []
+        for _ in range(processos):
+            canal, canal_trabalhador = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+            processo = multiprocessing.Process(target=executar_trabalhador, args=(canal_trabalhador, self.parametros_partida), daemon=True)
+            processo.start()
+            canal_trabalhador.close()
+            self.canais.append(canal)
+            self.processos.append(processo)
+        self.locks_canais = [threading.Lock() for _ in self.canais]
+        self.partidas = {}
+        self.partida_aberta = None
+        self.proxima_partida = 1
+        self.lock_partidas = threading.Lock()
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.bind((self.host, self.port))
+        self.server_socket.listen(5)
+
+    def iniciar(self):
+        """
+        Inicia o lobby e distribui as conexões de jogadores entre as partidas.
+        """
+        for canal in self.canais:
+            threading.Thread(target=self.receber_eventos, args=(canal,), daemon=True).start()
+        print("Aguardando jogadores...")
+        while True:
+            client_socket, addr = self.server_socket.accept()
+            partida_id, indice = self.escolher_partida()
+            print(f"Conexão estabelecida com {addr} (partida {partida_id})")
+            with self.locks_canais[indice]:
+                socket.send_fds(self.canais[indice], [PARTIDA.pack(partida_id)], [client_socket.fileno()])
+            client_socket.close()
+
+    def escolher_partida(self):
+        """
+        Reserva uma vaga para um novo jogador, criando uma partida se a partida aberta estiver cheia ou encerrada.
+        
+        Returns:
+            tuple: ID da partida e índice do processo que a hospeda.
+        """
+        with self.lock_partidas:
+            partida = self.partidas.get(self.partida_aberta)
+            if partida is None or partida[2] or partida[1] >= self.jogadores_por_partida:
+                self.partida_aberta = self.proxima_partida
+                self.proxima_partida += 1
+                indice = min(range(len(self.canais)), key=lambda i: sum(1 for p in self.partidas.values() if p[0] == i))
+                partida = self.partidas[self.partida_aberta] = [indice, 0, False]
+            partida[1] += 1
+            return self.partida_aberta, partida[0]
+
+    def receber_eventos(self, canal):
+        """
+        Atualiza o estado das partidas com os eventos enviados por um processo de trabalho.
+        
+        Args:
+            canal (socket.socket): Socket Unix de comunicação com o processo de trabalho.
+        """
+        buffer = b""
+        while True:
+            dados = canal.recv(1024)
+            if not dados:
+                break
+            buffer += dados
+            while len(buffer) >= EVENTO.size:
+                evento, partida_id = EVENTO.unpack_from(buffer)
+                buffer = buffer[EVENTO.size:]
+                if self.registrar_evento(evento, partida_id):
+                    with self.locks_canais[self.canais.index(canal)]:
+                        canal.sendall(PARTIDA.pack(partida_id))
+
+    def registrar_evento(self, evento, partida_id):
+        """
+        Aplica um evento ao estado de uma partida.
+        
+        Partidas encerradas ou abandonadas que ficam sem jogadores deixam de existir.
+        
+        Args:
+            evento (int): Tipo do evento, EVENTO_SAIDA ou EVENTO_FIM.
+            partida_id (int): ID da partida.
+            
+        Returns:
+            bool: True se a partida deve ser descartada pelo processo que a hospeda.
+        """
+        with self.lock_partidas:
+            partida = self.partidas.get(partida_id)
+            if partida is None:
+                return False
+            if evento == EVENTO_SAIDA:
+                partida[1] -= 1
+            elif evento == EVENTO_FIM:
+                partida[2] = True
+                print(f"Partida {partida_id} encerrada")
+            if partida[1] <= 0 and (partida[2] or partida_id != self.partida_aberta):
+                del self.partidas[partida_id]
+                return True
+            return False
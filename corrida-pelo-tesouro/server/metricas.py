@@ -0,0 +1,253 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PORTA_METRICAS = int(os.getenv("PORTA_METRICAS", "0"))  # Porta local das métricas; 0 desativa a instrumentação
+LIMITES_SEGUNDOS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)  # Limites dos histogramas de tempo
+PREFIXO = "corrida_"  # Prefixo dos nomes das métricas expostas
+COMANDOS_CONHECIDOS = {"w", "a", "s", "d", "delta", "sincronizar", "estado"}
+SEM_MEDICAO = nullcontext()  # Bloco vazio reutilizado quando a instrumentação está desativada
+
+
+def rotulo_comando(comando):
+    """
+    Agrupa um comando recebido em um rótulo de valores limitados.
+    
+    Args:
+        comando (str): Comando recebido do jogador.
+    
+    Returns:
+        str: Tipo do comando ("w", "entrar", "sair", ...) ou "invalido".
+    """
+    if comando in COMANDOS_CONHECIDOS:
+        return comando
+    if comando.startswith("ent"):
+        return "entrar"
+    if comando.startswith("sai"):
+        return "sair"
+    return "invalido"
+
+
+def formatar_rotulos(rotulos):
+    """
+    Formata os rótulos de uma série no formato de texto do Prometheus.
+    
+    Args:
+        rotulos (tuple): Pares (nome, valor) dos rótulos.
+    
+    Returns:
+        str: Rótulos entre chaves, ou string vazia se não houver rótulos.
+    """
+    if not rotulos:
+        return ""
+    return "{" + ",".join(f'{nome}="{valor}"' for nome, valor in rotulos) + "}"
+
+
+class Histograma:
+    """
+    Histograma acumulado de valores observados, com limites fixos.
+    
+    Atributos:
+        limites (tuple): Limites superiores de cada faixa, em ordem crescente.
+        contagens (list): Quantidade de observações em cada faixa; a última recebe os valores acima do maior limite.
+        soma (float): Soma dos valores observados.
+        lock (threading.Lock): Lock para atualização das contagens.
+    """
+    def __init__(self, limites=LIMITES_SEGUNDOS):
+        """
+        Inicializa o histograma vazio.
+        
+        Args:
+            limites (tuple): Limites superiores de cada faixa, em ordem crescente.
+        """
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)
+        self.soma = 0.0
+        self.lock = threading.Lock()
+
+    def observar(self, valor):
+        """
+        Registra um valor no histograma.
+        
+        Args:
+            valor (float): Valor observado.
+        """
+        faixa = bisect.bisect_left(self.limites, valor)
+        with self.lock:
+            self.contagens[faixa] += 1
+            self.soma += valor
+
+    def formatar(self, nome, rotulos):
+        """
+        Formata o histograma no formato de texto do Prometheus.
+        
+        Args:
+            nome (str): Nome da métrica.
+            rotulos (tuple): Pares (nome, valor) dos rótulos da série.
+        
+        Returns:
+            list: Linhas das faixas acumuladas, da soma e da contagem.
+        """
+        with self.lock:
+            contagens = list(self.contagens)
+            soma = self.soma
+        linhas = []
+        acumulado = 0
+        for limite, contagem in zip(self.limites + ("+Inf",), contagens):
+            acumulado += contagem
+            linhas.append(f"{nome}_bucket{formatar_rotulos(rotulos + (('le', limite),))} {acumulado}")
+        linhas.append(f"{nome}_sum{formatar_rotulos(rotulos)} {soma}")
+        linhas.append(f"{nome}_count{formatar_rotulos(rotulos)} {acumulado}")
+        return linhas
+
+
+class Metricas:
+    """
+    Registro das métricas do servidor, exposto em texto no formato do Prometheus.
+    
+    Atributos:
+        ativa (bool): Indica se a instrumentação está ativa.
+        histogramas (dict): Nome da métrica -> {rótulos: Histograma}.
+        medidores (dict): Nome da métrica -> função que retorna o valor atual ou uma lista de (rótulos, valor).
+        lock (threading.Lock): Lock para criação de novas séries.
+        servidor_http (ThreadingHTTPServer): Servidor HTTP das métricas, ou None se ainda não iniciado.
+    """
+    ativa = True
+
+    def __init__(self):
+        """
+        Inicializa o registro sem métricas.
+        """
+        self.histogramas = {}
+        self.medidores = {}
+        self.lock = threading.Lock()
+        self.servidor_http = None
+
+    def observar(self, nome, valor, **rotulos):
+        """
+        Registra um valor no histograma de uma métrica.
+        
+        Args:
+            nome (str): Nome da métrica, sem o prefixo.
+            valor (float): Valor observado.
+            **rotulos: Rótulos da série.
+        """
+        chave = tuple(sorted(rotulos.items()))
+        series = self.histogramas.get(nome)
+        if series is None or chave not in series:
+            with self.lock:
+                series = self.histogramas.setdefault(nome, {})
+                series.setdefault(chave, Histograma())
+        series[chave].observar(valor)
+
+    @contextmanager
+    def cronometrar(self, nome, **rotulos):
+        """
+        Mede o tempo de execução de um bloco e o registra no histograma de uma métrica.
+        
+        Args:
+            nome (str): Nome da métrica, sem o prefixo.
+            **rotulos: Rótulos da série.
+        """
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(nome, time.perf_counter() - inicio, **rotulos)
+
+    def registrar_medidor(self, nome, funcao):
+        """
+        Registra uma métrica cujo valor é lido no momento da coleta.
+        
+        Args:
+            nome (str): Nome da métrica, sem o prefixo.
+            funcao (callable): Retorna o valor atual ou uma lista de pares (rótulos, valor), com os rótulos em um dicionário.
+        """
+        self.medidores[nome] = funcao
+
+    def formatar(self):
+        """
+        Formata todas as métricas no formato de texto do Prometheus.
+        
+        Returns:
+            str: Texto das métricas.
+        """
+        linhas = []
+        for nome, funcao in list(self.medidores.items()):
+            valor = funcao()
+            linhas.append(f"# TYPE {PREFIXO}{nome} gauge")
+            if isinstance(valor, list):
+                for rotulos, valor_serie in valor:
+                    linhas.append(f"{PREFIXO}{nome}{formatar_rotulos(tuple(sorted(rotulos.items())))} {valor_serie}")
+            else:
+                linhas.append(f"{PREFIXO}{nome} {valor}")
+        for nome, series in list(self.histogramas.items()):
+            linhas.append(f"# TYPE {PREFIXO}{nome} histogram")
+            for rotulos, histograma in list(series.items()):
+                linhas.extend(histograma.formatar(PREFIXO + nome, rotulos))
+        return "\n".join(linhas) + "\n"
+
+    def iniciar_servidor(self, host="127.0.0.1", porta=PORTA_METRICAS):
+        """
+        Expõe as métricas em `/metrics` em uma porta local, atendida por uma thread separada.
+        
+        Args:
+            host (str): Endereço em que as métricas são expostas.
+            porta (int): Porta em que as métricas são expostas.
+        """
+        if self.servidor_http is not None:
+            return
+        metricas = self
+
+        class RequisicaoMetricas(BaseHTTPRequestHandler):
+            def do_GET(self):
+                corpo = metricas.formatar().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, formato, *args):
+                pass  # As coletas periódicas não devem poluir a saída do servidor
+
+        self.servidor_http = ThreadingHTTPServer((host, porta), RequisicaoMetricas)
+        threading.Thread(target=self.servidor_http.serve_forever, daemon=True).start()
+        print(f"Métricas disponíveis em http://{host}:{self.servidor_http.server_address[1]}/metrics")
+
+
+class MetricasDesativadas:
+    """
+    Registro de métricas que descarta todas as medições, usado quando PORTA_METRICAS não está definida.
+    """
+    ativa = False
+
+    def observar(self, nome, valor, **rotulos):
+        """
+        Descarta o valor observado.
+        """
+
+    def cronometrar(self, nome, **rotulos):
+        """
+        Retorna um bloco que não mede nada.
+        
+        Returns:
+            contextlib.nullcontext: Bloco vazio compartilhado.
+        """
+        return SEM_MEDICAO
+
+    def registrar_medidor(self, nome, funcao):
+        """
+        Descarta o medidor.
+        """
+
+    def iniciar_servidor(self, host="127.0.0.1", porta=PORTA_METRICAS):
+        """
+        Não expõe nenhuma porta.
+        """
+
+
+metricas = Metricas() if PORTA_METRICAS else MetricasDesativadas()
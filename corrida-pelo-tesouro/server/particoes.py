@@ -0,0 +1,505 @@
+import json
+import multiprocessing
+import os
+import socket
+import threading
+
+from models.colors import colors
+from server.conexao import ConexaoBinaria, ConexaoTexto
+from server.jogadores import AlocadorIds
+from server.ranking import Ranking
+from server.servidor import IP_PRIVADO, MOVIMENTOS, PORTA, SEMENTE_PARTIDA, Servidor
+
+PARTICOES = tuple(int(quantidade) for quantidade in os.getenv("PARTICOES", "2x2").split("x"))  # Partições "linhasxcolunas" do mapa principal no modo particoes
+TAMANHO_MENSAGEM = 65536  # Tamanho máximo de uma mensagem entre o roteador e as partições
+LIMITE_COMANDOS_TRANSFERIDOS = 16384  # Bytes, em JSON, dos comandos não aplicados que acompanham um jogador transferido; os demais são descartados
+MENSAGEM_JOGADOR = 1  # Roteador -> partição: socket de um jogador novo ou transferido de outra partição
+MENSAGEM_RANKING = 2  # Roteador -> partição: ranking final de todas as partições
+MENSAGEM_SAIDA = 3  # Partição -> roteador: um jogador saiu do jogo
+MENSAGEM_TRANSFERENCIA = 4  # Partição -> roteador: socket e estado de um jogador que cruzou a borda da partição
+MENSAGEM_PONTOS = 5  # Partição -> roteador: novos pontos de um jogador
+MENSAGEM_FIM = 6  # Partição -> roteador: todos os tesouros da partição foram coletados
+
+
+def enviar_mensagem(canal, tipo, dados, descritor=None):
+    """
+    Envia uma mensagem, e opcionalmente um socket, por um canal entre o roteador e uma partição.
+    
+    Args:
+        canal (socket.socket): Socket Unix do tipo SOCK_SEQPACKET, que preserva os limites de cada mensagem.
+        tipo (int): Tipo da mensagem.
+        dados (dict): Conteúdo da mensagem, serializado em JSON.
+        descritor (int): Descritor de arquivo repassado junto com a mensagem, ou None.
+    
+    Raises:
+        ValueError: Se a mensagem for maior que TAMANHO_MENSAGEM.
+    """
+    mensagem = bytes([tipo]) + json.dumps(dados, separators=(",", ":")).encode()
+    if len(mensagem) > TAMANHO_MENSAGEM:
+        raise ValueError(f"Mensagem de {len(mensagem)} bytes excede o máximo de {TAMANHO_MENSAGEM} bytes")
+    socket.send_fds(canal, [mensagem], [descritor] if descritor is not None else [])
+
+
+def receber_mensagem(canal):
+    """
+    Recebe uma mensagem enviada por `enviar_mensagem`.
+    
+    Args:
+        canal (socket.socket): Socket Unix do tipo SOCK_SEQPACKET.
+    
+    Returns:
+        tuple: Tipo, conteúdo e descritor recebido (ou None); (None, None, None) se o canal foi fechado.
+    
+    Raises:
+        ValueError: Se a mensagem chegou truncada ou não é um JSON válido. O descritor recebido junto com ela é fechado.
+    """
+    mensagem, descritores, flags, _ = socket.recv_fds(canal, TAMANHO_MENSAGEM, 1)
+    if not mensagem:
+        return None, None, None
+    try:
+        if flags & (socket.MSG_TRUNC | socket.MSG_CTRUNC):
+            raise ValueError(f"Mensagem maior que {TAMANHO_MENSAGEM} bytes truncada")
+        return mensagem[0], json.loads(mensagem[1:]), descritores[0] if descritores else None
+    except ValueError:
+        for descritor in descritores:
+            os.close(descritor)
+        raise
+
+
+def dividir_mapa(tamanho_mapa, particoes):
+    """
+    Divide o mapa principal em retângulos de tamanhos o mais próximos possível.
+    
+    Args:
+        tamanho_mapa (tuple): Tamanho do mapa principal (linhas, colunas).
+        particoes (tuple): Quantidade de partições (linhas, colunas).
+    
+    Returns:
+        list: Retângulos (linha, coluna, linhas, colunas), linha a linha.
+    """
+    def cortes(tamanho, partes):
+        return [tamanho * i // partes for i in range(partes + 1)]
+
+    linhas, colunas = cortes(tamanho_mapa[0], particoes[0]), cortes(tamanho_mapa[1], particoes[1])
+    return [(linhas[i], colunas[j], linhas[i + 1] - linhas[i], colunas[j + 1] - colunas[j]) for i in range(particoes[0]) for j in range(particoes[1])]
+
+
+class ServidorParticao(Servidor):
+    """
+    Servidor de um retângulo do mapa principal, executado em um processo próprio do RoteadorParticoes.
+    
+    O mapa deste servidor contém apenas o seu retângulo, em coordenadas locais; os mapas, posições e
+    registros exibidos usam as coordenadas do mapa principal inteiro. Quando um movimento
+    sai do retângulo para dentro do mapa principal, o socket e o estado do jogador são repassados pelo
+    roteador à partição vizinha, que o recebe na célula de destino. As salas do tesouro pertencem à
+    partição da célula em que estão. Pontos, saídas e o fim dos tesouros são informados ao roteador,
+    que mantém o ranking de todas as partições.
+    
+    Atributos:
+        indice (int): Índice da partição no roteador.
+        origem (tuple): Posição (linha, coluna) no mapa principal da primeira célula da partição.
+        tamanho_mundo (tuple): Tamanho (linhas, colunas) do mapa principal inteiro.
+        canal (socket.socket): Socket Unix de comunicação com o roteador.
+        lock_canal (threading.Lock): Lock de envio do canal.
+        concluida (bool): Indica se o fim dos tesouros da partição já foi informado ao roteador.
+    """
+    def __init__(self, indice, retangulo, tamanho_mundo, canal, **parametros_partida):
+        """
+        Inicializa a partição.
+        
+        Args:
+            indice (int): Índice da partição no roteador.
+            retangulo (tuple): Retângulo (linha, coluna, linhas, colunas) do mapa principal ocupado pela partição.
+            tamanho_mundo (tuple): Tamanho (linhas, colunas) do mapa principal inteiro.
+            canal (socket.socket): Socket Unix de comunicação com o roteador.
+            **parametros_partida: Parâmetros repassados ao Servidor, como max_tesouros_mapa.
+        """
+        self.indice = indice
+        self.origem = retangulo[:2]
+        self.tamanho_mundo = tamanho_mundo
+        self.canal = canal
+        self.lock_canal = threading.Lock()
+        self.concluida = False
+        # Os comandos são aplicados ao recebê-los, pois no modo tick outra thread ainda poderia ler o socket de um jogador já transferido
+        super().__init__(tamanho_mapa=retangulo[2:], escutar=False, intervalo_tick=0, diretorio_persistencia="", arquivo_gravacao="", intervalo_ranking=0, **parametros_partida)
+        if self.todos_tesouros_coletados():
+            self.exibir_ranking()  # Partição sem tesouros
+
+    def notificar_roteador(self, tipo, dados, descritor=None):
+        """
+        Envia uma mensagem ao roteador.
+        
+        Args:
+            tipo (int): Tipo da mensagem.
+            dados (dict): Conteúdo da mensagem.
+            descritor (int): Descritor de arquivo repassado junto com a mensagem, ou None.
+        """
+        with self.lock_canal:
+            enviar_mensagem(self.canal, tipo, dados, descritor)
+
+    def gerenciar_jogador(self, client_socket, jogador_id):
+        """
+        Gerencia a conexão de um jogador novo, com o ID atribuído pelo roteador.
+        
+        Args:
+            client_socket (socket.socket): Socket do jogador.
+            jogador_id (int): ID do jogador.
+        """
+        conexao = self.negociar_protocolo(client_socket)
+        self.registrar_jogador(conexao, jogador_id)
+        self.atender_comandos(conexao, jogador_id)
+
+    def posicao_mundo(self, pos):
+        """
+        Converte uma posição do retângulo da partição na posição correspondente do mapa principal.
+        
+        Args:
+            pos (tuple): Posição (linha, coluna) no mapa da partição.
+        
+        Returns:
+            tuple: Posição no mapa principal inteiro.
+        """
+        return (self.origem[0] + pos[0], self.origem[1] + pos[1])
+
+    def processar_comando(self, client_socket, jogador_id, comando):
+        """
+        Processa o comando de um jogador, transferindo-o à partição vizinha se ele sair do retângulo da partição.
+        
+        Args:
+            client_socket (ConexaoTexto): Conexão do jogador.
+            jogador_id (int): ID do jogador.
+            comando (str): Comando recebido do jogador.
+        """
+        if comando in MOVIMENTOS:
+            x, y = self.jogadores[jogador_id].pos
+            nova_pos = (x + MOVIMENTOS[comando][0], y + MOVIMENTOS[comando][1])
+            destino = self.posicao_mundo(nova_pos)
+            if not self.mapa_principal.valida_posicao(nova_pos) and 0 <= destino[0] < self.tamanho_mundo[0] and 0 <= destino[1] < self.tamanho_mundo[1]:
+                self.transferir_jogador(client_socket, jogador_id, destino)
+                return
+        super().processar_comando(client_socket, jogador_id, comando)
+
+    def transferir_jogador(self, client_socket, jogador_id, destino):
+        """
+        Repassa o jogador, pelo roteador, à partição que contém a célula de destino.
+        
+        O jogador é retirado desta partição, as mensagens pendentes são enviadas e o socket segue
+        junto com o estado do jogador e os comandos já recebidos e ainda não aplicados, até
+        LIMITE_COMANDOS_TRANSFERIDOS bytes; os comandos que não cabem são descartados e contados como
+        processados, como os descartados pelo limite de comandos. O quadro incompleto do protocolo
+        binário é limitado pelo tamanho máximo dos quadros do cliente.
+        
+        Args:
+            client_socket (ConexaoTexto): Conexão do jogador.
+            jogador_id (int): ID do jogador.
+            destino (tuple): Célula de destino no mapa principal.
+        """
+        jogador = self.jogadores[jogador_id]
+        comandos = []
+        tamanho = 0
+        for comando in client_socket.comandos:
+            tamanho += len(json.dumps(comando)) + 1
+            if tamanho > LIMITE_COMANDOS_TRANSFERIDOS:
+                break
+            comandos.append(comando)
+        estado = {
+            "jogador": jogador_id,
+            "pos": list(destino),
+            "pontos": jogador.pontos,
+            "processados": jogador.processados + len(client_socket.comandos) - len(comandos),
+            "modo_delta": jogador.modo_delta,
+            "enviar_estado": jogador.enviar_estado,
+            "binario": client_socket.binario,
+            "comandos": comandos,
+            "pendente": bytes(client_socket.decodificador.buffer).hex() if client_socket.binario else "",
+        }
+        self.log_acao_jogador(jogador_id, "passou para a partição vizinha em", destino)
+        self.desconectar_jogador(jogador_id, transferido=True)
+        client_socket.concluir_envios()
+        self.notificar_roteador(MENSAGEM_TRANSFERENCIA, estado, client_socket.transporte.fileno())
+        client_socket.close()  # Fecha apenas a cópia deste processo; a conexão segue aberta na partição de destino
+
+    def receber_transferencia(self, client_socket, estado):
+        """
+        Recebe um jogador transferido de outra partição na célula de destino e passa a atender os seus comandos.
+        
+        Args:
+            client_socket (socket.socket): Socket do jogador.
+            estado (dict): Estado do jogador enviado pela partição de origem.
+        """
+        classe_conexao = ConexaoBinaria if estado["binario"] else ConexaoTexto
+        conexao = classe_conexao(client_socket, agendador=self.agendador)
+        conexao.comandos.extend(estado["comandos"])
+        if estado["binario"]:
+            conexao.decodificador.buffer.extend(bytes.fromhex(estado["pendente"]))
+        jogador_id = estado["jogador"]
+        pos = (estado["pos"][0] - self.origem[0], estado["pos"][1] - self.origem[1])
+        with self.lock_jogadores:
+            jogador = self.adicionar_jogador(conexao, jogador_id, pos)
+            jogador.pontos = estado["pontos"]
+            self.ranking.definir(jogador_id, jogador.pontos)
+            jogador.processados = estado["processados"]
+            jogador.modo_delta = estado["modo_delta"]
+            jogador.enviar_estado = estado["enviar_estado"]
+        with self.lock_mapa.regioes(pos):
+            self.mapa_principal.posicionar_jogador(jogador_id, pos)
+            coletou = self.mapa_principal.coletar_tesouro(pos)
+        with jogador.lock, conexao.agrupar():
+            if coletou:
+                self.pontuar(jogador_id)
+                conexao.send(f"\n{colors.OKGREEN}>>> Tesouro coletado <<<{colors.ENDC}\n".encode())
+                self.log_acao_jogador(jogador_id, "coletou um tesouro em", self.posicao_mundo(pos))
+            self.enviar_mapa(conexao, jogador_id, self.mapa_principal)
+        if coletou and self.todos_tesouros_coletados():
+            self.exibir_ranking()
+        self.atender_comandos(conexao, jogador_id)
+
+    def desconectar_jogador(self, jogador_id, transferido=False):
+        """
+        Remove um jogador da partição e, se ele saiu do jogo, avisa o roteador.
+        
+        O roteador é avisado depois que o jogador é removido, pois a partir daí ele pode atribuir o
+        mesmo ID a um jogador novo.
+        
+        Args:
+            jogador_id (int): ID do jogador.
+            transferido (bool): Indica se o jogador foi transferido para outra partição em vez de sair do jogo.
+        """
+        saiu = jogador_id in self.jogadores and not transferido
+        super().desconectar_jogador(jogador_id)
+        if saiu:
+            self.notificar_roteador(MENSAGEM_SAIDA, {"jogador": jogador_id})
+
+    def pontuar(self, jogador_id):
+        """
+        Credita um tesouro coletado ao jogador e informa os novos pontos ao roteador.
+        
+        Args:
+            jogador_id (int): ID do jogador.
+        """
+        super().pontuar(jogador_id)
+        self.notificar_roteador(MENSAGEM_PONTOS, {"jogador": jogador_id, "pontos": self.jogadores[jogador_id].pontos})
+
+    def exibir_ranking(self):
+        """
+        Avisa o roteador de que todos os tesouros da partição foram coletados; o ranking é exibido pelo
+        roteador quando todas as partições terminam.
+        """
+        if not self.concluida:
+            self.concluida = True
+            self.notificar_roteador(MENSAGEM_FIM, {})
+
+    def exibir_ranking_final(self, ranking_str, posicoes):
+        """
+        Envia aos jogadores da partição o ranking de todas as partições.
+        
+        Args:
+            ranking_str (str): Ranking formatado.
+            posicoes (dict): ID do jogador -> (posição, pontos).
+        """
+        with self.lock_jogadores:
+            jogadores = dict(self.jogadores.items())
+        codificados = {}  # O ranking é codificado uma única vez para cada protocolo
+        for jogador_id, info in jogadores.items():
+            conexao = info.socket
+            try:
+                with conexao.agrupar():
+                    if str(jogador_id) in posicoes:
+                        pos, pontos = posicoes[str(jogador_id)]  # O JSON grava as chaves como texto
+                        conexao.send(f"\n{colors.OKGREEN}>>> Você ficou na {pos}ª posição com {pontos} pontos <<<{colors.ENDC}\n".encode())
+                    if conexao.binario not in codificados:
+                        codificados[conexao.binario] = conexao.codificar_texto(ranking_str.encode())
+                    conexao.enviar_codificado(codificados[conexao.binario])
+            except OSError:
+                pass
+
+
+def executar_particao(canal, indice, retangulo, tamanho_mundo, parametros_partida):
+    """
+    Laço principal do processo de uma partição: recebe do roteador os sockets dos jogadores e o ranking final.
+    
+    Args:
+        canal (socket.socket): Socket Unix de comunicação com o roteador.
+        indice (int): Índice da partição.
+        retangulo (tuple): Retângulo (linha, coluna, linhas, colunas) do mapa principal ocupado pela partição.
+        tamanho_mundo (tuple): Tamanho (linhas, colunas) do mapa principal inteiro.
+        parametros_partida (dict): Parâmetros repassados ao ServidorParticao.
+    """
+    servidor = ServidorParticao(indice, retangulo, tamanho_mundo, canal, **parametros_partida)
+    while True:
+        try:
+            tipo, dados, descritor = receber_mensagem(canal)
+        except ValueError as erro:
+            print(f"Mensagem inválida do roteador descartada: {erro}")
+            continue
+        if tipo is None:
+            break  # O roteador foi encerrado
+        if tipo == MENSAGEM_JOGADOR:
+            client_socket = socket.socket(fileno=descritor)
+            if "pos" in dados:
+                threading.Thread(target=servidor.receber_transferencia, args=(client_socket, dados), daemon=True).start()
+            else:
+                threading.Thread(target=servidor.gerenciar_jogador, args=(client_socket, dados["jogador"]), daemon=True).start()
+        elif tipo == MENSAGEM_RANKING:
+            servidor.exibir_ranking_final(dados["texto"], dados["posicoes"])
+
+
+class RoteadorParticoes:
+    """
+    Recebe todas as conexões em uma única porta e as distribui entre as partições do mapa principal.
+    
+    Cada partição é um ServidorParticao em um processo próprio, ligado ao roteador por um socket Unix
+    SOCK_SEQPACKET, pelo qual os sockets dos jogadores são repassados. Os jogadores novos entram na
+    partição com menos jogadores; os que cruzam a borda de uma partição são repassados à partição
+    vizinha. O roteador atribui os IDs dos jogadores e mantém o ranking de todas as partições.
+    
+    Atributos:
+        host (str): Endereço do roteador.
+        port (int): Porta do roteador.
+        tamanho_mundo (tuple): Tamanho (linhas, colunas) do mapa principal inteiro.
+        retangulos (list): Retângulo (linha, coluna, linhas, colunas) de cada partição.
+        canais (list): Socket Unix de comunicação com cada partição.
+        locks_canais (list): Lock de envio de cada canal.
+        processos (list): Processos das partições.
+        jogadores_particoes (list): Quantidade de jogadores em cada partição.
+        concluidas (set): Partições cujos tesouros já foram todos coletados.
+        ranking (Ranking): Classificação dos jogadores de todas as partições.
+        ids_jogadores (AlocadorIds): Atribui os IDs dos jogadores, reaproveitando os IDs de quem saiu do jogo.
+        lock_particoes (threading.Lock): Lock para o estado das partições.
+        server_socket (socket.socket): Socket do roteador.
+    """
+    def __init__(self, host=IP_PRIVADO, port=PORTA, parametros_partida=None, particoes=PARTICOES):
+        """
+        Inicializa o roteador e os processos das partições.
+        
+        Args:
+            host (str): Endereço do roteador.
+            port (int): Porta do roteador.
+            parametros_partida (dict): Parâmetros do Servidor para o mapa principal inteiro; os tesouros são divididos entre as partições pela área.
+            particoes (tuple): Quantidade de partições (linhas, colunas).
+        """
+        self.host = host
+        self.port = port
+        parametros_partida = dict(parametros_partida or {})
+        self.tamanho_mundo = parametros_partida.pop("tamanho_mapa", (8, 8))
+        max_tesouros_mapa = parametros_partida.pop("max_tesouros_mapa", 10)
+        semente = parametros_partida.pop("semente", SEMENTE_PARTIDA)
+        self.retangulos = dividir_mapa(self.tamanho_mundo, particoes)
+        area = self.tamanho_mundo[0] * self.tamanho_mundo[1]
+        self.canais = []
+        self.processos = []
+        distribuidos = 0
+        for indice, retangulo in enumerate(self.retangulos):
+            acumulado = max_tesouros_mapa * sum(r[2] * r[3] for r in self.retangulos[:indice + 1]) // area
+            parametros = {**parametros_partida, "max_tesouros_mapa": acumulado - distribuidos, "semente": semente + indice if semente is not None else None}
+            distribuidos = acumulado
+            canal, canal_particao = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+            processo = multiprocessing.Process(target=executar_particao, args=(canal_particao, indice, retangulo, self.tamanho_mundo, parametros), daemon=True)
+            processo.start()
+            canal_particao.close()
+            self.canais.append(canal)
+            self.processos.append(processo)
+        self.locks_canais = [threading.Lock() for _ in self.canais]
+        self.jogadores_particoes = [0] * len(self.canais)
+        self.concluidas = set()
+        self.ranking = Ranking()
+        self.ids_jogadores = AlocadorIds()
+        self.lock_particoes = threading.Lock()
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.bind((self.host, self.port))
+        self.server_socket.listen(5)
+
+    def iniciar(self):
+        """
+        Inicia o roteador e distribui as conexões de jogadores entre as partições.
+        """
+        for indice in range(len(self.canais)):
+            threading.Thread(target=self.receber_mensagens, args=(indice,), daemon=True).start()
+        print(f"Aguardando jogadores ({len(self.canais)} partições)...")
+        while True:
+            client_socket, addr = self.server_socket.accept()
+            with self.lock_particoes:
+                indice = min(range(len(self.canais)), key=lambda i: self.jogadores_particoes[i])
+                jogador_id = self.ids_jogadores.alocar()
+                self.jogadores_particoes[indice] += 1
+            self.ranking.definir(jogador_id, 0)
+            print(f"Conexão estabelecida com {addr} (jogador {jogador_id}, partição {indice})")
+            self.enviar(indice, MENSAGEM_JOGADOR, {"jogador": jogador_id}, client_socket.fileno())
+            client_socket.close()
+
+    def enviar(self, indice, tipo, dados, descritor=None):
+        """
+        Envia uma mensagem a uma partição.
+        
+        Args:
+            indice (int): Índice da partição.
+            tipo (int): Tipo da mensagem.
+            dados (dict): Conteúdo da mensagem.
+            descritor (int): Descritor de arquivo repassado junto com a mensagem, ou None.
+        """
+        with self.locks_canais[indice]:
+            enviar_mensagem(self.canais[indice], tipo, dados, descritor)
+
+    def particao_de(self, pos):
+        """
+        Args:
+            pos (tuple): Célula (linha, coluna) do mapa principal.
+        
+        Returns:
+            int: Índice da partição que contém a célula.
+        """
+        x, y = pos
+        for indice, (x0, y0, linhas, colunas) in enumerate(self.retangulos):
+            if x0 <= x < x0 + linhas and y0 <= y < y0 + colunas:
+                return indice
+        raise ValueError(f"A posição {pos} está fora do mapa principal")
+
+    def receber_mensagens(self, indice):
+        """
+        Atende as mensagens enviadas por uma partição.
+        
+        Args:
+            indice (int): Índice da partição.
+        """
+        while True:
+            try:
+                tipo, dados, descritor = receber_mensagem(self.canais[indice])
+            except ValueError as erro:
+                print(f"Mensagem inválida da partição {indice} descartada: {erro}")
+                continue
+            if tipo is None:
+                break
+            if tipo == MENSAGEM_TRANSFERENCIA:
+                destino = self.particao_de(dados["pos"])
+                with self.lock_particoes:
+                    self.jogadores_particoes[indice] -= 1
+                    self.jogadores_particoes[destino] += 1
+                self.enviar(destino, MENSAGEM_JOGADOR, dados, descritor)
+                os.close(descritor)
+            elif tipo == MENSAGEM_SAIDA:
+                self.ranking.remover(dados["jogador"])
+                with self.lock_particoes:
+                    self.jogadores_particoes[indice] -= 1
+                    self.ids_jogadores.liberar(dados["jogador"])
+            elif tipo == MENSAGEM_PONTOS:
+                self.ranking.definir(dados["jogador"], dados["pontos"])
+            elif tipo == MENSAGEM_FIM:
+                with self.lock_particoes:
+                    self.concluidas.add(indice)
+                    terminou = len(self.concluidas) == len(self.canais)
+                if terminou:
+                    self.exibir_ranking()
+
+    def exibir_ranking(self):
+        """
+        Exibe o ranking de todas as partições e o envia às partições, que o repassam aos seus jogadores.
+        """
+        ranking = self.ranking.melhores()
+        linhas = [f"\n{colors.OKPURPLE}>>> Ranking dos Jogadores <<<{colors.ENDC}\n"]
+        for pos, jogador_id, pontos in ranking:
+            linhas.append(f"{colors.OKPURPLE}{pos}º Lugar: Jogador {jogador_id} ------> {pontos} pontos{colors.ENDC}\n")
+        ranking_str = "".join(linhas)
+        print(ranking_str)
+        posicoes = {jogador_id: (pos, pontos) for pos, jogador_id, pontos in ranking}
+        for indice in range(len(self.canais)):
+            self.enviar(indice, MENSAGEM_RANKING, {"texto": ranking_str, "posicoes": posicoes})
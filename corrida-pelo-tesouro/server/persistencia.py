@@ -0,0 +1,408 @@
+import glob
+import os
+import struct
+import threading
+import time
+from threading import Semaphore
+
+from models.mapa import Mapa
+
+DIRETORIO_PERSISTENCIA = os.getenv("DIRETORIO_PERSISTENCIA", "")  # Diretório dos snapshots e do diário; vazio desativa a persistência
+INTERVALO_SNAPSHOT = float(os.getenv("INTERVALO_SNAPSHOT", "60"))  # Segundos entre snapshots do mundo
+INTERVALO_FSYNC = int(os.getenv("INTERVALO_FSYNC_MS", "50")) / 1000  # Intervalo máximo entre gravações do diário em disco
+MAGICA_SNAPSHOT = b"CPTS"
+VERSAO_SNAPSHOT = 1
+CABECALHO_SNAPSHOT = struct.Struct("!4sHIII")  # Mágica, versão do formato, geração, linhas e colunas do mapa principal
+QUANTIDADE = struct.Struct("!I")
+SALA = struct.Struct("!IIHH")  # Posição da sala no mapa principal, linhas e colunas da sala
+POSICAO = struct.Struct("!II")
+PONTUACAO = struct.Struct("!II")  # ID do jogador e pontos
+REGISTRO_DIARIO = struct.Struct("!BIIIIII")  # Tipo, jogador, pontos, linha, coluna, linha e coluna da sala
+DIARIO_COLETA_MAPA = 1  # Tesouro coletado no mapa principal
+DIARIO_COLETA_SALA = 2  # Tesouro coletado em uma sala do tesouro
+DIARIO_SALA_COLETADA = 3  # Sala do tesouro esvaziada
+
+
+class Diario:
+    """
+    Diário de eventos gravado apenas por acréscimo, com gravação em disco em lotes.
+    
+    Os eventos são acumulados em memória e uma thread separada os grava e chama `fsync` no máximo a
+    cada `intervalo_fsync` segundos, de modo que quem registra um evento nunca espera pelo disco.
+    
+    Atributos:
+        caminho (str): Caminho do arquivo do diário.
+        arquivo (io.BufferedWriter): Arquivo do diário aberto para acréscimo.
+        intervalo_fsync (float): Intervalo máximo entre gravações em disco.
+        pendentes (bytearray): Registros ainda não gravados.
+        condicao (threading.Condition): Protege os registros pendentes e sinaliza a thread de gravação.
+        fechado (bool): Indica se o diário foi fechado.
+        thread (threading.Thread): Thread de gravação.
+    """
+    def __init__(self, caminho, intervalo_fsync=INTERVALO_FSYNC):
+        """
+        Abre o diário para acréscimo e inicia a thread de gravação.
+        
+        Args:
+            caminho (str): Caminho do arquivo do diário.
+            intervalo_fsync (float): Intervalo máximo entre gravações em disco.
+        """
+        self.caminho = caminho
+        self.arquivo = open(caminho, "ab")
+        self.intervalo_fsync = intervalo_fsync
+        self.pendentes = bytearray()
+        self.condicao = threading.Condition()
+        self.fechado = False
+        self.thread = threading.Thread(target=self.gravar, daemon=True)
+        self.thread.start()
+
+    def registrar(self, tipo, jogador_id=0, pontos=0, pos=(0, 0), posicao_sala=(0, 0)):
+        """
+        Acrescenta um evento ao diário, sem esperar pela gravação em disco.
+        
+        Args:
+            tipo (int): Tipo do evento (DIARIO_COLETA_MAPA, DIARIO_COLETA_SALA ou DIARIO_SALA_COLETADA).
+            jogador_id (int): ID do jogador que causou o evento.
+            pontos (int): Pontos do jogador depois do evento.
+            pos (tuple): Posição do evento, no mapa principal ou na sala do tesouro.
+            posicao_sala (tuple): Posição da sala do tesouro no mapa principal.
+        """
+        self.acrescentar(REGISTRO_DIARIO.pack(tipo, jogador_id, pontos, *pos, *posicao_sala))
+
+    def acrescentar(self, dados):
+        """
+        Acrescenta bytes já codificados ao diário, sem esperar pela gravação em disco.
+        
+        Args:
+            dados (bytes): Registro codificado.
+        """
+        with self.condicao:
+            self.pendentes += dados
+            self.condicao.notify()
+
+    def gravar(self):
+        """
+        Laço da thread de gravação: grava os registros pendentes em lotes e os sincroniza com o disco.
+        """
+        while True:
+            with self.condicao:
+                while not self.pendentes and not self.fechado:
+                    self.condicao.wait()
+                if self.fechado and not self.pendentes:
+                    return
+                lote, self.pendentes = self.pendentes, bytearray()
+            self.arquivo.write(lote)
+            self.arquivo.flush()
+            os.fsync(self.arquivo.fileno())
+            time.sleep(self.intervalo_fsync)  # Acumula os próximos eventos em um único fsync
+
+    def fechar(self):
+        """
+        Grava os registros pendentes e fecha o diário.
+        """
+        with self.condicao:
+            self.fechado = True
+            self.condicao.notify()
+        self.thread.join()
+        self.arquivo.close()
+
+
+def ler_diario(caminho):
+    """
+    Lê os registros de um arquivo de diário, ignorando um último registro incompleto.
+    
+    Args:
+        caminho (str): Caminho do arquivo do diário.
+    
+    Returns:
+        list: Tuplas (tipo, jogador, pontos, linha, coluna, linha da sala, coluna da sala).
+    """
+    with open(caminho, "rb") as arquivo:
+        dados = arquivo.read()
+    completos = len(dados) - len(dados) % REGISTRO_DIARIO.size  # Um registro interrompido por uma queda é descartado
+    return list(REGISTRO_DIARIO.iter_unpack(dados[:completos]))
+
+
+class Persistencia:
+    """
+    Mantém snapshots periódicos do mundo e um diário das coletas feitas entre eles.
+    
+    Cada snapshot pertence a uma geração e o diário da geração registra as coletas feitas depois de
+    ele ter sido iniciado. Para gerar um snapshot, um novo diário é aberto antes de o mundo ser copiado;
+    os diários antigos só são apagados depois que o snapshot está gravado. Os eventos do diário são
+    idempotentes, de modo que reaplicar uma coleta já presente no snapshot não altera o mundo.
+    
+    Atributos:
+        servidor (Servidor): Servidor cujo mundo é persistido.
+        diretorio (str): Diretório dos snapshots e dos diários.
+        intervalo_snapshot (float): Segundos entre snapshots.
+        geracao (int): Geração do diário atual.
+        diario (Diario): Diário da geração atual.
+        lock_diario (threading.Lock): Impede que um evento seja registrado durante a troca de diário.
+        parar (threading.Event): Sinaliza o fim da thread de snapshots.
+    """
+    def __init__(self, servidor, diretorio=DIRETORIO_PERSISTENCIA, intervalo_snapshot=INTERVALO_SNAPSHOT):
+        """
+        Inicializa a persistência do servidor. O diário só é aberto por `iniciar`.
+        
+        Args:
+            servidor (Servidor): Servidor cujo mundo é persistido.
+            diretorio (str): Diretório dos snapshots e dos diários.
+            intervalo_snapshot (float): Segundos entre snapshots.
+        """
+        self.servidor = servidor
+        self.diretorio = diretorio
+        self.intervalo_snapshot = intervalo_snapshot
+        self.geracao = 0
+        self.diario = None
+        self.lock_diario = threading.Lock()
+        self.parar = threading.Event()
+        os.makedirs(diretorio, exist_ok=True)
+
+    def caminho_snapshot(self):
+        """
+        Returns:
+            str: Caminho do snapshot mais recente.
+        """
+        return os.path.join(self.diretorio, "snapshot.bin")
+
+    def caminho_diario(self, geracao):
+        """
+        Args:
+            geracao (int): Geração do diário.
+        
+        Returns:
+            str: Caminho do diário da geração.
+        """
+        return os.path.join(self.diretorio, f"diario-{geracao:08d}.bin")
+
+    def geracoes_diarios(self):
+        """
+        Returns:
+            list: Gerações dos diários presentes no diretório, em ordem crescente.
+        """
+        caminhos = glob.glob(os.path.join(self.diretorio, "diario-*.bin"))
+        return sorted(int(os.path.basename(caminho)[7:15]) for caminho in caminhos)
+
+    def iniciar(self):
+        """
+        Abre o diário de uma nova geração e inicia a thread que grava os snapshots periódicos.
+        """
+        self.geracao = max(self.geracoes_diarios() + [self.geracao]) + 1
+        self.diario = Diario(self.caminho_diario(self.geracao))
+        threading.Thread(target=self.executar_snapshots, daemon=True).start()
+
+    def executar_snapshots(self):
+        """
+        Grava um snapshot a cada `intervalo_snapshot` segundos, até a persistência ser encerrada.
+        """
+        while not self.parar.wait(self.intervalo_snapshot):
+            try:
+                self.gravar_snapshot()
+            except OSError as erro:
+                print(f"Falha ao gravar o snapshot: {erro}")
+
+    def encerrar(self):
+        """
+        Termina a thread de snapshots e fecha o diário atual, gravando os eventos pendentes.
+        """
+        self.parar.set()
+        with self.lock_diario:
+            if self.diario is not None:
+                self.diario.fechar()
+
+    def registrar(self, tipo, **dados):
+        """
+        Registra um evento no diário da geração atual.
+        
+        Args:
+            tipo (int): Tipo do evento.
+            **dados: Campos do evento, como em Diario.registrar.
+        """
+        with self.lock_diario:
+            self.diario.registrar(tipo, **dados)
+
+    def registrar_coleta_mapa(self, jogador_id, pos):
+        """
+        Registra um tesouro coletado no mapa principal.
+        
+        Args:
+            jogador_id (int): ID do jogador que coletou o tesouro.
+            pos (tuple): Posição do tesouro no mapa principal.
+        """
+        self.registrar(DIARIO_COLETA_MAPA, jogador_id=jogador_id, pontos=self.servidor.jogadores[jogador_id].pontos, pos=pos)
+
+    def registrar_coleta_sala(self, jogador_id, posicao_sala, pos):
+        """
+        Registra um tesouro coletado em uma sala do tesouro.
+        
+        Args:
+            jogador_id (int): ID do jogador que coletou o tesouro.
+            posicao_sala (tuple): Posição da sala do tesouro no mapa principal.
+            pos (tuple): Posição do tesouro na sala.
+        """
+        self.registrar(DIARIO_COLETA_SALA, jogador_id=jogador_id, pontos=self.servidor.jogadores[jogador_id].pontos, pos=pos, posicao_sala=posicao_sala)
+
+    def registrar_sala_coletada(self, posicao_sala):
+        """
+        Registra uma sala do tesouro esvaziada.
+        
+        Args:
+            posicao_sala (tuple): Posição da sala do tesouro no mapa principal.
+        """
+        self.registrar(DIARIO_SALA_COLETADA, pos=posicao_sala)
+
+    def gravar_snapshot(self):
+        """
+        Abre o diário de uma nova geração, grava o mundo em um snapshot dessa geração e apaga os diários anteriores.
+        
+        O snapshot é gravado em um arquivo temporário e renomeado, de modo que uma queda durante a
+        gravação preserva o snapshot anterior.
+        """
+        with self.lock_diario:
+            if self.parar.is_set():
+                return  # Encerrada durante a espera pelo lock; o diário já foi fechado
+            diario_anterior = self.diario
+            self.geracao += 1
+            self.diario = Diario(self.caminho_diario(self.geracao))
+            geracao = self.geracao
+        diario_anterior.fechar()
+        temporario = self.caminho_snapshot() + ".tmp"
+        with open(temporario, "wb") as arquivo:
+            arquivo.write(self.serializar(geracao))
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, self.caminho_snapshot())
+        for geracao_antiga in self.geracoes_diarios():
+            if geracao_antiga < geracao:
+                os.remove(self.caminho_diario(geracao_antiga))
+
+    def serializar(self, geracao):
+        """
+        Serializa o mundo: células do mapa principal, salas do tesouro criadas, salas esvaziadas e pontos dos jogadores.
+        
+        Args:
+            geracao (int): Geração do snapshot.
+        
+        Returns:
+            bytes: Snapshot do mundo.
+        """
+        servidor = self.servidor
+        mapa = servidor.mapa_principal
+        with servidor.lock_salas:
+            salas = list(servidor.salas_tesouro.items())
+            salas_coletadas = [pos for pos, coletada in servidor.estado_salas_tesouro.items() if coletada]
+        with servidor.lock_jogadores:
+            pontuacoes = {**servidor.pontos_restaurados, **{jogador_id: jogador.pontos for jogador_id, jogador in servidor.jogadores.items()}}
+        partes = [CABECALHO_SNAPSHOT.pack(MAGICA_SNAPSHOT, VERSAO_SNAPSHOT, geracao, mapa.linhas, mapa.colunas), mapa.exportar_estados()]
+        partes.append(QUANTIDADE.pack(len(salas)))
+        for (x, y), sala in salas:
+            partes.append(SALA.pack(x, y, sala.linhas, sala.colunas) + sala.exportar_estados())
+        partes.append(QUANTIDADE.pack(len(salas_coletadas)))
+        partes.extend(POSICAO.pack(*pos) for pos in salas_coletadas)
+        partes.append(QUANTIDADE.pack(len(pontuacoes)))
+        partes.extend(PONTUACAO.pack(jogador_id, pontos) for jogador_id, pontos in pontuacoes.items())
+        return b"".join(partes)
+
+    def restaurar(self):
+        """
+        Restaura o mundo do servidor a partir do último snapshot e dos diários gravados depois dele.
+        
+        Returns:
+            bool: True se havia um snapshot ou diário a restaurar.
+        """
+        restaurou = False
+        if os.path.exists(self.caminho_snapshot()):
+            with open(self.caminho_snapshot(), "rb") as arquivo:
+                self.geracao = self.desserializar(arquivo.read())
+            restaurou = True
+        for geracao in self.geracoes_diarios():
+            if geracao >= self.geracao:
+                for registro in ler_diario(self.caminho_diario(geracao)):
+                    self.aplicar(*registro)
+                restaurou = True
+        return restaurou
+
+    def desserializar(self, dados):
+        """
+        Carrega no servidor o mundo serializado por `serializar`.
+        
+        Args:
+            dados (bytes): Snapshot do mundo.
+        
+        Returns:
+            int: Geração do snapshot.
+        
+        Raises:
+            ValueError: Se o snapshot não for compatível com o mapa principal do servidor.
+        """
+        servidor = self.servidor
+        mapa = servidor.mapa_principal
+        magica, versao, geracao, linhas, colunas = CABECALHO_SNAPSHOT.unpack_from(dados)
+        if magica != MAGICA_SNAPSHOT or versao != VERSAO_SNAPSHOT or (linhas, colunas) != (mapa.linhas, mapa.colunas):
+            raise ValueError("Snapshot incompatível com o mapa principal do servidor")
+        inicio = CABECALHO_SNAPSHOT.size
+        mapa.importar_estados(dados[inicio:inicio + linhas * colunas])
+        inicio += linhas * colunas
+        quantidade, = QUANTIDADE.unpack_from(dados, inicio)
+        inicio += QUANTIDADE.size
+        for _ in range(quantidade):
+            x, y, linhas_sala, colunas_sala = SALA.unpack_from(dados, inicio)
+            inicio += SALA.size
+            sala = self.criar_sala((x, y), linhas_sala, colunas_sala)
+            sala.importar_estados(dados[inicio:inicio + linhas_sala * colunas_sala])
+            inicio += linhas_sala * colunas_sala
+        quantidade, = QUANTIDADE.unpack_from(dados, inicio)
+        inicio += QUANTIDADE.size
+        for x, y in POSICAO.iter_unpack(dados[inicio:inicio + quantidade * POSICAO.size]):
+            servidor.estado_salas_tesouro[(x, y)] = True
+        inicio += quantidade * POSICAO.size
+        quantidade, = QUANTIDADE.unpack_from(dados, inicio)
+        inicio += QUANTIDADE.size
+        for jogador_id, pontos in PONTUACAO.iter_unpack(dados[inicio:inicio + quantidade * PONTUACAO.size]):
+            servidor.pontos_restaurados[jogador_id] = pontos
+        return geracao
+
+    def criar_sala(self, posicao_sala, linhas=None, colunas=None):
+        """
+        Cria uma sala do tesouro cheia de tesouros, como o servidor faz na primeira entrada de um jogador.
+        
+        Args:
+            posicao_sala (tuple): Posição da sala no mapa principal.
+            linhas (int): Linhas da sala. Padrão é o tamanho de sala do servidor.
+            colunas (int): Colunas da sala. Padrão é o tamanho de sala do servidor.
+        
+        Returns:
+            Mapa: Sala do tesouro.
+        """
+        servidor = self.servidor
+        if posicao_sala not in servidor.salas_tesouro:
+            sala = Mapa(linhas or servidor.linhas_sala_tesouro, colunas or servidor.colunas_sala_tesouro)
+            sala.inicializar_tesouros(quantidade=servidor.max_tesouros_sala, sala_tesouro=True)
+            servidor.salas_tesouro[posicao_sala] = sala
+            servidor.salas_tesouro_locks[posicao_sala] = Semaphore(1)
+        return servidor.salas_tesouro[posicao_sala]
+
+    def aplicar(self, tipo, jogador_id, pontos, x, y, sala_x, sala_y):
+        """
+        Reaplica um evento do diário ao mundo do servidor.
+        
+        Args:
+            tipo (int): Tipo do evento.
+            jogador_id (int): ID do jogador que causou o evento.
+            pontos (int): Pontos do jogador depois do evento.
+            x (int): Linha do evento.
+            y (int): Coluna do evento.
+            sala_x (int): Linha da sala do tesouro no mapa principal.
+            sala_y (int): Coluna da sala do tesouro no mapa principal.
+        """
+        servidor = self.servidor
+        if tipo == DIARIO_COLETA_MAPA:
+            servidor.mapa_principal.coletar_tesouro((x, y))
+        elif tipo == DIARIO_COLETA_SALA:
+            self.criar_sala((sala_x, sala_y)).coletar_tesouro((x, y))
+        elif tipo == DIARIO_SALA_COLETADA:
+            servidor.estado_salas_tesouro[(x, y)] = True
+            servidor.mapa_principal.marcar_coletado((x, y))
+        if tipo in (DIARIO_COLETA_MAPA, DIARIO_COLETA_SALA):
+            servidor.pontos_restaurados[jogador_id] = max(pontos, servidor.pontos_restaurados.get(jogador_id, 0))
@@ -0,0 +1,187 @@
+import threading
+
+
+class Ranking:
+    """
+    Classificação dos jogadores mantida a cada alteração de pontos, sem reordenar todos os jogadores.
+    
+    Os jogadores são agrupados pela pontuação e uma árvore de Fenwick conta quantos jogadores há em
+    cada pontuação. Alterar os pontos de um jogador, consultar a sua posição e encontrar a pontuação
+    do k-ésimo colocado custam O(log P), em que P é a maior pontuação; as k primeiras posições custam
+    O(k + g log P), em que g é a quantidade de pontuações distintas entre elas.
+    
+    Atributos:
+        arvore (list): Árvore de Fenwick das quantidades de jogadores por pontuação; o índice i corresponde a i - 1 pontos.
+        pontos (dict): ID do jogador -> pontos.
+        grupos (dict): Pontos -> IDs dos jogadores com essa pontuação, na ordem em que a alcançaram.
+        versao (int): Incrementada a cada alteração da classificação.
+        lock (threading.Lock): Protege a classificação entre threads.
+    """
+    def __init__(self, capacidade=64):
+        """
+        Inicializa a classificação vazia.
+        
+        Args:
+            capacidade (int): Pontuações representadas inicialmente na árvore; ela dobra quando necessário.
+        """
+        self.arvore = [0] * (capacidade + 1)
+        self.pontos = {}
+        self.grupos = {}
+        self.versao = 0
+        self.lock = threading.Lock()
+
+    def somar_arvore(self, pontos, quantidade):
+        """
+        Soma uma quantidade de jogadores a uma pontuação na árvore.
+        
+        Args:
+            pontos (int): Pontuação.
+            quantidade (int): Jogadores somados (negativo para retirar).
+        """
+        indice = pontos + 1
+        if indice >= len(self.arvore):
+            self.ampliar_arvore(indice)
+        while indice < len(self.arvore):
+            self.arvore[indice] += quantidade
+            indice += indice & -indice
+
+    def ampliar_arvore(self, indice):
+        """
+        Dobra a quantidade de pontuações representadas na árvore até incluir um índice e a reconstrói a partir dos grupos.
+        
+        Args:
+            indice (int): Índice que a árvore deve passar a incluir.
+        """
+        capacidade = max(len(self.arvore) - 1, 1)
+        while capacidade < indice:
+            capacidade *= 2
+        arvore = [0] * (capacidade + 1)
+        for pontos, grupo in self.grupos.items():
+            arvore[pontos + 1] += len(grupo)
+        for indice in range(1, len(arvore)):
+            pai = indice + (indice & -indice)
+            if pai < len(arvore):
+                arvore[pai] += arvore[indice]
+        self.arvore = arvore
+
+    def contar_ate(self, pontos):
+        """
+        Args:
+            pontos (int): Pontuação.
+        
+        Returns:
+            int: Quantidade de jogadores com no máximo `pontos` pontos.
+        """
+        indice = min(pontos + 1, len(self.arvore) - 1)
+        total = 0
+        while indice > 0:
+            total += self.arvore[indice]
+            indice -= indice & -indice
+        return total
+
+    def pontuacao_na_ordem(self, ordem):
+        """
+        Encontra a pontuação do jogador na posição `ordem` da ordem crescente de pontos, descendo pela árvore.
+        
+        Args:
+            ordem (int): Posição na ordem crescente, a partir de 1.
+        
+        Returns:
+            int: Pontuação do jogador nessa posição.
+        """
+        indice = 0
+        passo = 1 << (len(self.arvore) - 1).bit_length()
+        while passo:
+            proximo = indice + passo
+            if proximo < len(self.arvore) and self.arvore[proximo] < ordem:
+                indice = proximo
+                ordem -= self.arvore[proximo]
+            passo >>= 1
+        return indice  # O índice seguinte, indice + 1, corresponde a `indice` pontos
+
+    def definir(self, jogador_id, pontos):
+        """
+        Define os pontos de um jogador, incluindo-o na classificação se necessário.
+        
+        Args:
+            jogador_id (int): ID do jogador.
+            pontos (int): Pontos atuais do jogador.
+        """
+        with self.lock:
+            anteriores = self.pontos.get(jogador_id)
+            if anteriores == pontos:
+                return
+            if anteriores is not None:
+                self.retirar(jogador_id, anteriores)
+            self.somar_arvore(pontos, 1)  # Antes de incluir no grupo, pois a árvore pode ser reconstruída a partir dos grupos
+            self.pontos[jogador_id] = pontos
+            self.grupos.setdefault(pontos, {})[jogador_id] = None
+            self.versao += 1
+
+    def remover(self, jogador_id):
+        """
+        Retira um jogador da classificação.
+        
+        Args:
+            jogador_id (int): ID do jogador.
+        """
+        with self.lock:
+            pontos = self.pontos.pop(jogador_id, None)
+            if pontos is not None:
+                self.retirar(jogador_id, pontos)
+                self.versao += 1
+
+    def retirar(self, jogador_id, pontos):
+        """
+        Retira um jogador do grupo da sua pontuação e da árvore. O lock já deve estar adquirido.
+        
+        Args:
+            jogador_id (int): ID do jogador.
+            pontos (int): Pontuação em que o jogador está.
+        """
+        grupo = self.grupos[pontos]
+        del grupo[jogador_id]
+        if not grupo:
+            del self.grupos[pontos]
+        self.somar_arvore(pontos, -1)
+
+    def posicao(self, jogador_id):
+        """
+        Retorna a posição de um jogador; jogadores empatados ocupam a mesma posição.
+        
+        Args:
+            jogador_id (int): ID do jogador.
+        
+        Returns:
+            int: Posição do jogador, a partir de 1, ou None se ele não está na classificação.
+        """
+        with self.lock:
+            pontos = self.pontos.get(jogador_id)
+            if pontos is None:
+                return None
+            return len(self.pontos) - self.contar_ate(pontos) + 1
+
+    def melhores(self, quantidade=None):
+        """
+        Retorna os primeiros colocados, do maior para o menor número de pontos.
+        
+        Args:
+            quantidade (int): Quantidade de jogadores. Se None, todos os jogadores.
+        
+        Returns:
+            list: Tuplas (posição, ID do jogador, pontos).
+        """
+        with self.lock:
+            if quantidade is None:
+                quantidade = len(self.pontos)
+            resultado = []
+            restantes = len(self.pontos)
+            while restantes and len(resultado) < quantidade:
+                pontos = self.pontuacao_na_ordem(restantes)
+                posicao = len(self.pontos) - restantes + 1
+                for jogador_id in self.grupos[pontos]:
+                    if len(resultado) == quantidade:
+                        break
+                    resultado.append((posicao, jogador_id, pontos))
+                restantes -= len(self.grupos[pontos])
+            return resultado
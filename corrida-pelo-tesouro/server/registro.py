@@ -0,0 +1,182 @@
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+from models.colors import colors
+
+FORMATO_REGISTRO = os.getenv("FORMATO_REGISTRO", "texto")  # "texto" (linhas coloridas) ou "json" (um objeto por linha)
+NIVEL_REGISTRO = os.getenv("NIVEL_REGISTRO", "debug")  # "debug" registra cada movimento; "info" apenas os demais eventos
+AMOSTRAGEM_MOVIMENTOS = int(os.getenv("AMOSTRAGEM_MOVIMENTOS", "1"))  # Registra um a cada N movimentos
+CAPACIDADE_REGISTRO = int(os.getenv("CAPACIDADE_REGISTRO", "8192"))  # Eventos aguardando escrita antes de começar a descartar
+FORMATOS = ("texto", "json")
+NIVEIS = {"debug": 10, "info": 20}
+ACOES_DEBUG = {"moveu-se para"}  # Ações de alta frequência, sujeitas ao nível e à amostragem
+
+
+class RegistroEventos:
+    """
+    Registro assíncrono das ações dos jogadores.
+    
+    As ações são enfileiradas em um buffer limitado e escritas em lotes por uma thread separada, de
+    modo que uma saída lenta não atrasa os comandos dos jogadores. Com o buffer cheio, os novos eventos
+    são descartados e contados, sem bloquear quem os registrou.
+    
+    Atributos:
+        saida (io.TextIOBase): Destino dos eventos, ou None para usar o `sys.stdout` do momento da escrita.
+        formato (str): "texto" ou "json".
+        nivel (int): Nível mínimo dos eventos registrados.
+        amostragem (int): Registra um a cada `amostragem` eventos de nível debug.
+        capacidade (int): Quantidade máxima de eventos aguardando escrita.
+        tamanho_lote (int): Quantidade máxima de eventos escritos de uma vez.
+        eventos (deque): Eventos aguardando escrita.
+        condicao (threading.Condition): Sinaliza a thread de escrita quando há eventos.
+        amostras (itertools.count): Contador dos eventos de nível debug, usado na amostragem.
+        descartados (int): Eventos descartados por falta de espaço no buffer.
+        descartados_informados (int): Descartes já informados na saída.
+        escrevendo (bool): Indica se a thread de escrita está escrevendo um lote.
+        encerrado (bool): Indica se o registro foi encerrado; a thread de escrita termina depois de escrever os eventos pendentes.
+        thread (threading.Thread): Thread de escrita, iniciada no primeiro evento.
+    """
+    def __init__(self, saida=None, formato=FORMATO_REGISTRO, nivel=NIVEL_REGISTRO, amostragem=AMOSTRAGEM_MOVIMENTOS, capacidade=CAPACIDADE_REGISTRO, tamanho_lote=256):
+        """
+        Inicializa o registro com o buffer vazio.
+        
+        Args:
+            saida (io.TextIOBase): Destino dos eventos. Padrão é a saída padrão.
+            formato (str): "texto" ou "json".
+            nivel (str): Nível mínimo dos eventos registrados, "debug" ou "info".
+            amostragem (int): Registra um a cada `amostragem` eventos de nível debug.
+            capacidade (int): Quantidade máxima de eventos aguardando escrita.
+            tamanho_lote (int): Quantidade máxima de eventos escritos de uma vez.
+        
+        Raises:
+            ValueError: Se o formato não está em FORMATOS ou o nível não está em NIVEIS.
+        """
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato de registro inválido: {formato!r}. Use um destes: {', '.join(FORMATOS)}")
+        if nivel not in NIVEIS:
+            raise ValueError(f"Nível de registro inválido: {nivel!r}. Use um destes: {', '.join(NIVEIS)}")
+        self.saida = saida
+        self.formato = formato
+        self.nivel = NIVEIS[nivel]
+        self.amostragem = max(1, amostragem)
+        self.capacidade = capacidade
+        self.tamanho_lote = tamanho_lote
+        self.eventos = deque()
+        self.condicao = threading.Condition()
+        self.amostras = itertools.count()
+        self.descartados = 0
+        self.descartados_informados = 0
+        self.escrevendo = False
+        self.encerrado = False
+        self.thread = None
+
+    def registrar(self, jogador_id, acao, detalhe="", cor=""):
+        """
+        Enfileira a ação de um jogador para escrita, sem bloquear.
+        
+        Args:
+            jogador_id (int): ID do jogador, ou None para um evento do jogo.
+            acao (str): Ação realizada pelo jogador.
+            detalhe (str): Detalhes adicionais da ação.
+            cor (str): Cor do jogador, usada no formato de texto.
+        """
+        if acao in ACOES_DEBUG:
+            if self.nivel > NIVEIS["debug"] or next(self.amostras) % self.amostragem:
+                return
+        with self.condicao:
+            if self.encerrado:
+                return
+            if len(self.eventos) >= self.capacidade:
+                self.descartados += 1
+                return
+            self.eventos.append((time.time(), jogador_id, acao, detalhe, cor))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.escrever, daemon=True)
+                self.thread.start()
+            self.condicao.notify()
+
+    def formatar(self, evento):
+        """
+        Formata um evento no formato configurado.
+        
+        Args:
+            evento (tuple): Instante, ID do jogador, ação, detalhe e cor.
+        
+        Returns:
+            str: Linha do evento.
+        """
+        instante, jogador_id, acao, detalhe, cor = evento
+        if self.formato == "json":
+            if isinstance(detalhe, tuple):
+                detalhe = list(detalhe)
+            return json.dumps({"t": round(instante, 3), "jogador": jogador_id, "acao": acao, "detalhe": detalhe}, ensure_ascii=False, separators=(",", ":")) + "\n"
+        if jogador_id is None:
+            return f"{acao} {detalhe}".rstrip() + "\n"
+        return f"{cor}Jogador {jogador_id}: {acao} {detalhe}{colors.ENDC if cor else ''}\n"
+
+    def formatar_descartes(self, quantidade):
+        """
+        Formata o aviso de eventos descartados.
+        
+        Args:
+            quantidade (int): Eventos descartados desde o último aviso.
+        
+        Returns:
+            str: Linha do aviso.
+        """
+        if self.formato == "json":
+            return json.dumps({"t": round(time.time(), 3), "descartados": quantidade}, separators=(",", ":")) + "\n"
+        return f"{quantidade} eventos descartados: registro sobrecarregado\n"
+
+    def escrever(self):
+        """
+        Laço da thread de escrita: retira os eventos do buffer em lotes e os escreve na saída.
+        """
+        while True:
+            with self.condicao:
+                while not self.eventos and not self.encerrado:
+                    self.condicao.wait()
+                if not self.eventos:
+                    return
+                lote = [self.eventos.popleft() for _ in range(min(self.tamanho_lote, len(self.eventos)))]
+                descartados = self.descartados - self.descartados_informados
+                self.descartados_informados = self.descartados
+                self.escrevendo = True
+            texto = "".join(self.formatar(evento) for evento in lote)
+            if descartados:
+                texto += self.formatar_descartes(descartados)
+            saida = self.saida or sys.stdout
+            try:
+                saida.write(texto)
+                saida.flush()
+            except (OSError, ValueError):
+                pass  # Uma saída fechada não deve derrubar o servidor
+            with self.condicao:
+                self.escrevendo = False
+                self.condicao.notify_all()
+
+    def aguardar(self, tempo_limite=None):
+        """
+        Aguarda até que os eventos enfileirados sejam escritos.
+        
+        Args:
+            tempo_limite (float): Segundos máximos de espera. Se None, aguarda indefinidamente.
+        
+        Returns:
+            bool: True se o buffer foi esvaziado dentro do tempo limite.
+        """
+        with self.condicao:
+            return self.condicao.wait_for(lambda: not self.eventos and not self.escrevendo, tempo_limite)
+
+    def encerrar(self):
+        """
+        Deixa de aceitar eventos e termina a thread de escrita depois que os eventos pendentes forem escritos.
+        """
+        with self.condicao:
+            self.encerrado = True
+            self.condicao.notify_all()
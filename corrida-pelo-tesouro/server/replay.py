@@ -0,0 +1,201 @@
+import argparse
+import contextlib
+import hashlib
+import io
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from server.agendador import Tarefa
+from server.conexao import ConexaoBinaria, ConexaoTexto
+from server.gravacao import EVENTO_COMANDO, EVENTO_CONECTOU, EVENTO_DESCONECTOU, EVENTO_EXPIROU, ler_gravacao
+from server.registro import RegistroEventos
+from server.servidor import Servidor
+
+
+class TransporteDescartado:
+    """
+    Transporte com a interface de um socket conectado que descarta tudo o que é enviado.
+    
+    As mensagens continuam sendo codificadas pelas conexões, de modo que o custo de montar os mapas e
+    os deltas faz parte da reprodução.
+    """
+    def send(self, dados, flags=0):
+        """
+        Descarta os dados.
+        
+        Args:
+            dados (bytes): Dados "enviados".
+            flags (int): Ignorado.
+        
+        Returns:
+            int: Quantidade de bytes "enviados".
+        """
+        return len(dados)
+
+    def sendall(self, dados):
+        """
+        Descarta os dados.
+        """
+
+    def close(self):
+        """
+        Não há nada a fechar.
+        """
+
+
+class AgendadorReproducao:
+    """
+    Agendador com a mesma interface do Agendador que nunca executa as tarefas.
+    
+    Na reprodução, a expiração das salas do tesouro é aplicada a partir da gravação, na mesma posição
+    em relação aos comandos em que aconteceu na partida original, em vez de depender de um relógio.
+    """
+    def agendar(self, atraso, funcao, *args):
+        """
+        Cria a tarefa sem agendá-la.
+        
+        Args:
+            atraso (float): Segundos até a execução, ignorados.
+            funcao (callable): Função a ser chamada.
+            *args: Argumentos da função.
+        
+        Returns:
+            Tarefa: Tarefa que pode ser cancelada, como no Agendador.
+        """
+        return Tarefa(funcao, args)
+
+
+class Replay:
+    """
+    Reproduz uma partida gravada pela GravacaoPartida, aplicando as mesmas entradas à mesma lógica do Servidor.
+    
+    A partida é recriada com a semente e os parâmetros gravados, sem sockets, threads ou esperas: as
+    conexões descartam o que é enviado e os eventos, inclusive a expiração das salas do tesouro, são
+    aplicados em sequência. A reprodução executa tão rápido quanto a lógica do jogo permitir.
+    
+    Atributos:
+        cabecalho (dict): Semente e parâmetros da partida gravada.
+        eventos (list): Eventos gravados, em ordem.
+        servidor (Servidor): Servidor da última reprodução, ou None se nenhuma foi executada.
+        conexoes (dict): ID do jogador -> conexão simulada.
+        jogadores (dict): ID do jogador -> Jogador do servidor, mantido depois que ele se desconecta.
+    """
+    def __init__(self, caminho):
+        """
+        Carrega uma gravação.
+        
+        Args:
+            caminho (str): Caminho do arquivo da gravação.
+        
+        Raises:
+            ValueError: Se a partida gravada começou de um mundo restaurado da persistência.
+        """
+        self.cabecalho, self.eventos = ler_gravacao(caminho)
+        if self.cabecalho.get("restaurada"):
+            raise ValueError("A partida começou de um mundo restaurado da persistência e não pode ser reproduzida pela semente")
+        self.servidor = None
+        self.conexoes = {}
+        self.jogadores = {}
+
+    def criar_servidor(self):
+        """
+        Cria um Servidor sem socket com a semente e os parâmetros da partida gravada.
+        
+        Returns:
+            Servidor: Servidor pronto para receber os eventos da gravação.
+        """
+        parametros = dict(self.cabecalho["parametros"])
+        for chave in ("tamanho_mapa", "tamanho_sala_tesouro", "tamanho_regiao", "janela_visao"):
+            if parametros.get(chave) is not None:
+                parametros[chave] = tuple(parametros[chave])  # O JSON grava as tuplas como listas
+        servidor = Servidor(escutar=False, intervalo_tick=0, diretorio_persistencia="", arquivo_gravacao="", semente=self.cabecalho["semente"], **parametros)
+        servidor.agendador = AgendadorReproducao()
+        servidor.registro = RegistroEventos(saida=open(os.devnull, "w"))
+        return servidor
+
+    def executar(self):
+        """
+        Reproduz a partida inteira.
+        
+        Returns:
+            dict: Eventos aplicados, segundos de reprodução, duração da partida original, pontos de
+                cada jogador, tesouros restantes e resumo do estado do mapa principal.
+        
+        Raises:
+            ValueError: Se a reprodução divergir da gravação.
+        """
+        self.servidor = self.criar_servidor()
+        self.conexoes = {}
+        self.jogadores = {}
+        inicio = time.perf_counter()
+        for evento in self.eventos:
+            self.aplicar(evento)
+        segundos = time.perf_counter() - inicio
+        duracao = self.eventos[-1]["t"] if self.eventos else 0.0
+        mapa = self.servidor.mapa_principal
+        return {
+            "eventos": len(self.eventos),
+            "segundos": segundos,
+            "duracao": duracao,
+            "pontos": {jogador_id: jogador.pontos for jogador_id, jogador in self.jogadores.items()},
+            "tesouros_restantes": mapa.tesouros_restantes(),
+            "resumo_mapa": hashlib.sha256(mapa.exportar_estados()).hexdigest()[:16],
+        }
+
+    def aplicar(self, evento):
+        """
+        Aplica um evento gravado ao servidor.
+        
+        Args:
+            evento (dict): Evento da gravação.
+        
+        Raises:
+            ValueError: Se o jogador registrado não receber o ID gravado.
+        """
+        jogador_id = evento["jogador"]
+        if evento["evento"] == EVENTO_CONECTOU:
+            classe_conexao = ConexaoBinaria if evento.get("binario") else ConexaoTexto
+            conexao = classe_conexao(TransporteDescartado())
+            registrado = self.servidor.registrar_jogador(conexao)
+            if registrado != jogador_id:
+                raise ValueError(f"A reprodução divergiu: jogador gravado com ID {jogador_id} registrado com ID {registrado}")
+            self.conexoes[jogador_id] = conexao
+            self.jogadores[jogador_id] = self.servidor.jogadores[jogador_id]
+        elif evento["evento"] == EVENTO_COMANDO:
+            self.servidor.despachar_comando(self.conexoes[jogador_id], jogador_id, evento["comando"])
+        elif evento["evento"] == EVENTO_EXPIROU:
+            sessao = self.servidor.jogadores[jogador_id].sessao_sala_tesouro
+            self.servidor.expirar_sala_tesouro(self.conexoes[jogador_id], jogador_id, sessao)
+        elif evento["evento"] == EVENTO_DESCONECTOU:
+            self.servidor.desconectar_jogador(jogador_id)
+
+
+def main():
+    """
+    Reproduz uma partida gravada e exibe o resultado e a velocidade da reprodução.
+    """
+    parser = argparse.ArgumentParser(description="Reproduz uma partida gravada com ARQUIVO_GRAVACAO.")
+    parser.add_argument("arquivo", help="Arquivo da gravação")
+    parser.add_argument("--repeticoes", type=int, default=1, help="Reproduções seguidas; o resultado de todas deve ser idêntico")
+    parser.add_argument("--verboso", action="store_true", help="Exibe a saída do servidor durante a reprodução")
+    args = parser.parse_args()
+
+    replay = Replay(args.arquivo)
+    resultados = []
+    for _ in range(args.repeticoes):
+        with contextlib.redirect_stdout(sys.stdout if args.verboso else io.StringIO()):
+            resultados.append(replay.executar())
+    resultado = min(resultados, key=lambda item: item["segundos"])
+    estados = {(item["resumo_mapa"], tuple(sorted(item["pontos"].items()))) for item in resultados}
+    print(f"Semente {replay.cabecalho['semente']}: {resultado['eventos']} eventos, {resultado['duracao']:.1f} s de partida")
+    print(f"Reprodução: {resultado['segundos'] * 1000:.1f} ms ({resultado['eventos'] / max(resultado['segundos'], 1e-9):.0f} eventos/s, {resultado['duracao'] / max(resultado['segundos'], 1e-9):.0f}x o tempo real)")
+    print(f"Pontos: {resultado['pontos']}, tesouros restantes: {resultado['tesouros_restantes']}, mapa {resultado['resumo_mapa']}")
+    if len(estados) > 1:
+        print("As reproduções divergiram entre si")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
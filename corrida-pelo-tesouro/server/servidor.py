@@ -1,7 +1,9 @@
+import itertools
 import socket
 import threading
 import time
 import random
+from contextlib import contextmanager
 from threading import Semaphore
 import os
 import sys
@@ -10,10 +12,33 @@ from dotenv import load_dotenv
 load_dotenv()
 IP_PRIVADO = os.getenv("IP_PRIVADO")
 PORTA = int(os.getenv("PORTA"))
+MODO_SERVIDOR = os.getenv("MODO_SERVIDOR", "threads")  # "threads" (uma thread por jogador), "async" (laço de eventos), "lobby" (várias partidas) ou "particoes" (mapa dividido entre processos)
+TEMPO_SALA_TESOURO = 10  # Segundos que um jogador pode permanecer na sala do tesouro
+INTERVALO_TICK = int(os.getenv("INTERVALO_TICK_MS", "0")) / 1000  # Intervalo entre ticks; 0 processa cada comando ao recebê-lo
+MAPA_COMPACTO = os.getenv("MAPA_COMPACTO", "0") == "1"  # Usa o MapaCompacto (NumPy) no mapa principal, para mapas muito grandes
+SEMENTE_PARTIDA = int(os.getenv("SEMENTE_PARTIDA")) if os.getenv("SEMENTE_PARTIDA") else None  # Semente dos sorteios da partida; vazio sorteia uma semente nova
+INTERVALO_RANKING = int(os.getenv("INTERVALO_RANKING_MS", "0")) / 1000  # Intervalo mínimo entre envios do ranking parcial; 0 envia o ranking apenas no fim do jogo
+TOP_RANKING = int(os.getenv("TOP_RANKING", "5"))  # Jogadores exibidos no ranking parcial
+LIMITE_COMANDOS = float(os.getenv("LIMITE_COMANDOS_POR_SEGUNDO", "0"))  # Comandos por segundo aceitos de cada jogador; 0 não limita
+RAJADA_COMANDOS = int(os.getenv("RAJADA_COMANDOS", "20"))  # Comandos que um jogador pode enviar de uma só vez antes de o limite valer
+MOVIMENTOS = {"w": (-1, 0), "a": (0, -1), "s": (1, 0), "d": (0, 1)}  # Deslocamento (linha, coluna) de cada movimento
+JANELA_VISAO = tuple(int(tamanho) for tamanho in os.getenv("JANELA_VISAO", "").split("x") if tamanho) or None  # Janela "linhasxcolunas" enviada a cada jogador; vazio envia o mapa inteiro
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from models.mapa import Mapa
+from models.mapa_compacto import MapaCompacto
 from models.colors import colors
+from models.protocolo import COMANDO_DELTA, COMANDO_ESTADO, COMANDO_SINCRONIZAR, MAGICA_BINARIO, TEMPO_NEGOCIACAO
+from server.agendador import Agendador
+from server.concorrencia import LocksRegionais
+from server.conexao import ConexaoBinaria, ConexaoTexto
+from server.gravacao import ARQUIVO_GRAVACAO, EVENTO_COMANDO, EVENTO_CONECTOU, EVENTO_DESCONECTOU, EVENTO_EXPIROU, GravacaoPartida
+from server.jogadores import AlocadorIds, Jogador, RegistroJogadores
+from server.limite import BaldeFichas
+from server.metricas import metricas, rotulo_comando
+from server.persistencia import DIRETORIO_PERSISTENCIA, Persistencia
+from server.ranking import Ranking
+from server.registro import RegistroEventos
 
 class Servidor:
     """
@@ -29,17 +54,41 @@ class Servidor:
         colunas_sala_tesouro (int): Número de colunas da sala do tesouro.
         max_tesouros_sala (int): Número máximo de tesouros na sala do tesouro.
         mapa_principal (Mapa): Instância do mapa principal.
-        jogadores (dict): Dicionário de jogadores conectados.
-        lock_mapa (Semaphore): Semáforo para controle de acesso ao mapa principal.
+        jogadores (RegistroJogadores): Jogadores conectados, indexados pelo ID e pela conexão.
+        ids_jogadores (AlocadorIds): Atribui os IDs dos jogadores, reaproveitando os IDs de quem saiu.
+        lock_mapa (LocksRegionais): Locks por região para controle de acesso ao mapa principal.
+        lock_jogadores (threading.Lock): Lock para controle de acesso ao registro de jogadores.
+        lock_salas (threading.Lock): Lock para criação das salas do tesouro e atualização do seu estado de coleta.
         sala_tesouro (Mapa): Instância da sala do tesouro.
         sala_tesouro_lock (Semaphore): Semáforo para controle de acesso à sala do tesouro.
-        server_socket (socket.socket): Socket do servidor.
+        server_socket (socket.socket): Socket do servidor, ou None se o servidor não escuta conexões próprias.
         cores_jogadores (list): Lista de cores para os jogadores.
         salas_tesouro (dict): Dicionário para armazenar o estado de cada sala do tesouro.
-        salas_tesouro_locks (dict): Dicionário para armazenar os semáforos de cada sala do tesouro.
+        salas_tesouro_locks (dict): Dicionário para armazenar os semáforos de cada sala do tesouro, criados quando a sala é visitada pela primeira vez.
         estado_salas_tesouro (dict): Dicionário para armazenar o estado de coleta de cada sala do tesouro.
+        salas_tesouro_pendentes (int): Quantidade de salas do tesouro que ainda possuem tesouros.
+        intervalo_tick (float): Segundos entre ticks no modo tick, ou 0 para processar cada comando ao recebê-lo.
+        versao_transmitida (int): Versão do mapa principal enviada a todos os jogadores no último tick.
+        agendador (Agendador): Agendador que encerra as sessões das salas do tesouro quando o tempo se esgota.
+        sessoes_sala_tesouro (itertools.count): Gerador de identificadores das sessões nas salas do tesouro.
+        registro (RegistroEventos): Registro assíncrono das ações dos jogadores.
+        janela_visao (tuple): Tamanho (linhas, colunas) da janela do mapa enviada a cada jogador, ou None para enviar o mapa inteiro.
+        pontos_restaurados (dict): Pontos restaurados do snapshot e do diário, mantidos no ranking e nos snapshots seguintes. Os seus IDs não são atribuídos a jogadores novos.
+        persistencia (Persistencia): Snapshots e diário do mundo, ou None se a persistência está desativada.
+        semente (int): Semente dos sorteios da partida.
+        rng (random.Random): Gerador dos sorteios da partida: tesouros do mapa principal e posições iniciais dos jogadores.
+        gravacao (GravacaoPartida): Gravação das entradas dos jogadores, ou None se a gravação está desativada.
+        ranking (Ranking): Classificação dos jogadores, atualizada a cada tesouro coletado.
+        intervalo_ranking (float): Intervalo mínimo, em segundos, entre envios do ranking parcial, ou 0 se ele está desativado.
+        top_ranking (int): Jogadores exibidos no ranking parcial.
+        ranking_agendado (bool): Indica se um envio do ranking parcial já está agendado.
+        limite_comandos (float): Comandos por segundo aceitos de cada jogador, ou 0 se os comandos não são limitados.
+        rajada_comandos (int): Comandos que um jogador pode enviar de uma só vez antes de o limite valer.
+        comandos_rejeitados (int): Comandos descartados pelo limite, de todos os jogadores.
+        comandos_agrupados (int): Movimentos aplicados junto com o anterior, sem um mapa próprio, de todos os jogadores.
+        parar (threading.Event): Sinaliza o fim do laço de ticks quando o servidor é encerrado.
     """
-    def __init__(self, host=IP_PRIVADO, port=PORTA, tamanho_mapa=(8, 8), max_tesouros_mapa=10, tamanho_sala_tesouro=(4, 4), max_tesouros_sala=16):
+    def __init__(self, host=IP_PRIVADO, port=PORTA, tamanho_mapa=(8, 8), max_tesouros_mapa=10, tamanho_sala_tesouro=(4, 4), max_tesouros_sala=16, tamanho_regiao=(4, 4), intervalo_tick=INTERVALO_TICK, escutar=True, mapa_compacto=MAPA_COMPACTO, janela_visao=JANELA_VISAO, diretorio_persistencia=DIRETORIO_PERSISTENCIA, semente=SEMENTE_PARTIDA, arquivo_gravacao=ARQUIVO_GRAVACAO, intervalo_ranking=INTERVALO_RANKING, top_ranking=TOP_RANKING, limite_comandos=LIMITE_COMANDOS, rajada_comandos=RAJADA_COMANDOS):
         """
         Inicializa a classe Servidor com os parâmetros do jogo.
         
@@ -50,6 +99,18 @@ class Servidor:
             max_tesouros_mapa (int): Número máximo de tesouros no mapa principal. Padrão é 10.
             tamanho_sala_tesouro (tuple): Tamanho da sala do tesouro (linhas, colunas). Padrão é (4, 4).
             max_tesouros_sala (int): Número máximo de tesouros na sala do tesouro. Padrão é 16.
+            tamanho_regiao (tuple): Tamanho das regiões do mapa principal protegidas por um mesmo lock. Padrão é (4, 4).
+            intervalo_tick (float): Segundos entre ticks. Se maior que zero, os comandos são enfileirados e aplicados em lote a cada tick.
+            escutar (bool): Abre o socket do servidor. Partidas hospedadas pelo Lobby recebem os jogadores já conectados e não escutam.
+            mapa_compacto (bool): Representa o mapa principal com o MapaCompacto, que requer o NumPy.
+            janela_visao (tuple): Tamanho (linhas, colunas) da janela do mapa, centrada no jogador, enviada a cada jogador. Se None, o mapa inteiro é enviado.
+            diretorio_persistencia (str): Diretório dos snapshots e do diário do mundo. Se vazio, o mundo não é persistido.
+            semente (int): Semente dos sorteios da partida. Se None, uma semente nova é sorteada.
+            arquivo_gravacao (str): Arquivo em que as entradas dos jogadores são gravadas para o Replay. Se vazio, nada é gravado.
+            intervalo_ranking (float): Intervalo mínimo, em segundos, entre envios do ranking parcial aos jogadores. Se 0, o ranking é enviado apenas no fim do jogo.
+            top_ranking (int): Jogadores exibidos no ranking parcial.
+            limite_comandos (float): Comandos por segundo aceitos de cada jogador; os excedentes são descartados. Se 0, os comandos não são limitados.
+            rajada_comandos (int): Comandos que um jogador pode enviar de uma só vez antes de o limite valer.
         """
         self.host = host
         self.port = port
@@ -57,37 +118,109 @@ class Servidor:
         self.max_tesouros_mapa = max_tesouros_mapa
         self.linhas_sala_tesouro, self.colunas_sala_tesouro = tamanho_sala_tesouro
         self.max_tesouros_sala = max_tesouros_sala
-        self.mapa_principal = Mapa(self.linhas_mapa_principal, self.colunas_mapa_principal)  # Mapa principal
+        self.semente = semente if semente is not None else random.SystemRandom().randrange(2 ** 32)
+        self.rng = random.Random(self.semente)
+        classe_mapa = MapaCompacto if mapa_compacto else Mapa
+        self.mapa_principal = classe_mapa(self.linhas_mapa_principal, self.colunas_mapa_principal, self.rng)  # Mapa principal
         self.mapa_principal.inicializar_tesouros(quantidade=max_tesouros_mapa)  # Inicializa o mapa principal com tesouros
-        self.jogadores = {}
-        self.lock_mapa = Semaphore()  # Semáforo para acesso ao mapa principal
+        self.jogadores = RegistroJogadores()
+        self.ids_jogadores = AlocadorIds()
+        self.lock_mapa = LocksRegionais(self.linhas_mapa_principal, self.colunas_mapa_principal, tamanho_regiao)  # Locks por região do mapa principal
+        self.lock_jogadores = threading.Lock()  # Lock para o registro de jogadores
+        self.lock_salas = threading.Lock()  # Lock para criação e estado das salas do tesouro
         self.sala_tesouro = None  # Sala do tesouro
         self.sala_tesouro_lock = Semaphore(1)  # Controle de exclusão mútua
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.bind((self.host, self.port))
-        self.server_socket.listen(5)
+        self.server_socket = None
+        if escutar:
+            self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.server_socket.bind((self.host, self.port))
+            self.server_socket.listen(5)
         self.cores_jogadores = [colors.OKGREEN, colors.OKBLUE, colors.OKPURPLE, colors.ORANGE, colors.GOLD]
         self.salas_tesouro = {}  # Dicionário para armazenar o estado de cada sala do tesouro
         self.salas_tesouro_locks = {}  # Dicionário para armazenar os semáforos de cada sala do tesouro
         self.estado_salas_tesouro = {}  # Dicionário para armazenar o estado de coleta de cada sala do tesouro
+        self.salas_tesouro_pendentes = 0  # Contador de salas do tesouro ainda não esvaziadas
+        self.intervalo_tick = intervalo_tick
+        self.versao_transmitida = None
+        self.parar = threading.Event()
+        self.agendador = Agendador()
+        self.sessoes_sala_tesouro = itertools.count(1)
+        self.registro = RegistroEventos()
+        self.janela_visao = janela_visao
+        self.ranking = Ranking()
+        self.intervalo_ranking = intervalo_ranking
+        self.top_ranking = top_ranking
+        self.ranking_agendado = False
+        self.limite_comandos = limite_comandos
+        self.rajada_comandos = rajada_comandos
+        self.comandos_rejeitados = 0
+        self.comandos_agrupados = 0
+        self.pontos_restaurados = {}
+        self.persistencia = None
+        restaurado = False
+        if diretorio_persistencia:
+            self.persistencia = Persistencia(self, diretorio_persistencia)
+            restaurado = self.persistencia.restaurar()
+            if restaurado:
+                print(f"Mundo restaurado de {diretorio_persistencia}")
+                self.ids_jogadores.reservar(self.pontos_restaurados)  # Os jogadores novos não herdam os pontos de quem jogou antes da reinicialização
+                for jogador_id, pontos in self.pontos_restaurados.items():
+                    self.ranking.definir(jogador_id, pontos)
+            self.persistencia.iniciar()
+        self.gravacao = None
+        if arquivo_gravacao:
+            parametros = {"tamanho_mapa": tamanho_mapa, "max_tesouros_mapa": max_tesouros_mapa, "tamanho_sala_tesouro": tamanho_sala_tesouro, "max_tesouros_sala": max_tesouros_sala, "tamanho_regiao": tamanho_regiao, "mapa_compacto": mapa_compacto, "janela_visao": janela_visao}
+            self.gravacao = GravacaoPartida(arquivo_gravacao, self.semente, parametros, restaurada=restaurado)
+            print(f"Gravando a partida (semente {self.semente}) em {arquivo_gravacao}")
+        self.registrar_medidores()
         self.inicializar_salas_tesouro()
 
+    def registrar_medidores(self):
+        """
+        Registra as métricas do servidor lidas no momento da coleta: jogadores conectados, ocupação das
+        salas do tesouro, bytes, chamadas de envio e fila de saída de cada conexão e comandos
+        descartados pelo limite ou agrupados de cada jogador.
+        """
+        def conexoes(atributo):
+            with self.lock_jogadores:
+                jogadores = list(self.jogadores.items())
+            return [({"jogador": jogador_id}, getattr(jogador.socket, atributo, 0)) for jogador_id, jogador in jogadores]
+
+        def por_jogador(atributo):
+            with self.lock_jogadores:
+                jogadores = list(self.jogadores.items())
+            return [({"jogador": jogador_id}, getattr(jogador, atributo)) for jogador_id, jogador in jogadores]
+
+        metricas.registrar_medidor("jogadores_conectados", lambda: len(self.jogadores))
+        metricas.registrar_medidor("jogadores_salas_tesouro", lambda: sum(1 for jogador in list(self.jogadores.values()) if jogador.na_sala_tesouro))
+        metricas.registrar_medidor("salas_tesouro_pendentes", lambda: self.salas_tesouro_pendentes)
+        metricas.registrar_medidor("conexao_bytes_enviados", lambda: conexoes("bytes_enviados"))
+        metricas.registrar_medidor("conexao_envios", lambda: conexoes("envios"))
+        metricas.registrar_medidor("conexao_fila_saida_bytes", lambda: conexoes("bytes_pendentes"))
+        metricas.registrar_medidor("conexao_quadros_substituidos", lambda: conexoes("quadros_substituidos"))
+        metricas.registrar_medidor("comandos_rejeitados", lambda: self.comandos_rejeitados)
+        metricas.registrar_medidor("comandos_agrupados", lambda: self.comandos_agrupados)
+        metricas.registrar_medidor("jogador_comandos_rejeitados", lambda: por_jogador("comandos_rejeitados"))
+        metricas.registrar_medidor("jogador_comandos_agrupados", lambda: por_jogador("comandos_agrupados"))
+        metricas.registrar_medidor("registro_eventos_descartados", lambda: self.registro.descartados)
+
     def inicializar_salas_tesouro(self):
         """
         Inicializa o estado das salas do tesouro no mapa principal.
+        
+        Apenas as salas são contadas: o mapa e o semáforo de cada sala são criados quando um jogador
+        entra nela pela primeira vez, e uma sala sem registro em `estado_salas_tesouro` ainda não foi coletada.
         """
-        for i in range(self.linhas_mapa_principal):
-            for j in range(self.colunas_mapa_principal):
-                if self.mapa_principal.eh_sala_tesouro((i, j)):
-                    self.estado_salas_tesouro[(i, j)] = False # Inicializa o estado da sala do tesouro como não coletada
-                    self.salas_tesouro_locks[(i, j)] = Semaphore(1) # Inicializa os semáforos das salas do tesouro
-                    
+        self.salas_tesouro_pendentes = self.mapa_principal.contar_salas_tesouro()
 
     def iniciar(self):
         """
         Inicia o servidor e aguarda conexões de jogadores.
         """
         print("Aguardando jogadores...")
+        metricas.iniciar_servidor()
+        if self.intervalo_tick:
+            threading.Thread(target=self.executar_ticks, daemon=True).start()
         while True:
             client_socket, addr = self.server_socket.accept()
             print(f"Conexão estabelecida com {addr}")
@@ -110,6 +243,55 @@ class Servidor:
                      "###############################################################\n\n"
         return instrucoes
 
+    def registrar_jogador(self, client_socket, jogador_id=None):
+        """
+        Registra um novo jogador no mapa principal e envia as boas-vindas.
+        
+        Args:
+            client_socket (ConexaoTexto): Conexão do jogador.
+            jogador_id (int): ID atribuído ao jogador fora deste servidor, como pelo roteador das partições. Se None, o ID é atribuído aqui.
+        
+        Returns:
+            int: ID do jogador registrado.
+        """
+        with self.lock_jogadores:
+            try:
+                pos_inicial = self.mapa_principal.posicao_aleatoria()  # Sorteada na ordem de registro, para que a partida seja reproduzível
+            except ValueError:
+                pos_inicial = (self.rng.randrange(self.linhas_mapa_principal), self.rng.randrange(self.colunas_mapa_principal))  # Mapa sem células vazias: qualquer célula serve
+            if jogador_id is None:
+                jogador_id = self.ids_jogadores.alocar()
+            self.adicionar_jogador(client_socket, jogador_id, pos_inicial)
+        with self.lock_mapa.regioes(pos_inicial):
+            self.mapa_principal.posicionar_jogador(jogador_id, pos_inicial)
+        
+        with client_socket.agrupar():  # Boas-vindas, instruções e mapa saem em uma única escrita
+            client_socket.send(f"\nBem-vindo ao jogo! Você é o jogador {jogador_id}\n\n".encode())
+            client_socket.send(self.exibir_instrucoes().encode())
+            self.enviar_mapa(client_socket, jogador_id, self.mapa_principal)  # Envia o mapa ao jogador
+        return jogador_id
+
+    def adicionar_jogador(self, client_socket, jogador_id, pos):
+        """
+        Cria o registro de um jogador. O lock dos jogadores já deve estar adquirido.
+        
+        Args:
+            client_socket (ConexaoTexto): Conexão do jogador.
+            jogador_id (int): ID do jogador.
+            pos (tuple): Posição do jogador no mapa principal.
+        
+        Returns:
+            Jogador: Jogador registrado.
+        """
+        rng = random.Random(f"{self.semente}:{jogador_id}")  # Sorteios próprios do jogador, independentes da ordem entre jogadores
+        limite = BaldeFichas(self.limite_comandos, self.rajada_comandos) if self.limite_comandos else None
+        jogador = Jogador(jogador_id, client_socket, pos, 0, rng, limite)
+        self.jogadores.adicionar(jogador)
+        self.ranking.definir(jogador_id, 0)
+        if self.gravacao:
+            self.gravacao.registrar(jogador_id, EVENTO_CONECTOU, binario=client_socket.binario)
+        return jogador
+
     def gerenciar_jogador(self, client_socket):
         """
         Gerencia a conexão e as ações de um jogador.
@@ -117,170 +299,411 @@ class Servidor:
         Args:
             client_socket (socket.socket): Socket do jogador.
         """
-        jogador_id = len(self.jogadores) + 1
-        pos_inicial = self.mapa_principal.posicao_aleatoria()
-        self.jogadores[jogador_id] = {"socket": client_socket, "pos": pos_inicial, "pontos": 0}
-        
-        client_socket.send(f"\nBem-vindo ao jogo! Você é o jogador {jogador_id}\n\n".encode())
-        client_socket.send(self.exibir_instrucoes().encode())
-        client_socket.send(self.mapa_principal.exibir_mapa(self.jogadores).encode())  # Envia o mapa ao jogador
+        conexao = self.negociar_protocolo(client_socket)
+        jogador_id = self.registrar_jogador(conexao)
+        self.atender_comandos(conexao, jogador_id)
 
-        while True:
+    def atender_comandos(self, conexao, jogador_id):
+        """
+        Recebe e aplica os comandos de um jogador enquanto ele estiver neste servidor.
+        
+        O jogador é acompanhado pela conexão, e não pelo ID: depois que ele sai, o seu ID pode ser
+        atribuído a outro jogador.
+        
+        Args:
+            conexao (ConexaoTexto): Conexão do jogador.
+            jogador_id (int): ID do jogador.
+        """
+        while self.jogadores.por_conexao(conexao) is not None:
             try:
-                comando = client_socket.recv(1024).decode().strip().lower()
-                self.processar_comando(client_socket, jogador_id, comando)
+                comando = conexao.receber_comando()
+                if not self.admitir_comando(conexao, jogador_id, comando):
+                    continue
+                if self.intervalo_tick:
+                    self.enfileirar_comando(jogador_id, comando)
+                elif comando in MOVIMENTOS:
+                    self.despachar_movimentos(conexao, jogador_id, comando)
+                else:
+                    self.despachar_comando(conexao, jogador_id, comando)
             except ConnectionResetError:
-                print(f"Jogador {jogador_id} desconectado abruptamente.")
-                del self.jogadores[jogador_id]
-                client_socket.close()
+                if conexao.atrasada:
+                    print(f"Jogador {jogador_id} desconectado por não acompanhar os envios do servidor.")
+                else:
+                    print(f"Jogador {jogador_id} desconectado abruptamente.")
+                self.desconectar_conexao(conexao)
+                conexao.close()
                 break
             except OSError:
+                self.desconectar_conexao(conexao)
                 break
 
+    def negociar_protocolo(self, client_socket):
+        """
+        Identifica o protocolo usado pelo jogador logo após a conexão.
+        
+        Clientes que suportam o protocolo binário enviam MAGICA_BINARIO assim que conectam. Se ela não
+        chegar em TEMPO_NEGOCIACAO segundos, o jogador usa o protocolo de texto original.
+        
+        Args:
+            client_socket (socket.socket): Socket do jogador.
+        
+        Returns:
+            ConexaoTexto: Conexão do jogador, binária ou de texto.
+        """
+        dados = b""
+        client_socket.settimeout(TEMPO_NEGOCIACAO)
+        try:
+            while len(dados) < len(MAGICA_BINARIO) and MAGICA_BINARIO.startswith(dados):
+                recebido = client_socket.recv(len(MAGICA_BINARIO) - len(dados))
+                if not recebido:
+                    break
+                dados += recebido
+        except socket.timeout:
+            pass
+        finally:
+            client_socket.settimeout(None)
+        if dados == MAGICA_BINARIO:
+            return ConexaoBinaria(client_socket, agendador=self.agendador)
+        return ConexaoTexto(client_socket, dados, agendador=self.agendador)
+
+    def desconectar_jogador(self, jogador_id):
+        """
+        Remove um jogador do jogo, liberando a sala do tesouro que ele estiver ocupando.
+        
+        O ID do jogador só é liberado depois que ele é retirado dos mapas, para que um jogador que
+        receba o mesmo ID não seja afetado.
+        
+        Args:
+            jogador_id (int): ID do jogador.
+        """
+        with self.lock_jogadores:
+            jogador = self.jogadores.remover(jogador_id)
+            self.ranking.remover(jogador_id)
+        if jogador is None:
+            return
+        pos = self.mapa_principal.posicoes_jogadores.get(jogador_id)
+        if pos is not None:
+            with self.lock_mapa.regioes(pos):
+                self.mapa_principal.remover_jogador(jogador_id)
+        if jogador.na_sala_tesouro:
+            jogador.expiracao_sala_tesouro.cancelar()
+            self.salas_tesouro[jogador.sala_tesouro].remover_jogador(jogador_id)
+        with self.lock_salas, self.lock_jogadores:  # Gravado junto com a liberação da sala e do ID, na mesma ordem em relação às entradas e aos registros
+            self.gravar_evento(jogador_id, EVENTO_DESCONECTOU)
+            if jogador.na_sala_tesouro:
+                self.salas_tesouro_locks[jogador.sala_tesouro].release()
+            self.ids_jogadores.liberar(jogador_id)
+
+    def desconectar_conexao(self, conexao):
+        """
+        Remove do jogo o jogador de uma conexão, se ele ainda estiver registrado.
+        
+        Ao contrário de `desconectar_jogador`, não afeta um jogador que tenha recebido o ID de quem já saiu.
+        
+        Args:
+            conexao (ConexaoTexto): Conexão do jogador.
+        """
+        jogador = self.jogadores.por_conexao(conexao)
+        if jogador is not None:
+            self.desconectar_jogador(jogador.id)
+
     def log_acao_jogador(self, jogador_id, acao, detalhe=""):
         """
         Registra a ação de um jogador no console.
         
+        A escrita é feita pela thread do registro, fora do caminho do comando.
+        
         Args:
             jogador_id (int): ID do jogador.
             acao (str): Ação realizada pelo jogador.
             detalhe (str): Detalhes adicionais da ação.
         """
         cor = self.cores_jogadores[(jogador_id - 1) % len(self.cores_jogadores)]
-        print(f"{cor}Jogador {jogador_id}: {acao} {detalhe}{colors.ENDC}")
+        self.registro.registrar(jogador_id, acao, detalhe, cor)
+
+    def log_evento(self, acao, detalhe=""):
+        """
+        Registra no console um evento do jogo que não pertence a um jogador, pela thread do registro.
+        
+        Args:
+            acao (str): Descrição do evento.
+            detalhe (str): Detalhes adicionais do evento.
+        """
+        self.registro.registrar(None, acao, detalhe)
 
     def processar_comando(self, client_socket, jogador_id, comando):
         """
         Processa o comando recebido de um jogador.
         
         Args:
-            client_socket (socket.socket): Socket do jogador.
+            client_socket (ConexaoTexto): Conexão do jogador.
             jogador_id (int): ID do jogador.
             comando (str): Comando recebido do jogador.
         """
-        movimentos = {"w": (-1, 0), "a": (0, -1), "s": (1, 0), "d": (0, 1)}
-        jogador_pos = self.jogadores[jogador_id]["pos"]
+        jogador_pos = self.jogadores[jogador_id].pos
 
-        if comando in movimentos:
-            nova_pos = (jogador_pos[0] + movimentos[comando][0], jogador_pos[1] + movimentos[comando][1])
+        if comando in MOVIMENTOS:
+            nova_pos = (jogador_pos[0] + MOVIMENTOS[comando][0], jogador_pos[1] + MOVIMENTOS[comando][1])
             if self.mapa_principal.valida_posicao(nova_pos):
-                with self.lock_mapa:
-                    self.jogadores[jogador_id]["pos"] = nova_pos
-                    self.jogadores[jogador_id]["pos_anterior"] = nova_pos  # atualiza a posição anterior do jogador
-                    self.log_acao_jogador(jogador_id, "moveu-se para", nova_pos)
-                    if self.mapa_principal.coletar_tesouro(nova_pos):
-                        self.jogadores[jogador_id]["pontos"] += 1  # Pontos do jogador
-                        client_socket.send(f"\n{colors.OKGREEN}>>> Tesouro coletado <<<{colors.ENDC}\n".encode())
-                        self.log_acao_jogador(jogador_id, "coletou um tesouro em", nova_pos)
-                        if self.todos_tesouros_coletados():
-                            self.exibir_ranking()
-                    if self.todos_tesouros_mapa_principal_coletados():
-                        print("Todos os tesouros do mapa principal foram coletados")
-                        client_socket.send(f"\n{colors.OKGREEN}>>> Todos os tesouros do mapa principal foram coletados <<<{colors.ENDC}\n".encode())
+                with self.lock_mapa.regioes(jogador_pos, nova_pos):  # Apenas as regiões de origem e destino são bloqueadas
+                    self.gravar_evento(jogador_id, EVENTO_COMANDO, comando=comando)  # Na mesma ordem em que os jogadores disputam a célula
+                    self.jogadores[jogador_id].pos = nova_pos
+                    self.jogadores[jogador_id].pos_anterior = nova_pos  # atualiza a posição anterior do jogador
+                    self.mapa_principal.posicionar_jogador(jogador_id, nova_pos)
+                    coletou = self.mapa_principal.coletar_tesouro(nova_pos)
+                self.log_acao_jogador(jogador_id, "moveu-se para", self.posicao_mundo(nova_pos))
+                if coletou:
+                    self.pontuar(jogador_id)
+                    if self.persistencia:
+                        self.persistencia.registrar_coleta_mapa(jogador_id, nova_pos)
+                    client_socket.send(f"\n{colors.OKGREEN}>>> Tesouro coletado <<<{colors.ENDC}\n".encode())
+                    self.log_acao_jogador(jogador_id, "coletou um tesouro em", self.posicao_mundo(nova_pos))
+                    if self.todos_tesouros_coletados():
+                        self.exibir_ranking()
+                if self.todos_tesouros_mapa_principal_coletados():
+                    if coletou:  # Registrado uma vez, na coleta do último tesouro
+                        self.log_evento("Todos os tesouros do mapa principal foram coletados")
+                    client_socket.send(f"\n{colors.OKGREEN}>>> Todos os tesouros do mapa principal foram coletados <<<{colors.ENDC}\n".encode())
+            else:
+                self.gravar_evento(jogador_id, EVENTO_COMANDO, comando=comando)
             # self.atualizar_mapas_para_todos_jogadores()
-            client_socket.send(self.mapa_principal.exibir_mapa(self.jogadores, posicao_do_jogador="pos_anterior").encode())  # Envia o mapa atualizado ao jogador
+            self.enviar_mapa(client_socket, jogador_id, self.mapa_principal)  # Envia o mapa atualizado ao jogador
 
         elif comando.startswith("ent"):
             if self.mapa_principal.eh_sala_tesouro(jogador_pos):
-                if jogador_pos not in self.salas_tesouro:
-                    self.salas_tesouro[jogador_pos] = Mapa(self.linhas_sala_tesouro, self.colunas_sala_tesouro)  # Criando um novo mapa da sala do tesouro
-                    self.salas_tesouro[jogador_pos].inicializar_tesouros(quantidade=self.max_tesouros_sala, sala_tesouro=True)  # Inicializa a sala com tesouros
-                if not self.estado_salas_tesouro.get(jogador_pos, False):  # Verifica se todos os tesouros da sala do tesouro já foram coletados
-                    if self.salas_tesouro_locks[jogador_pos].acquire(blocking=False):
-                        self.sala_tesouro = self.salas_tesouro[jogador_pos]
-                        self.log_acao_jogador(jogador_id, "entrou na sala do tesouro")
-                        self.jogadores[jogador_id]["na_sala_tesouro"] = True  # Jogador dentro da sala do tesouro
-                        self.jogadores[jogador_id]["pos_anterior"] = self.jogadores[jogador_id]["pos"]  # Salva a última posição do jogador
+                with self.lock_salas:  # A sala é criada, consultada e ocupada na mesma ordem em que a entrada é gravada
+                    self.gravar_evento(jogador_id, EVENTO_COMANDO, comando=comando)
+                    if jogador_pos not in self.salas_tesouro:
+                        self.salas_tesouro[jogador_pos] = Mapa(self.linhas_sala_tesouro, self.colunas_sala_tesouro, self.jogadores[jogador_id].rng)  # Criando um novo mapa da sala do tesouro
+                        self.salas_tesouro[jogador_pos].inicializar_tesouros(quantidade=self.max_tesouros_sala, sala_tesouro=True)  # Inicializa a sala com tesouros
+                        self.salas_tesouro_locks[jogador_pos] = Semaphore(1)
+                    coletada = self.estado_salas_tesouro.get(jogador_pos, False)  # Verifica se todos os tesouros da sala do tesouro já foram coletados
+                    ocupada = not coletada and not self.salas_tesouro_locks[jogador_pos].acquire(blocking=False)
+                if not coletada:
+                    if not ocupada:
                         self.sala_do_tesouro(client_socket, jogador_id, jogador_pos)
-                        self.jogadores[jogador_id]["na_sala_tesouro"] = False  # Jogador fora da sala do tesouro
-                        self.salas_tesouro_locks[jogador_pos].release()
+                        return  # O mapa principal é reenviado ao sair da sala do tesouro
                     else:
                         client_socket.send(f"\n{colors.RED}>>> A sala do tesouro está ocupada por outro jogador <<<{colors.ENDC}\n".encode())
                 else:
                     client_socket.send(f"{colors.RED}Você não pode entrar em um Tesouro que já foi coletado{colors.ENDC}\n".encode())
             else:
+                self.gravar_evento(jogador_id, EVENTO_COMANDO, comando=comando)
                 client_socket.send(f"{colors.RED}Você não está em uma sala do tesouro{colors.ENDC}\n".encode())
             # self.atualizar_mapas_para_todos_jogadores()
-            client_socket.send(self.mapa_principal.exibir_mapa(self.jogadores, posicao_do_jogador="pos_anterior").encode())  # Envia o mapa atualizado ao jogador
+            self.enviar_mapa(client_socket, jogador_id, self.mapa_principal)  # Envia o mapa atualizado ao jogador
 
         elif comando.startswith("sai"):
-            print(f"Jogador {jogador_id} desconectado.")
             self.log_acao_jogador(jogador_id, "desconectou-se do jogo")
-            del self.jogadores[jogador_id]
+            self.desconectar_jogador(jogador_id)
             try:
                 client_socket.send("Saindo do jogo...\n".encode())
             except ConnectionResetError:
                 pass
             client_socket.close()
 
+        elif comando in (COMANDO_DELTA, COMANDO_SINCRONIZAR, COMANDO_ESTADO):
+            self.sincronizar_mapa(jogador_id, ativar_delta=comando == COMANDO_DELTA, ativar_estado=comando == COMANDO_ESTADO)
+            self.enviar_mapa(client_socket, jogador_id, self.mapa_principal)
+
         else:
             client_socket.send(f"{colors.RED}Movimento inválido, tente um comando válido{colors.ENDC}\n".encode())
-            client_socket.send(self.mapa_principal.exibir_mapa(self.jogadores).encode())  # Envia o mapa ao jogador
+            self.enviar_mapa(client_socket, jogador_id, self.mapa_principal)  # Envia o mapa ao jogador
 
     def sala_do_tesouro(self, client_socket, jogador_id, posicao_anterior):
         """
-        Gerencia a entrada e ações do jogador na sala do tesouro.
+        Gerencia a entrada do jogador na sala do tesouro.
+        
+        A sessão não prende a thread do jogador: os comandos seguintes são encaminhados à sala por
+        `despachar_comando`, e o agendador encerra a sessão assim que o tempo da sala se esgota,
+        mesmo que o jogador não envie nenhum comando.
         
         Args:
-            client_socket (socket.socket): Socket do jogador.
+            client_socket (ConexaoTexto): Conexão do jogador.
             jogador_id (int): ID do jogador.
             posicao_anterior (tuple): Posição anterior do jogador no mapa principal.
         """
-        x, y = posicao_anterior
-        client_socket.send(f"\n>>> Você entrou na sala do tesouro ({x, y}) <<<".encode())
-        client_socket.send(f"\n{colors.RED}>>> Você tem 10 segundos para coletar os Tesouros dessa sala <<<{colors.ENDC}\n\n".encode())
-        jogador_pos = (random.randint(0, self.linhas_sala_tesouro - 1), random.randint(0, self.colunas_sala_tesouro - 1))
-        self.jogadores[jogador_id]["pos"] = jogador_pos
-        client_socket.send(self.sala_tesouro.exibir_mapa({jogador_id: {"pos": jogador_pos}}).encode())  # Envia o mapa da sala do tesouro
-
-        tempo_restante = 10
-        start_time = time.time()
-        while tempo_restante > 0:
-            try:
-                comando = client_socket.recv(1024).decode().strip().lower()
-                movimentos = {"w": (-1, 0), "a": (0, -1), "s": (1, 0), "d": (0, 1)}
-                if comando in movimentos:
-                    nova_pos = (jogador_pos[0] + movimentos[comando][0], jogador_pos[1] + movimentos[comando][1])
-                    if self.sala_tesouro.valida_posicao(nova_pos):
-                        jogador_pos = nova_pos
-                        self.jogadores[jogador_id]["pos"] = jogador_pos
-                        self.log_acao_jogador(jogador_id, "moveu-se para", nova_pos)
-                        if self.sala_tesouro.coletar_tesouro(nova_pos):
-                            self.jogadores[jogador_id]["pontos"] += 1  # Pontos do jogador
-                            client_socket.send(f"\n{colors.OKGREEN}>>> Tesouro coletado <<<{colors.ENDC}\n".encode())
-                            self.log_acao_jogador(jogador_id, "coletou um tesouro em", nova_pos)
-                        if self.sala_tesouro.todos_tesouros_coletados():
-                            self.estado_salas_tesouro[posicao_anterior] = True
-                            x, y = posicao_anterior
-                            self.mapa_principal.celulas[x][y] = f"{colors.RED}x{colors.ENDC}"
-                            client_socket.send(f"\n{colors.OKGREEN}>>> Todos os tesouros desta sala foram coletados <<<{colors.ENDC}\n".encode())
-                            print(f"Todos os tesouros da sala {(x, y)} foram coletados")
-                elif comando.startswith("sai"):
-                    self.log_acao_jogador(jogador_id, "saiu da sala do tesouro")
-                    client_socket.send("Você saiu da sala do tesouro.\n".encode())
-                    break
-                else:
-                    client_socket.send(f"{colors.RED}\n>>> Movimento inválido, tente um comando válido <<<{colors.ENDC}\n".encode())
-                client_socket.send(self.sala_tesouro.exibir_mapa({jogador_id: {"pos": jogador_pos}}).encode())  # Envia o mapa atualizado ao jogador
-            except BlockingIOError:
-                pass
-            except ConnectionResetError:
-                break
+        self.entrar_sala_tesouro(client_socket, jogador_id, posicao_anterior)
 
-            tempo_restante = 10 - int(time.time() - start_time)
-            time.sleep(0.1)
+    def expirar_sala_tesouro(self, client_socket, jogador_id, sessao):
+        """
+        Encerra a sessão do jogador na sala do tesouro quando o tempo da sala se esgota.
+        
+        Args:
+            client_socket (ConexaoTexto): Conexão do jogador.
+            jogador_id (int): ID do jogador.
+            sessao (int): Sessão na sala do tesouro que expirou.
+        """
+        jogador = self.jogadores.get(jogador_id)
+        if jogador is None:
+            return
+        with jogador.lock, client_socket.agrupar():
+            if jogador.na_sala_tesouro and jogador.sessao_sala_tesouro == sessao:
+                self.sair_sala_tesouro(client_socket, jogador_id, tempo_esgotado=True)
 
-        if tempo_restante <= 0:
-            client_socket.send(f"\n{colors.RED}>>> Tempo esgotado :( <<<{colors.ENDC}\n".encode())
+    def entrar_sala_tesouro(self, client_socket, jogador_id, posicao_anterior):
+        """
+        Coloca o jogador dentro da sala do tesouro, agenda o fim da sessão e envia o mapa da sala.
+        
+        O semáforo da sala já deve ter sido adquirido pelo chamador.
+        
+        Args:
+            client_socket (ConexaoTexto): Conexão do jogador.
+            jogador_id (int): ID do jogador.
+            posicao_anterior (tuple): Posição anterior do jogador no mapa principal.
+        """
+        self.sala_tesouro = self.salas_tesouro[posicao_anterior]
+        self.log_acao_jogador(jogador_id, "entrou na sala do tesouro")
+        jogador = self.jogadores[jogador_id]
+        jogador.na_sala_tesouro = True  # Jogador dentro da sala do tesouro
+        jogador.sala_tesouro = posicao_anterior  # Sala ocupada pelo jogador
+        jogador.pos_anterior = jogador.pos  # Salva a última posição do jogador
+        jogador.sessao_sala_tesouro = sessao = next(self.sessoes_sala_tesouro)
+        jogador.expiracao_sala_tesouro = self.agendador.agendar(TEMPO_SALA_TESOURO, self.expirar_sala_tesouro, client_socket, jogador_id, sessao)
+
+        x, y = self.posicao_mundo(posicao_anterior)
+        client_socket.send(f"\n>>> Você entrou na sala do tesouro ({x, y}) <<<".encode())
+        client_socket.send(f"\n{colors.RED}>>> Você tem {TEMPO_SALA_TESOURO} segundos para coletar os Tesouros dessa sala <<<{colors.ENDC}\n\n".encode())
+        jogador_pos = (jogador.rng.randint(0, self.linhas_sala_tesouro - 1), jogador.rng.randint(0, self.colunas_sala_tesouro - 1))
+        jogador.pos = jogador_pos
+        self.salas_tesouro[posicao_anterior].posicionar_jogador(jogador_id, jogador_pos)
+        self.enviar_mapa(client_socket, jogador_id, self.salas_tesouro[posicao_anterior])  # Envia o mapa da sala do tesouro
+
+    def processar_comando_sala(self, client_socket, jogador_id, comando):
+        """
+        Processa um comando recebido de um jogador que está dentro da sala do tesouro.
+        
+        Args:
+            client_socket (ConexaoTexto): Conexão do jogador.
+            jogador_id (int): ID do jogador.
+            comando (str): Comando recebido do jogador.
+        
+        Returns:
+            bool: False se o jogador pediu para sair da sala, True caso contrário.
+        """
+        posicao_sala = self.jogadores[jogador_id].sala_tesouro
+        sala_tesouro = self.salas_tesouro[posicao_sala]
+        jogador_pos = self.jogadores[jogador_id].pos
+        if comando in MOVIMENTOS:
+            nova_pos = (jogador_pos[0] + MOVIMENTOS[comando][0], jogador_pos[1] + MOVIMENTOS[comando][1])
+            if sala_tesouro.valida_posicao(nova_pos):
+                jogador_pos = nova_pos
+                self.jogadores[jogador_id].pos = jogador_pos
+                sala_tesouro.posicionar_jogador(jogador_id, jogador_pos)
+                self.log_acao_jogador(jogador_id, "moveu-se para", nova_pos)
+                if sala_tesouro.coletar_tesouro(nova_pos):
+                    self.pontuar(jogador_id)
+                    if self.persistencia:
+                        self.persistencia.registrar_coleta_sala(jogador_id, posicao_sala, nova_pos)
+                    client_socket.send(f"\n{colors.OKGREEN}>>> Tesouro coletado <<<{colors.ENDC}\n".encode())
+                    self.log_acao_jogador(jogador_id, "coletou um tesouro em", nova_pos)
+                if sala_tesouro.todos_tesouros_coletados():
+                    self.marcar_sala_coletada(posicao_sala)
+                    x, y = self.posicao_mundo(posicao_sala)
+                    client_socket.send(f"\n{colors.OKGREEN}>>> Todos os tesouros desta sala foram coletados <<<{colors.ENDC}\n".encode())
+                    self.log_evento("Todos os tesouros foram coletados na sala", (x, y))
+        elif comando.startswith("sai"):
+            self.log_acao_jogador(jogador_id, "saiu da sala do tesouro")
+            client_socket.send("Você saiu da sala do tesouro.\n".encode())
+            return False
+        elif comando in (COMANDO_DELTA, COMANDO_SINCRONIZAR, COMANDO_ESTADO):
+            self.sincronizar_mapa(jogador_id, ativar_delta=comando == COMANDO_DELTA, ativar_estado=comando == COMANDO_ESTADO)
+        else:
+            client_socket.send(f"{colors.RED}\n>>> Movimento inválido, tente um comando válido <<<{colors.ENDC}\n".encode())
+        self.enviar_mapa(client_socket, jogador_id, sala_tesouro)  # Envia o mapa atualizado ao jogador
+        return True
 
-        self.jogadores[jogador_id]["pos"] = posicao_anterior  # Retorna o jogador à posição anterior no mapa principal
-        self.jogadores[jogador_id]["pos_anterior"] = posicao_anterior  # Garante que a posição anterior seja atualizada
+    def sair_sala_tesouro(self, client_socket, jogador_id, tempo_esgotado=False, comando=None):
+        """
+        Retira o jogador da sala do tesouro, devolvendo-o ao mapa principal.
+        
+        A saída é gravada junto com a liberação da sala, na mesma ordem em relação à entrada de outro
+        jogador.
+        
+        Args:
+            client_socket (ConexaoTexto): Conexão do jogador.
+            jogador_id (int): ID do jogador.
+            tempo_esgotado (bool): Indica se o jogador saiu por ter esgotado o tempo da sala.
+            comando (str): Comando com que o jogador pediu para sair, gravado como EVENTO_COMANDO.
+        """
+        jogador = self.jogadores[jogador_id]
+        posicao_anterior = jogador.sala_tesouro
+        jogador.pos = posicao_anterior  # Retorna o jogador à posição anterior no mapa principal
+        jogador.pos_anterior = posicao_anterior  # Garante que a posição anterior seja atualizada
+        jogador.na_sala_tesouro = False  # Jogador fora da sala do tesouro
+        jogador.expiracao_sala_tesouro.cancelar()
         self.sala_tesouro = None
-        client_socket.send(self.mapa_principal.exibir_mapa(self.jogadores).encode())  # Envia o mapa atualizado ao jogador que saiu da sala do tesouro
+        self.salas_tesouro[posicao_anterior].remover_jogador(jogador_id)
+        with self.lock_salas:
+            if tempo_esgotado:
+                self.gravar_evento(jogador_id, EVENTO_EXPIROU)
+            else:
+                self.gravar_evento(jogador_id, EVENTO_COMANDO, comando=comando)
+            self.salas_tesouro_locks[posicao_anterior].release()
+
+        if tempo_esgotado:
+            client_socket.send(f"\n{colors.RED}>>> Tempo esgotado :( <<<{colors.ENDC}\n".encode())
+        self.enviar_mapa(client_socket, jogador_id, self.mapa_principal)  # Envia o mapa atualizado ao jogador que saiu da sala do tesouro
         
         if self.todos_tesouros_coletados():
             self.exibir_ranking()
 
+    def pontuar(self, jogador_id):
+        """
+        Credita um tesouro coletado ao jogador e atualiza o ranking.
+        
+        Args:
+            jogador_id (int): ID do jogador.
+        """
+        jogador = self.jogadores[jogador_id]
+        jogador.pontos += 1  # Pontos do jogador
+        self.ranking.definir(jogador_id, jogador.pontos)
+        if not self.intervalo_ranking:
+            return
+        with self.lock_jogadores:
+            agendar = not self.ranking_agendado
+            self.ranking_agendado = True
+        if agendar:  # As alterações seguintes, até o envio, saem juntas no mesmo ranking parcial
+            self.agendador.agendar(self.intervalo_ranking, self.transmitir_ranking)
+
+    def transmitir_ranking(self):
+        """
+        Envia a todos os jogadores os primeiros colocados do ranking.
+        
+        A mensagem é montada e codificada uma única vez para cada protocolo e os mesmos bytes são
+        enviados a todos os jogadores.
+        """
+        with self.lock_jogadores:
+            self.ranking_agendado = False
+            conexoes = [jogador.socket for jogador in self.jogadores.values()]
+        colocados = " | ".join(f"{pos}º Jogador {jogador_id} ({pontos})" for pos, jogador_id, pontos in self.ranking.melhores(self.top_ranking))
+        mensagem = f"\n{colors.OKPURPLE}Ranking: {colocados}{colors.ENDC}\n".encode()
+        codificadas = {}
+        for conexao in conexoes:
+            if conexao.binario not in codificadas:
+                codificadas[conexao.binario] = conexao.codificar_texto(mensagem)
+            try:
+                conexao.enviar_codificado(codificadas[conexao.binario])
+            except OSError:
+                pass
+
+    def marcar_sala_coletada(self, posicao_sala):
+        """
+        Marca uma sala do tesouro como esvaziada e atualiza o contador de salas pendentes.
+        
+        Args:
+            posicao_sala (tuple): Posição da sala do tesouro no mapa principal.
+        """
+        with self.lock_salas:
+            if self.estado_salas_tesouro.get(posicao_sala, False):
+                return
+            self.estado_salas_tesouro[posicao_sala] = True
+            self.salas_tesouro_pendentes -= 1
+        with self.lock_mapa.regioes(posicao_sala):
+            self.mapa_principal.marcar_coletado(posicao_sala)
+        if self.persistencia:
+            self.persistencia.registrar_sala_coletada(posicao_sala)
+
     def todos_tesouros_salas_tesouro_coletados(self):
         """
         Verifica se todos os tesouros das salas do tesouro foram coletados.
@@ -288,10 +711,7 @@ class Servidor:
         Returns:
             bool: True se todos os tesouros foram coletados, False caso contrário.
         """
-        for sala, estado in self.estado_salas_tesouro.items():
-            if not estado:
-                return False
-        return True
+        return self.salas_tesouro_pendentes == 0
     
     def todos_tesouros_mapa_principal_coletados(self):
         return self.mapa_principal.todos_tesouros_coletados()
@@ -309,33 +729,468 @@ class Servidor:
         """
         Exibe o ranking dos jogadores com base nos pontos acumulados.
         """
-        ranking = sorted(self.jogadores.items(), key=lambda item: item[1]["pontos"], reverse=True)
-        ranking_str = f"\n{colors.OKPURPLE}>>> Ranking dos Jogadores <<<{colors.ENDC}\n"
-        for pos, (jogador_id, info) in enumerate(ranking, start=1):
-            ranking_str += f"{colors.OKPURPLE}{pos}º Lugar: Jogador {jogador_id} ------> {info['pontos']} pontos{colors.ENDC}\n"
+        with self.lock_jogadores:
+            jogadores = dict(self.jogadores.items())
+        ranking = self.ranking.melhores()
+        linhas = [f"\n{colors.OKPURPLE}>>> Ranking dos Jogadores <<<{colors.ENDC}\n"]
+        for pos, jogador_id, pontos in ranking:
+            linhas.append(f"{colors.OKPURPLE}{pos}º Lugar: Jogador {jogador_id} ------> {pontos} pontos{colors.ENDC}\n")
             try:
-                info["socket"].send(f"\n{colors.OKGREEN}>>> Você ficou na {pos}ª posição com {info['pontos']} pontos <<<{colors.ENDC}\n".encode())
+                jogadores[jogador_id].socket.send(f"\n{colors.OKGREEN}>>> Você ficou na {pos}ª posição com {pontos} pontos <<<{colors.ENDC}\n".encode())
             except:
                 pass
+        ranking_str = "".join(linhas)
         print(ranking_str)
-        for jogador_id, info in self.jogadores.items():
+        codificados = {}  # O ranking é codificado uma única vez para cada protocolo
+        for info in jogadores.values():
+            conexao = info.socket
             try:
-                info["socket"].send(ranking_str.encode())
+                if conexao.binario not in codificados:
+                    codificados[conexao.binario] = conexao.codificar_texto(ranking_str.encode())
+                conexao.enviar_codificado(codificados[conexao.binario])
             except:
                 pass
 
-    def atualizar_mapas_para_todos_jogadores(self):
+    def atualizar_mapas_para_todos_jogadores(self, somente_pendentes=False):
         """
         Atualiza o mapa para todos os jogadores conectados.
+        
+        O mapa é renderizado uma única vez e o mesmo conteúdo é enviado a todos os jogadores que estão
+        no mapa principal; jogadores no modo delta que compartilham a mesma versão recebem o mesmo delta.
+        Com a janela de visão ativa, cada jogador recebe apenas a sua janela, e apenas se algo mudou nela
+        ou se ele aguarda a resposta de um comando.
+        
+        Args:
+            somente_pendentes (bool): Envia apenas aos jogadores que aguardam o mapa desde o último envio.
+        """
+        cache = {}
+        with self.lock_jogadores:
+            jogadores = list(self.jogadores.items())
+        for jogador_id, jogador in jogadores:
+            pendente = jogador.mapa_pendente
+            if jogador.na_sala_tesouro or (somente_pendentes and not pendente):
+                continue
+            jogador.mapa_pendente = False
+            try:
+                with jogador.socket.agrupar():
+                    if pendente and jogador.enviar_estado:
+                        self.enviar_estado(jogador.socket, jogador_id)
+                    if jogador.modo_delta:
+                        self.enviar_quadro_mapa(jogador.socket, jogador_id, self.mapa_principal, cache, omitir_vazio=not pendente)
+                    else:
+                        self.enviar_mapa_texto(jogador.socket, jogador_id, self.mapa_principal, cache, omitir_vazio=not pendente)
+            except:
+                pass
+
+    def enfileirar_comando(self, jogador_id, comando):
+        """
+        Enfileira um comando do jogador para ser aplicado no próximo tick.
+        
+        Args:
+            jogador_id (int): ID do jogador.
+            comando (str): Comando recebido do jogador.
+        """
+        self.jogadores[jogador_id].fila_comandos.append(comando)
+
+    def despachar_comando(self, client_socket, jogador_id, comando):
+        """
+        Encaminha o comando para o mapa principal ou para a sala do tesouro em que o jogador está.
+        
+        O comando é processado com o lock do jogador adquirido, o que o serializa com a expiração da
+        sessão na sala do tesouro feita pelo agendador. As mensagens e o mapa da resposta são
+        acumulados na fila de saída da conexão e enviados juntos ao final.
+        
+        Args:
+            client_socket (ConexaoTexto): Conexão do jogador.
+            jogador_id (int): ID do jogador.
+            comando (str): Comando recebido do jogador.
+        """
+        jogador = self.jogadores[jogador_id]
+        with jogador.lock, client_socket.agrupar():  # As respostas do comando saem em uma única escrita
+            jogador.processados += 1  # Informado ao jogador na MENSAGEM_ESTADO, para que ele descarte as previsões confirmadas
+            na_sala_tesouro = jogador.na_sala_tesouro
+            if not self.comando_disputado(comando, na_sala_tesouro):
+                self.gravar_evento(jogador_id, EVENTO_COMANDO, comando=comando)
+            with metricas.cronometrar("comando_segundos", comando=rotulo_comando(comando), mapa="sala_tesouro" if na_sala_tesouro else "principal"):
+                if not na_sala_tesouro:
+                    self.processar_comando(client_socket, jogador_id, comando)
+                elif not self.processar_comando_sala(client_socket, jogador_id, comando):
+                    self.sair_sala_tesouro(client_socket, jogador_id, comando=comando)
+
+    def comando_disputado(self, comando, na_sala_tesouro):
         """
-        mapa_atualizado = self.mapa_principal.exibir_mapa(self.jogadores, posicao_do_jogador="pos_anterior").encode()
-        for _, jogador in self.jogadores.items():
-            if not jogador.get("na_sala_tesouro", False):
+        Indica se o resultado do comando depende dos comandos de outros jogadores.
+        
+        Os movimentos no mapa principal disputam os tesouros, e a entrada e a saída da sala do tesouro
+        disputam a sala. Esses comandos são gravados durante a aplicação, sob o lock que os ordena em
+        relação aos dos outros jogadores, para que a reprodução os aplique na mesma ordem; os demais
+        são gravados antes de serem aplicados.
+        
+        Args:
+            comando (str): Comando recebido do jogador.
+            na_sala_tesouro (bool): Indica se o jogador está na sala do tesouro.
+        
+        Returns:
+            bool: True se o comando é gravado durante a aplicação.
+        """
+        if na_sala_tesouro:
+            return comando.startswith("sai")
+        return comando in MOVIMENTOS or comando.startswith("ent")
+
+    def gravar_evento(self, jogador_id, evento, **dados):
+        """
+        Grava um evento do jogador, se a gravação da partida estiver ativa.
+        
+        Args:
+            jogador_id (int): ID do jogador.
+            evento (str): Tipo do evento.
+            **dados: Campos adicionais do evento.
+        """
+        if self.gravacao:
+            self.gravacao.registrar(jogador_id, evento, **dados)
+
+    def admitir_comando(self, client_socket, jogador_id, comando):
+        """
+        Consome uma ficha do limite de comandos do jogador antes de o comando ser processado.
+        
+        Um comando acima do limite é descartado sem ser aplicado nem gravado, junto com os demais
+        comandos que já chegaram na conexão, de modo que uma rajada custa um único descarte. Os
+        comandos descartados contam como processados na MENSAGEM_ESTADO, enviada logo após o descarte,
+        para que o cliente também descarte as suas previsões. O jogador é avisado uma vez a cada sequência de comandos
+        descartados. O pedido de saída nunca é descartado.
+        
+        Args:
+            client_socket (ConexaoTexto): Conexão do jogador.
+            jogador_id (int): ID do jogador.
+            comando (str): Comando recebido do jogador.
+        
+        Returns:
+            bool: True se o comando deve ser processado, False se ele foi descartado.
+        """
+        jogador = self.jogadores.get(jogador_id)
+        if jogador is None or jogador.limite is None or comando.startswith("sai") or jogador.limite.consumir():
+            if jogador is not None:
+                jogador.limitado = False
+            return True
+        fila = client_socket.comandos
+        descartados = 1 + len(fila)
+        saidas = [pendente for pendente in fila if pendente.startswith("sai")]
+        fila.clear()
+        fila.extend(saidas)
+        descartados -= len(saidas)
+        with jogador.lock, client_socket.agrupar():
+            jogador.processados += descartados
+            jogador.comandos_rejeitados += descartados
+            avisar = not jogador.limitado
+            jogador.limitado = True
+            self.comandos_rejeitados += descartados
+            if avisar:
+                self.log_acao_jogador(jogador_id, "excedeu o limite de comandos")
+                client_socket.send(f"{colors.RED}Comandos enviados rápido demais: os excedentes foram ignorados{colors.ENDC}\n".encode())
+            if jogador.enviar_estado:
+                self.enviar_estado(client_socket, jogador_id)  # Sem um mapa novo, o cliente só descarta as previsões ao receber o estado
+        return False
+
+    def despachar_movimentos(self, client_socket, jogador_id, comando):
+        """
+        Aplica um movimento e os movimentos seguintes que já chegaram na conexão, enviando o mapa uma única vez ao final.
+        
+        Cada movimento é aplicado, gravado e contado como processado, de modo que o caminho percorrido
+        e os tesouros coletados são os mesmos de aplicá-los um a um; apenas os mapas intermediários, que
+        seriam substituídos em seguida, deixam de ser renderizados e enviados. Os comandos que não são
+        movimentos continuam na conexão e são processados depois, um a um.
+        
+        Args:
+            client_socket (ConexaoTexto): Conexão do jogador.
+            jogador_id (int): ID do jogador.
+            comando (str): Movimento recebido do jogador.
+        """
+        jogador = self.jogadores[jogador_id]
+        agrupados = 0
+        with self.adiar_mapa(client_socket, jogador_id):
+            self.despachar_comando(client_socket, jogador_id, comando)
+            fila = client_socket.comandos
+            while fila and fila[0] in MOVIMENTOS and self.jogadores.get(jogador_id) is jogador:  # O jogador pode ter saído do jogo ou da partição
+                comando = fila.popleft()
+                if self.admitir_comando(client_socket, jogador_id, comando):
+                    self.despachar_comando(client_socket, jogador_id, comando)
+                    agrupados += 1
+        if agrupados:
+            with jogador.lock:
+                jogador.comandos_agrupados += agrupados
+                self.comandos_agrupados += agrupados
+
+    @contextmanager
+    def adiar_mapa(self, client_socket, jogador_id):
+        """
+        Adia os envios de mapa ao jogador até o fim do bloco, quando apenas o último mapa adiado é enviado.
+        
+        O bloco é executado com o lock do jogador adquirido e com as mensagens da conexão agrupadas.
+        
+        Args:
+            client_socket (ConexaoTexto): Conexão do jogador.
+            jogador_id (int): ID do jogador.
+        """
+        jogador = self.jogadores[jogador_id]
+        with jogador.lock, client_socket.agrupar():
+            jogador.adiando_mapa = True
+            try:
+                yield
+            finally:
+                jogador.adiando_mapa = False
+                mapa, jogador.mapa_adiado = jogador.mapa_adiado, None
+            if mapa is not None and self.jogadores.get(jogador_id) is jogador:
+                self.enviar_mapa(client_socket, jogador_id, mapa)
+
+    def executar_tick(self):
+        """
+        Aplica em lote os comandos enfileirados de todos os jogadores e transmite o novo estado do mapa principal.
+        """
+        with self.lock_jogadores:
+            jogadores = list(self.jogadores.items())
+        for jogador_id, jogador in jogadores:
+            fila = jogador.fila_comandos
+            while fila and self.jogadores.get(jogador_id) is jogador:
                 try:
-                    jogador["socket"].send(mapa_atualizado)
-                except:
-                    pass
+                    self.despachar_comando(jogador.socket, jogador_id, fila.popleft())
+                except OSError:
+                    self.desconectar_conexao(jogador.socket)
+                except KeyError:
+                    break  # O jogador se desconectou durante o tick
+
+        versao = self.mapa_principal.versao
+        self.atualizar_mapas_para_todos_jogadores(somente_pendentes=versao == self.versao_transmitida)
+        self.versao_transmitida = versao
+
+    def executar_ticks(self):
+        """
+        Executa os ticks em ritmo fixo enquanto o servidor estiver ativo.
+        """
+        proximo_tick = time.monotonic()
+        while not self.parar.is_set():
+            proximo_tick += self.intervalo_tick
+            self.executar_tick()
+            self.parar.wait(max(0, proximo_tick - time.monotonic()))
+
+    def encerrar(self):
+        """
+        Encerra as threads do servidor: o laço de ticks, o agendador e o registro de eventos. A gravação
+        e o diário da persistência gravam o que estiver pendente e são fechados.
+        
+        Usado quando o servidor é descartado sem que o processo termine, como as partidas do Lobby.
+        """
+        self.parar.set()
+        self.agendador.encerrar()
+        self.registro.encerrar()
+        if self.gravacao:
+            self.gravacao.fechar()
+        if self.persistencia:
+            self.persistencia.encerrar()
+
+    def sincronizar_mapa(self, jogador_id, ativar_delta=False, ativar_estado=False):
+        """
+        Faz com que o próximo envio de mapa ao jogador contenha o mapa completo.
+        
+        Args:
+            jogador_id (int): ID do jogador.
+            ativar_delta (bool): Ativa o envio apenas das células alteradas nos envios seguintes.
+            ativar_estado (bool): Ativa o envio do estado do jogador antes de cada resposta do mapa.
+        """
+        jogador = self.jogadores[jogador_id]
+        jogador.quadro = None
+        if ativar_delta:
+            jogador.modo_delta = True
+        if ativar_estado:
+            jogador.enviar_estado = True
+
+    def enviar_estado(self, client_socket, jogador_id):
+        """
+        Envia ao jogador a sua posição, se ele está em uma sala do tesouro e quantos dos seus comandos já foram aplicados.
+        
+        Args:
+            client_socket (ConexaoTexto): Conexão do jogador.
+            jogador_id (int): ID do jogador.
+        """
+        jogador = self.jogadores[jogador_id]
+        pos = jogador.pos if jogador.na_sala_tesouro else self.posicao_mundo(jogador.pos)
+        client_socket.enviar_estado({"jogador": jogador_id, "processados": jogador.processados, "pos": list(pos), "sala": jogador.na_sala_tesouro})
+
+    def posicao_mundo(self, pos):
+        """
+        Converte uma posição do mapa principal deste servidor na posição exibida aos jogadores.
+        
+        Args:
+            pos (tuple): Posição (linha, coluna) no mapa principal deste servidor.
+        
+        Returns:
+            tuple: Posição no mapa principal do jogo; neste servidor, a própria posição.
+        """
+        return pos
+
+    def origem_exibida(self, mapa, area):
+        """
+        Calcula a posição exibida aos jogadores da primeira célula enviada de um mapa.
+        
+        Args:
+            mapa (Mapa): Mapa enviado (mapa principal ou sala do tesouro).
+            area (tuple): Janela (linha, coluna, linhas, colunas) enviada, ou None para o mapa inteiro.
+        
+        Returns:
+            tuple: Posição da primeira célula enviada, ou None se o mapa inteiro é enviado a partir de (0, 0).
+        """
+        origem = area[:2] if area else (0, 0)
+        if mapa is self.mapa_principal:
+            origem = self.posicao_mundo(origem)
+        return origem if area or origem != (0, 0) else None
+
+    def enviar_mapa(self, client_socket, jogador_id, mapa):
+        """
+        Envia um mapa ao jogador.
+        
+        Jogadores no modo delta recebem o mapa completo uma única vez e, a partir daí, apenas as
+        células alteradas desde o último envio. Os demais recebem o mapa renderizado completo.
+        
+        No modo tick, o mapa principal não é enviado imediatamente: o jogador o recebe no próximo tick,
+        junto com os demais jogadores. Durante `adiar_mapa`, o mapa é guardado e enviado ao fim do bloco.
+        
+        Args:
+            client_socket (ConexaoTexto): Conexão do jogador.
+            jogador_id (int): ID do jogador.
+            mapa (Mapa): Mapa a ser enviado (mapa principal ou sala do tesouro).
+        """
+        jogador = self.jogadores[jogador_id]
+        if jogador.adiando_mapa:
+            jogador.mapa_adiado = mapa
+            return
+        if self.intervalo_tick and mapa is self.mapa_principal:
+            jogador.mapa_pendente = True
+            return
+        if jogador.enviar_estado:
+            self.enviar_estado(client_socket, jogador_id)
+        if not jogador.modo_delta:
+            self.enviar_mapa_texto(client_socket, jogador_id, mapa)
+            return
+        self.enviar_quadro_mapa(client_socket, jogador_id, mapa)
+
+    def area_visao(self, jogador_id, mapa):
+        """
+        Calcula a janela do mapa visível ao jogador.
+        
+        A janela acompanha o jogador: ela só é deslocada quando o jogador se aproxima de uma de suas
+        bordas, e então volta a ficar centrada nele, sem sair dos limites do mapa. Enquanto ela não se
+        desloca, o jogador no modo delta continua recebendo apenas as células alteradas.
+        
+        Args:
+            jogador_id (int): ID do jogador.
+            mapa (Mapa): Mapa exibido ao jogador.
+        
+        Returns:
+            tuple: Janela (linha, coluna, linhas, colunas), ou None se o mapa inteiro couber na janela.
+        """
+        if self.janela_visao is None:
+            return None
+        linhas, colunas = min(self.janela_visao[0], mapa.linhas), min(self.janela_visao[1], mapa.colunas)
+        if (linhas, colunas) == (mapa.linhas, mapa.colunas):
+            return None
+        jogador = self.jogadores[jogador_id]
+        x, y = jogador.pos
+        mapa_janela, (x0, y0) = jogador.janela or (None, (0, 0))
+        margem_linhas, margem_colunas = linhas // 4, colunas // 4
+        if mapa_janela is not mapa or not x0 + margem_linhas <= x < x0 + linhas - margem_linhas:
+            x0 = min(max(x - linhas // 2, 0), mapa.linhas - linhas)
+        if mapa_janela is not mapa or not y0 + margem_colunas <= y < y0 + colunas - margem_colunas:
+            y0 = min(max(y - colunas // 2, 0), mapa.colunas - colunas)
+        jogador.janela = (mapa, (x0, y0))
+        return (x0, y0, linhas, colunas)
+
+    def alteracoes_visiveis(self, jogador_id, mapa, area, cache):
+        """
+        Retorna as células alteradas desde o último mapa enviado ao jogador que estão na sua janela.
+        
+        Args:
+            jogador_id (int): ID do jogador.
+            mapa (Mapa): Mapa exibido ao jogador.
+            area (tuple): Janela (linha, coluna, linhas, colunas) visível ao jogador, ou None para o mapa inteiro.
+            cache (dict): Deltas já calculados neste envio, compartilhados entre jogadores na mesma versão.
+        
+        Returns:
+            tuple: Versão atual do mapa e as alterações [linha, coluna, célula renderizada] em coordenadas da
+                janela, ou None no lugar das alterações se o mapa completo precisar ser enviado.
+        """
+        mapa_enviado, versao, origem = self.jogadores[jogador_id].quadro or (None, 0, None)
+        if mapa_enviado is not mapa or origem != (area[:2] if area else None):
+            return mapa.versao, None
+        if versao not in cache:
+            cache[versao] = mapa.alteracoes_desde(versao)
+        versao, alteracoes = cache[versao]
+        if alteracoes is not None and area is not None:
+            x0, y0, linhas, colunas = area
+            alteracoes = [[x - x0, y - y0, celula] for x, y, celula in alteracoes if x0 <= x < x0 + linhas and y0 <= y < y0 + colunas]
+        return versao, alteracoes
+
+    def enviar_mapa_texto(self, client_socket, jogador_id, mapa, cache=None, omitir_vazio=False):
+        """
+        Envia a um jogador fora do modo delta o mapa renderizado, ou a sua janela do mapa.
+        
+        Args:
+            client_socket (ConexaoTexto): Conexão do jogador.
+            jogador_id (int): ID do jogador.
+            mapa (Mapa): Mapa a ser enviado (mapa principal ou sala do tesouro).
+            cache (dict): Mapas e deltas já calculados neste envio, compartilhados entre jogadores.
+            omitir_vazio (bool): Não envia nada se nenhuma célula da janela do jogador mudou desde o último envio.
+        """
+        if cache is None:
+            cache = {}
+        area = self.area_visao(jogador_id, mapa)
+        if omitir_vazio and area is not None and self.alteracoes_visiveis(jogador_id, mapa, area, cache)[1] == []:
+            return
+        chave = ("texto", area)
+        if chave not in cache:
+            with metricas.cronometrar("renderizacao_mapa_segundos", formato="texto"):
+                cache[chave] = (mapa.versao, mapa.exibir_mapa(area=area, origem=self.origem_exibida(mapa, area)).encode())
+        versao, mapa_renderizado = cache[chave]
+        client_socket.enviar_mapa_renderizado(mapa_renderizado)
+        self.jogadores[jogador_id].quadro = (mapa, versao, area[:2] if area else None)
+
+    def enviar_quadro_mapa(self, client_socket, jogador_id, mapa, cache=None, omitir_vazio=False):
+        """
+        Envia a um jogador no modo delta o mapa completo ou as células alteradas desde o último envio.
+        
+        Com a janela de visão ativa, o jogador recebe apenas a sua janela; quando ela se desloca, a
+        nova janela é enviada completa.
+        
+        Args:
+            client_socket (ConexaoTexto): Conexão do jogador.
+            jogador_id (int): ID do jogador.
+            mapa (Mapa): Mapa a ser enviado (mapa principal ou sala do tesouro).
+            cache (dict): Quadros e deltas já calculados neste envio, compartilhados entre jogadores na mesma versão.
+            omitir_vazio (bool): Não envia um delta vazio.
+        """
+        if cache is None:
+            cache = {}
+        area = self.area_visao(jogador_id, mapa)
+        versao, alteracoes = self.alteracoes_visiveis(jogador_id, mapa, area, cache)
+        if alteracoes is None:
+            chave = ("quadro", area)
+            if chave not in cache:
+                with metricas.cronometrar("renderizacao_mapa_segundos", formato="quadro"):
+                    cache[chave] = (mapa.versao, mapa.quadro(area=area))
+            versao, celulas = cache[chave]
+            client_socket.enviar_mapa(celulas, self.origem_exibida(mapa, area))
+        elif alteracoes or not omitir_vazio:
+            client_socket.enviar_delta(alteracoes)
+        self.jogadores[jogador_id].quadro = (mapa, versao, area[:2] if area else None)
 
 if __name__ == "__main__":
-    servidor = Servidor(tamanho_mapa=(8, 8), max_tesouros_mapa=10, tamanho_sala_tesouro=(4, 4), max_tesouros_sala=16)
-    servidor.iniciar()
+    parametros_partida = {"tamanho_mapa": (8, 8), "max_tesouros_mapa": 10, "tamanho_sala_tesouro": (4, 4), "max_tesouros_sala": 16}
+    if MODO_SERVIDOR == "lobby":
+        from server.lobby import Lobby
+        Lobby(parametros_partida=parametros_partida).iniciar()
+    elif MODO_SERVIDOR == "particoes":
+        from server.particoes import RoteadorParticoes
+        RoteadorParticoes(parametros_partida=parametros_partida).iniciar()
+    else:
+        if MODO_SERVIDOR == "async":
+            from server.servidor_async import ServidorAsync as Servidor
+        servidor = Servidor(**parametros_partida)
+        servidor.iniciar()
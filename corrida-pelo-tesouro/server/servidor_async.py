@@ -0,0 +1,166 @@
+import asyncio
+import os
+
+from models.protocolo import MAGICA_BINARIO, TEMPO_NEGOCIACAO
+from server.agendador import AgendadorAsync
+from server.conexao import TEMPO_MAXIMO_ATRASO, ConexaoBinaria, ConexaoTexto
+from server.metricas import metricas
+from server.servidor import MOVIMENTOS, Servidor
+
+LIMITE_BUFFER_ASYNC = int(os.getenv("LIMITE_BUFFER_ASYNC_KB", "64")) * 1024  # Bytes no buffer do asyncio a partir dos quais a conexão se comporta como um socket cheio
+
+
+class ConexaoAsync:
+    """
+    Adaptador que expõe a interface de socket usada pelo Servidor sobre um StreamWriter do asyncio.
+    
+    Atributos:
+        writer (asyncio.StreamWriter): Canal de escrita da conexão com o jogador.
+    """
+    def __init__(self, writer):
+        """
+        Inicializa o adaptador com o canal de escrita da conexão.
+        
+        Args:
+            writer (asyncio.StreamWriter): Canal de escrita da conexão com o jogador.
+        """
+        self.writer = writer
+
+    def send(self, dados, flags=0):
+        """
+        Enfileira os dados para envio ao jogador sem bloquear o laço de eventos.
+        
+        Como um socket não bloqueante, recusa novos dados enquanto o buffer de escrita do asyncio tiver
+        LIMITE_BUFFER_ASYNC bytes ou mais, para que eles aguardem na fila de saída da conexão.
+        
+        Args:
+            dados (bytes): Dados a serem enviados.
+            flags (int): Ignorado; a escrita nunca bloqueia.
+        
+        Returns:
+            int: Quantidade de bytes enfileirados.
+        
+        Raises:
+            BlockingIOError: Se o buffer de escrita estiver cheio.
+        """
+        if self.writer.transport.get_write_buffer_size() >= LIMITE_BUFFER_ASYNC:
+            raise BlockingIOError("Buffer de escrita cheio")
+        self.writer.write(dados)
+        return len(dados)
+
+    def sendall(self, dados):
+        """
+        Enfileira todos os dados para envio ao jogador, independentemente do buffer de escrita.
+        
+        Args:
+            dados (bytes): Dados a serem enviados.
+        """
+        self.writer.write(dados)
+
+    def close(self):
+        """
+        Fecha a conexão com o jogador.
+        """
+        self.writer.close()
+
+
+class ServidorAsync(Servidor):
+    """
+    Servidor do jogo Corrida Pelo Tesouro que atende todas as conexões em um único laço de eventos.
+    
+    Mantém a mesma semântica de comandos do Servidor baseado em threads: `despachar_comando` encaminha
+    os comandos do mapa principal a `processar_comando` e os da sala do tesouro a `processar_comando_sala`.
+    """
+    def iniciar(self):
+        """
+        Inicia o laço de eventos do servidor e aguarda conexões de jogadores.
+        """
+        print("Aguardando jogadores...")
+        metricas.iniciar_servidor()
+        asyncio.run(self.servir())
+
+    async def servir(self):
+        """
+        Atende conexões no socket do servidor até o processo ser encerrado.
+        """
+        self.agendador = AgendadorAsync(asyncio.get_running_loop())  # Sessões das salas do tesouro expiram dentro do laço de eventos
+        servidor = await asyncio.start_server(self.atender_jogador, sock=self.server_socket)
+        if self.intervalo_tick:
+            asyncio.get_running_loop().create_task(self.executar_ticks_async())
+        async with servidor:
+            await servidor.serve_forever()
+
+    async def executar_ticks_async(self):
+        """
+        Executa os ticks em ritmo fixo dentro do laço de eventos.
+        """
+        laco = asyncio.get_running_loop()
+        proximo_tick = laco.time()
+        while not self.parar.is_set():
+            proximo_tick += self.intervalo_tick
+            self.executar_tick()
+            await asyncio.sleep(max(0, proximo_tick - laco.time()))
+
+    async def atender_jogador(self, reader, writer):
+        """
+        Gerencia a conexão e as ações de um jogador dentro do laço de eventos.
+        
+        Args:
+            reader (asyncio.StreamReader): Canal de leitura da conexão com o jogador.
+            writer (asyncio.StreamWriter): Canal de escrita da conexão com o jogador.
+        """
+        print(f"Conexão estabelecida com {writer.get_extra_info('peername')}")
+        conexao = await self.negociar_protocolo_async(reader, ConexaoAsync(writer))
+        jogador_id = self.registrar_jogador(conexao)
+        try:
+            while self.jogadores.por_conexao(conexao) is not None:
+                if not conexao.comandos:
+                    conexao.comandos.extend(conexao.decodificar(await reader.read(1024)))
+                    continue
+                comando = conexao.comandos.popleft()
+                if not self.admitir_comando(conexao, jogador_id, comando):
+                    continue
+                if self.intervalo_tick:
+                    self.enfileirar_comando(jogador_id, comando)
+                    continue
+                if comando in MOVIMENTOS:
+                    self.despachar_movimentos(conexao, jogador_id, comando)
+                else:
+                    self.despachar_comando(conexao, jogador_id, comando)
+                if not conexao.comandos and self.jogadores.por_conexao(conexao) is not None:  # Depois de "sair" a conexão já foi fechada
+                    try:
+                        await asyncio.wait_for(writer.drain(), TEMPO_MAXIMO_ATRASO)
+                    except asyncio.TimeoutError:
+                        with conexao.lock_envio:
+                            conexao.encerrar_atrasada()  # A leitura seguinte encontra a conexão encerrada
+        except ConnectionResetError:
+            if conexao.atrasada:
+                print(f"Jogador {jogador_id} desconectado por não acompanhar os envios do servidor.")
+            else:
+                print(f"Jogador {jogador_id} desconectado abruptamente.")
+        except OSError:
+            pass
+        finally:
+            self.desconectar_conexao(conexao)
+            writer.close()
+
+    async def negociar_protocolo_async(self, reader, transporte):
+        """
+        Identifica o protocolo usado pelo jogador logo após a conexão, sem bloquear o laço de eventos.
+        
+        Args:
+            reader (asyncio.StreamReader): Canal de leitura da conexão com o jogador.
+            transporte (ConexaoAsync): Adaptador de escrita da conexão.
+        
+        Returns:
+            ConexaoTexto: Conexão do jogador, binária ou de texto.
+        """
+        try:
+            dados = await asyncio.wait_for(reader.readexactly(len(MAGICA_BINARIO)), TEMPO_NEGOCIACAO)
+        except asyncio.TimeoutError:
+            return ConexaoTexto(transporte, agendador=self.agendador)  # Os bytes já recebidos continuam no reader
+        except asyncio.IncompleteReadError as erro:
+            dados = erro.partial
+        if dados == MAGICA_BINARIO:
+            return ConexaoBinaria(transporte, agendador=self.agendador)
+        return ConexaoTexto(transporte, dados, agendador=self.agendador)